@@ -4,13 +4,40 @@ import os
 import aws_cdk as cdk
 
 from updatereplace_deletion_policies.updatereplace_deletion_policies_stack import UpdatereplaceDeletionPoliciesStack
+from updatereplace_deletion_policies.transfer import shard_prefixes
 
+# DataBucket options: 'true' for the defaults, 'hot_prefixes=shards,archive_after_days=90' on the command line or
+# a JSON object in cdk.json, None when the data bucket is not wanted. hot_prefixes takes '/' separated prefixes,
+# or 'shards' for the prefixes of transfer.sharded_key.
+def data_bucket_options(value):
+    if isinstance(value, dict):
+        return value
+    if value is None or str(value).lower() == 'false':
+        return None
+    options = {}
+    for item in ('' if str(value).lower() == 'true' else value).split(','):
+        if not item:
+            continue
+        name, text = (part.strip() for part in item.split('=', 1))
+        if name == 'hot_prefixes':
+            options[name] = shard_prefixes() if text == 'shards' else [prefix + '/' for prefix in text.split('/') if prefix]
+        else:
+            options[name] = int(text) if text.isdigit() else {'true': True, 'false': False}.get(text.lower(), text)
+    return options
 
 app = cdk.App()
-UpdatereplaceDeletionPoliciesStack(
-    app, 
-    "UpdatereplaceDeletionPoliciesStack",
-    env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION'))
-    )
+
+# Only the stacks named in -c stacks=... are built, all of them by default
+stacks = app.node.try_get_context('stacks')
+def selected(name):
+    return not stacks or name in stacks.split(',')
+
+if selected('UpdatereplaceDeletionPoliciesStack'):
+    UpdatereplaceDeletionPoliciesStack(
+        app,
+        "UpdatereplaceDeletionPoliciesStack",
+        env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')),
+        data_bucket=data_bucket_options(app.node.try_get_context('data_bucket'))
+        )
 
 app.synth()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Measure the transfer helper's part size and concurrency, and key sharding, against the local S3 stand-in
+#
+#   python3 benchmarks/transfer_benchmark.py --size 256 --part-sizes 8,16,64 --concurrency 1,4,16
+#   python3 benchmarks/transfer_benchmark.py --bucket my-data-bucket --accelerate
+#
+# The first part moves one large object with every part size and concurrency, next to a single PUT and GET,
+# and checks the downloaded bytes. The stand-in gives every request --latency seconds to first byte and
+# --bandwidth MB/s, as one connection to S3 would have. With --bucket the same runs go to a real bucket, made
+# by DataBucket or any other. The second part writes --objects small objects from --threads threads, once under
+# a single prefix and once under sharded_key's prefixes, and counts the SlowDown answers of the stand-in.
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local.fakes import FakeS3
+from updatereplace_deletion_policies import transfer
+
+MB = 1000 * 1000
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(transfer.MIB), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def timed(call):
+    began = time.perf_counter()
+    call()
+    return time.perf_counter() - began
+
+def large_object(s3, bucket, source, size, part_sizes, concurrencies):
+    expected = file_hash(source)
+    target = source + '.download'
+    runs = [('single request', size, 1)] + [
+        ('%d MiB x %d' % (part_size // transfer.MIB, concurrency), part_size, concurrency)
+        for part_size in part_sizes for concurrency in concurrencies
+    ]
+    print('%-20s %12s %12s %8s' % ('parts', 'upload MB/s', 'down MB/s', 'check'))
+    for name, part_size, concurrency in runs:
+        key = 'benchmark/large-%d-%d' % (part_size, concurrency)
+        upload = timed(lambda: transfer.upload(s3, bucket, key, source, part_size = part_size, concurrency = concurrency))
+        download = timed(lambda: transfer.download(s3, bucket, key, target, part_size = part_size, concurrency = concurrency))
+        check = 'ok' if file_hash(target) == expected else 'MISMATCH'
+        print('%-20s %12.1f %12.1f %8s' % (name, size / MB / upload, size / MB / download, check))
+    os.remove(target)
+
+# Writes retried after SlowDown with jittered backoff, as the SDK's adaptive retry mode would
+def small_objects(s3, bucket, keys, threads):
+    body = os.urandom(1024)
+
+    def put(key):
+        for attempt in range(10):
+            try:
+                return s3.put_object(Bucket = bucket, Key = key, Body = body)
+            except Exception as e:
+                if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'SlowDown':
+                    raise
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        raise RuntimeError('Gave up on ' + key)
+
+    with ThreadPoolExecutor(max_workers = threads) as pool:
+        return timed(lambda: list(pool.map(put, keys)))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'S3 transfer helper benchmark')
+    parser.add_argument('--size', type = int, default = 128, help = 'MB of the large object')
+    parser.add_argument('--part-sizes', default = '8,16,64', help = 'part sizes in MiB')
+    parser.add_argument('--concurrency', default = '1,4,16', help = 'parts in flight')
+    parser.add_argument('--latency', type = float, default = 0.03, help = 'stand-in seconds to first byte')
+    parser.add_argument('--bandwidth', type = float, default = 80, help = 'stand-in MB/s per connection')
+    parser.add_argument('--objects', type = int, default = 6000, help = 'small objects to write, 0 to skip')
+    parser.add_argument('--threads', type = int, default = 64, help = 'threads writing small objects')
+    # S3 takes 3,500 per prefix, more than one Python process sends, so the stand-in's limit is scaled down
+    parser.add_argument('--write-rate', type = int, default = 1000, help = 'stand-in writes per second per prefix')
+    parser.add_argument('--bucket', help = 'run the large object part against this real bucket instead')
+    parser.add_argument('--accelerate', action = 'store_true', help = 'use the Transfer Acceleration endpoint of --bucket')
+    args = parser.parse_args()
+
+    part_sizes = [int(value) * transfer.MIB for value in args.part_sizes.split(',')]
+    concurrencies = [int(value) for value in args.concurrency.split(',')]
+    if args.bucket:
+        s3, bucket = transfer.client(accelerate = args.accelerate, concurrency = max(concurrencies)), args.bucket
+    else:
+        s3, bucket = FakeS3(latency = args.latency, bandwidth = args.bandwidth * MB, write_rate = args.write_rate), 'benchmark'
+
+    size = args.size * MB
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'large')
+        with open(source, 'wb') as f:
+            for offset in range(0, size, 16 * MB):
+                f.write(os.urandom(min(16 * MB, size - offset)))
+        print('%d MB object, %s' % (args.size, 's3://' + bucket if args.bucket else '%.0f ms latency, %.0f MB/s per connection' % (args.latency * 1000, args.bandwidth)))
+        large_object(s3, bucket, source, size, part_sizes, concurrencies)
+
+    if args.objects and not args.bucket:
+        print()
+        print('%d objects of 1 KB from %d threads, %d writes/s per prefix' % (args.objects, args.threads, args.write_rate))
+        print('%-20s %12s %12s' % ('keys', 'objects/s', 'SlowDown'))
+        for name, key in (('one prefix', lambda i: 'events/%08d' % i), ('%d shards' % transfer.SHARDS, lambda i: transfer.sharded_key('events/%08d' % i))):
+            fake = FakeS3(latency = args.latency, write_rate = args.write_rate)
+            elapsed = small_objects(fake, bucket, [key(i) for i in range(args.objects)], args.threads)
+            print('%-20s %12.0f %12d' % (name, args.objects / elapsed, fake.throttled))
+
+if __name__ == '__main__':
+    main()
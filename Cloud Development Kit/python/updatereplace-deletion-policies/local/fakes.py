@@ -0,0 +1,113 @@
+import hashlib
+import io
+import threading
+import time
+import uuid
+
+# In-process stand-in for S3, so the transfer helper can be measured without an account
+#
+# Every request waits latency seconds before its first byte, and its body moves at bandwidth bytes per
+# second, as on one connection. Requests per second are limited per prefix (the key up to the first '/'),
+# beyond that S3 answers SlowDown. The limits default to S3's 3,500 writes and 5,500 reads per prefix.
+
+class FakeClientError(Exception):
+
+    def __init__(self, code, operation):
+        super().__init__('An error occurred (' + code + ') when calling the ' + operation + ' operation')
+        self.response = {'Error': {'Code': code}}
+
+class FakeS3:
+
+    def __init__(self, latency=0.0, bandwidth=None, write_rate=3500, read_rate=5500):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rates = {'write': write_rate, 'read': read_rate}
+        self.objects = {}
+        self.uploads = {}
+        self.windows = {}
+        self.requests = {}
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    # Count the request against its prefix's rate for the current second, and wait out the latency
+    def request(self, operation, kind, key):
+        prefix = key.split('/', 1)[0] if '/' in key else ''
+        second = int(time.monotonic())
+        with self.lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+            window = self.windows.get((kind, prefix))
+            if window is None or window[0] != second:
+                window = self.windows[(kind, prefix)] = [second, 0]
+            window[1] += 1
+            if window[1] > self.rates[kind]:
+                self.throttled += 1
+                raise FakeClientError('SlowDown', operation)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def transfer(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.request('PutObject', 'write', Key)
+        body = Body if isinstance(Body, bytes) else Body.read()
+        self.transfer(len(body))
+        with self.lock:
+            self.objects[(Bucket, Key)] = (body, '"' + hashlib.md5(body).hexdigest() + '"', kwargs)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.request('CreateMultipartUpload', 'write', Key)
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {'key': (Bucket, Key), 'parts': {}, 'headers': kwargs}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self.request('UploadPart', 'write', Key)
+        body = Body if isinstance(Body, bytes) else Body.read()
+        self.transfer(len(body))
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        with self.lock:
+            self.uploads[UploadId]['parts'][PartNumber] = (body, etag)
+        return {'ETag': etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self.request('CompleteMultipartUpload', 'write', Key)
+        with self.lock:
+            upload = self.uploads.pop(UploadId)
+            parts = [upload['parts'][part['PartNumber']] for part in MultipartUpload['Parts']]
+            if any(etag != part['ETag'] for (_, etag), part in zip(parts, MultipartUpload['Parts'])):
+                raise FakeClientError('InvalidPart', 'CompleteMultipartUpload')
+            body = b''.join(body for body, _ in parts)
+            etag = '"' + hashlib.md5(b''.join(bytes.fromhex(etag.strip('"')) for _, etag in parts)).hexdigest() + '-' + str(len(parts)) + '"'
+            self.objects[(Bucket, Key)] = (body, etag, upload['headers'])
+        return {'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.request('HeadObject', 'read', Key)
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise FakeClientError('404', 'HeadObject')
+            body, etag, headers = self.objects[(Bucket, Key)]
+        return dict(headers, ContentLength=len(body), ETag=etag)
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, **kwargs):
+        self.request('GetObject', 'read', Key)
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise FakeClientError('NoSuchKey', 'GetObject')
+            body, etag, headers = self.objects[(Bucket, Key)]
+        if IfMatch is not None and IfMatch != etag:
+            raise FakeClientError('PreconditionFailed', 'GetObject')
+        if Range is not None:
+            first, last = Range[len('bytes='):].split('-')
+            body = body[int(first):int(last) + 1]
+        self.transfer(len(body))
+        return dict(headers, Body=io.BytesIO(body), ContentLength=len(body), ETag=etag)
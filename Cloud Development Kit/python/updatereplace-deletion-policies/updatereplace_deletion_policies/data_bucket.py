@@ -0,0 +1,95 @@
+from aws_cdk import (
+    Duration,
+    RemovalPolicy,
+    CfnDeletionPolicy,
+    aws_s3 as s3,
+)
+from constructs import Construct
+
+class DataBucket(Construct):
+
+    # A bucket for data that is written and read in bulk:
+    # - Transfer Acceleration, for clients far from the bucket's region
+    # - objects move to Intelligent-Tiering after tiering_after_days, and its archive tiers after
+    #   archive_after_days (None keeps them out of the archive tiers, which need a restore before reads)
+    # - incomplete multipart uploads are aborted after a week, expiration_days deletes objects for good
+    # - request metrics for the whole bucket and for each of hot_prefixes, e.g. the shards of transfer.sharded_key
+    # - a daily Parquet inventory in a separate bucket, to list billions of keys without LIST calls
+    # removal_policy and update_replace_policy are applied to both buckets like the stack does for its own, and
+    # with DESTROY their objects are deleted with them, since CloudFormation cannot delete a bucket that has any.
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        hot_prefixes: list = None,
+        tiering_after_days: int = 0,
+        archive_after_days: int = None,
+        expiration_days: int = None,
+        transfer_acceleration: bool = True,
+        inventory: bool = True,
+        removal_policy: RemovalPolicy = RemovalPolicy.RETAIN,
+        update_replace_policy: CfnDeletionPolicy = CfnDeletionPolicy.RETAIN
+    ) -> None:
+        super().__init__(scope, construct_id)
+
+        # The deep archive tier follows 90 days later, and neither tier takes more than 730 days
+        if archive_after_days is not None and not 90 <= archive_after_days <= 640:
+            raise ValueError('archive_after_days must be between 90 and 640')
+        auto_delete_objects = removal_policy == RemovalPolicy.DESTROY
+
+        # Create Inventory Bucket, S3 adds the policy that lets it write the reports
+        inventories = None
+        if inventory:
+            self.inventory_bucket = s3.Bucket(
+                self,
+                'InventoryBucket',
+                encryption = s3.BucketEncryption.S3_MANAGED,
+                block_public_access = s3.BlockPublicAccess.BLOCK_ALL,
+                enforce_ssl = True,
+                lifecycle_rules = [s3.LifecycleRule(id = 'ExpireReports', expiration = Duration.days(30))],
+                removal_policy = removal_policy,
+                auto_delete_objects = auto_delete_objects
+            )
+            self.inventory_bucket.node.default_child.cfn_options.update_replace_policy = update_replace_policy
+            inventories = [
+                s3.Inventory(
+                    inventory_id = 'Daily',
+                    destination = s3.InventoryDestination(bucket = self.inventory_bucket, prefix = 'inventory'),
+                    frequency = s3.InventoryFrequency.DAILY,
+                    format = s3.InventoryFormat.PARQUET,
+                    include_object_versions = s3.InventoryObjectVersion.CURRENT,
+                    optional_fields = ['Size', 'LastModifiedDate', 'StorageClass', 'IntelligentTieringAccessTier', 'ETag']
+                )
+            ]
+
+        # Create Data Bucket
+        self.bucket = s3.Bucket(
+            self,
+            'Bucket',
+            encryption = s3.BucketEncryption.S3_MANAGED,
+            block_public_access = s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl = True,
+            transfer_acceleration = transfer_acceleration,
+            intelligent_tiering_configurations = [
+                s3.IntelligentTieringConfiguration(
+                    name = 'Archive',
+                    archive_access_tier_time = Duration.days(archive_after_days),
+                    deep_archive_access_tier_time = Duration.days(max(180, archive_after_days + 90))
+                )
+            ] if archive_after_days is not None else None,
+            lifecycle_rules = [
+                s3.LifecycleRule(
+                    id = 'IntelligentTiering',
+                    transitions = [s3.Transition(storage_class = s3.StorageClass.INTELLIGENT_TIERING, transition_after = Duration.days(tiering_after_days))],
+                    abort_incomplete_multipart_upload_after = Duration.days(7),
+                    expiration = Duration.days(expiration_days) if expiration_days else None
+                )
+            ],
+            metrics = [s3.BucketMetrics(id = 'EntireBucket')] + [
+                s3.BucketMetrics(id = 'Prefix-' + prefix.strip('/').replace('/', '-'), prefix = prefix) for prefix in (hot_prefixes or [])
+            ],
+            inventories = inventories,
+            removal_policy = removal_policy,
+            auto_delete_objects = auto_delete_objects
+        )
+        self.bucket.node.default_child.cfn_options.update_replace_policy = update_replace_policy
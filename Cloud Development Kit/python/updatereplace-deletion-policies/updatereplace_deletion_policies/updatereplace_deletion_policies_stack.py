@@ -5,10 +5,12 @@ from aws_cdk import (
     aws_s3 as s3,
 )
 from constructs import Construct
+from updatereplace_deletion_policies.data_bucket import DataBucket
 
 class UpdatereplaceDeletionPoliciesStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    # data_bucket adds a DataBucket, with the DataBucket options it holds, next to the demonstration bucket
+    def __init__(self, scope: Construct, construct_id: str, data_bucket: dict = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
                # create an S3 bucket
@@ -24,3 +26,13 @@ class UpdatereplaceDeletionPoliciesStack(Stack):
         
         # Add update replace policy and set it to delete
         resource.cfn_options.update_replace_policy = CfnDeletionPolicy.DELETE
+
+        if data_bucket is not None:
+            # Create Data Bucket, with the same policies as the bucket above
+            DataBucket(
+                self,
+                'DataBucket',
+                removal_policy = RemovalPolicy.DESTROY,
+                update_replace_policy = CfnDeletionPolicy.DELETE,
+                **data_bucket
+            )
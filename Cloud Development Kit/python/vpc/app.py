@@ -6,9 +6,47 @@ import aws_cdk as cdk
 from vpc.vpc_stack import VpcStack
 from vpc.custom_vpc_stack import CustomVpcStack
 
+# ScalableCompute options: 'true' for the defaults, 'instance_type=c7g.xlarge,max_capacity=20' on the command
+# line or a JSON object in cdk.json, None when compute is not wanted
+def compute_options(value):
+    if isinstance(value, dict):
+        return value
+    if value is None or str(value).lower() == 'false':
+        return None
+    options = {}
+    for item in ('' if str(value).lower() == 'true' else value).split(','):
+        if not item:
+            continue
+        name, text = (part.strip() for part in item.split('=', 1))
+        options[name] = int(text) if text.isdigit() else {'true': True, 'false': False, 'none': None}.get(text.lower(), text)
+    return options
+
 
 app = cdk.App()
 
-VpcStack(app, "VpcStack", env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')))
-CustomVpcStack(app, "CustomVpcStack", env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')))
+# Only the stacks named in -c stacks=VpcStack,CustomVpcStack are built, all of them by default
+stacks = app.node.try_get_context('stacks')
+def selected(name):
+    return not stacks or name in stacks.split(',')
+
+interface_endpoints = app.node.try_get_context('interface_endpoints')
+compute = compute_options(app.node.try_get_context('compute'))
+if selected('VpcStack'):
+    VpcStack(
+        app,
+        "VpcStack",
+        env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')),
+        endpoints=str(app.node.try_get_context('endpoints')).lower() == 'true',
+        interface_endpoints=interface_endpoints.split(',') if interface_endpoints else None,
+        compute=compute
+    )
+if selected('CustomVpcStack'):
+    CustomVpcStack(
+        app,
+        "CustomVpcStack",
+        env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')),
+        vpc_cidr=app.node.try_get_context('vpc_cidr') or '10.0.0.0/16',
+        az_count=int(app.node.try_get_context('az_count') or 3),
+        compute=compute
+    )
 app.synth()
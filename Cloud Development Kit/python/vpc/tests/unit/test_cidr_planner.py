@@ -0,0 +1,61 @@
+import ipaddress
+import itertools
+
+import pytest
+
+from vpc.cidr_planner import allocate, plan_subnets
+
+def networks(blocks):
+    return [ipaddress.ip_network(cidr) for cidr in blocks]
+
+def test_blocks_are_aligned_to_their_size():
+    blocks = allocate('10.0.0.0/16', [('a', 24), ('b', 20), ('c', 26), ('d', 24), ('e', 28)])
+    for network in networks(blocks.values()):
+        assert int(network.network_address) % network.num_addresses == 0
+    assert blocks['b'] == '10.0.0.0/20'
+
+def test_blocks_do_not_overlap_and_stay_inside_the_vpc():
+    vpc = ipaddress.ip_network('10.1.0.0/16')
+    blocks = networks(allocate(str(vpc), [('s' + str(i), prefix) for i, prefix in enumerate([28, 19, 24, 26, 19, 28, 22, 20])]).values())
+    for a, b in itertools.combinations(blocks, 2):
+        assert not a.overlaps(b)
+    assert all(block.subnet_of(vpc) for block in blocks)
+
+def test_equal_blocks_keep_the_requested_order():
+    assert allocate('10.0.0.0/24', [('x', 26), ('y', 26)]) == {'x': '10.0.0.0/26', 'y': '10.0.0.64/26'}
+
+def test_full_vpc_is_used_without_gaps():
+    blocks = allocate('10.0.0.0/24', [('a', 25), ('b', 26), ('c', 27), ('d', 28), ('e', 28)])
+    assert sum(network.num_addresses for network in networks(blocks.values())) == 256
+
+def test_overflow_is_rejected():
+    with pytest.raises(ValueError, match = 'no room left'):
+        allocate('10.0.0.0/24', [('a', 25), ('b', 25), ('c', 28)])
+
+@pytest.mark.parametrize('prefix', [28, 16])
+def test_prefix_bounds_accepted(prefix):
+    assert allocate('10.0.0.0/16', [('a', prefix)])['a'] == '10.0.0.0/' + str(prefix)
+
+@pytest.mark.parametrize('prefix', [29, 32, 15])
+def test_prefix_bounds_rejected(prefix):
+    with pytest.raises(ValueError, match = 'does not fit'):
+        allocate('10.0.0.0/16', [('a', prefix)])
+
+def test_plan_splits_evenly_per_tier_and_az():
+    plan = plan_subnets('10.0.0.0/16', 3)
+    assert plan == {
+        'Public': ['10.0.0.0/19', '10.0.32.0/19', '10.0.64.0/19'],
+        'Private': ['10.0.96.0/19', '10.0.128.0/19', '10.0.160.0/19']
+    }
+
+def test_plan_with_prefix():
+    plan = plan_subnets('10.0.0.0/16', 2, prefix = 24)
+    assert plan == {'Public': ['10.0.0.0/24', '10.0.1.0/24'], 'Private': ['10.0.2.0/24', '10.0.3.0/24']}
+
+def test_plan_rejects_bad_az_count_and_overflow():
+    with pytest.raises(ValueError):
+        plan_subnets('10.0.0.0/16', 0)
+    with pytest.raises(ValueError):
+        plan_subnets('10.0.0.0/26', 4, prefix = 28)
+    with pytest.raises(ValueError):
+        plan_subnets('10.0.0.0/27', 2)
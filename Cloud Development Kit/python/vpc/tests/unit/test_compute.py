@@ -0,0 +1,100 @@
+import pytest
+
+cdk = pytest.importorskip('aws_cdk')
+from aws_cdk.assertions import Match, Template
+
+from vpc.compute import ScalableCompute, is_graviton
+
+SUBNETS = ['subnet-a', 'subnet-b', 'subnet-c']
+
+def template(**options):
+    stack = cdk.Stack(cdk.App(), 'ComputeStack')
+    ScalableCompute(stack, 'Compute', vpc_id = 'vpc-1', vpc_cidr = '10.0.0.0/16', subnet_ids = SUBNETS, **options)
+    return Template.from_stack(stack)
+
+def only(result, resource_type):
+    resources = result.find_resources(resource_type)
+    assert len(resources) == 1
+    return next(iter(resources.values()))
+
+def launch_template_data(result):
+    return only(result, 'AWS::EC2::LaunchTemplate')['Properties']['LaunchTemplateData']
+
+def test_root_volume_is_gp3_with_iops_and_throughput():
+    template(volume_iops = 6000, volume_throughput = 500).has_resource_properties('AWS::EC2::LaunchTemplate', {
+        'LaunchTemplateData': Match.object_like({
+            'EbsOptimized': True,
+            'BlockDeviceMappings': [{
+                'DeviceName': '/dev/xvda',
+                'Ebs': Match.object_like({'VolumeType': 'gp3', 'Iops': 6000, 'Throughput': 500, 'Encrypted': True})
+            }]
+        })
+    })
+
+def test_instance_metadata_needs_imdsv2_tokens():
+    assert launch_template_data(template())['MetadataOptions'] == {'HttpTokens': 'required', 'HttpPutResponseHopLimit': 2}
+
+def test_ena_express_override_lands_on_the_primary_interface():
+    interface = launch_template_data(template(ena_express = True))['NetworkInterfaces'][0]
+    assert interface['DeviceIndex'] == 0
+    assert interface['EnaSrdSpecification'] == {'EnaSrdEnabled': True, 'EnaSrdUdpSpecification': {'EnaSrdUdpEnabled': True}}
+    assert 'EnaSrdSpecification' not in launch_template_data(template())['NetworkInterfaces'][0]
+
+def test_cluster_placement_pins_the_group_to_one_subnet():
+    result = template(cluster_placement = True)
+    placement_groups = result.find_resources('AWS::EC2::PlacementGroup', {'Properties': {'Strategy': 'cluster'}})
+    assert len(placement_groups) == 1
+    group = only(result, 'AWS::AutoScaling::AutoScalingGroup')['Properties']
+    assert group['VPCZoneIdentifier'] == SUBNETS[:1]
+    assert group['PlacementGroup'] == {'Ref': next(iter(placement_groups))}
+
+def test_without_placement_the_group_spans_every_subnet():
+    result = template()
+    result.resource_count_is('AWS::EC2::PlacementGroup', 0)
+    group = only(result, 'AWS::AutoScaling::AutoScalingGroup')['Properties']
+    assert group['VPCZoneIdentifier'] == SUBNETS
+    assert 'PlacementGroup' not in group
+
+def test_target_tracking_and_predictive_scaling():
+    result = template(cpu_target = 60, predictive = 'ForecastAndScale')
+    result.resource_count_is('AWS::AutoScaling::ScalingPolicy', 2)
+    result.has_resource_properties('AWS::AutoScaling::ScalingPolicy', {
+        'PolicyType': 'TargetTrackingScaling',
+        'TargetTrackingConfiguration': {
+            'PredefinedMetricSpecification': {'PredefinedMetricType': 'ASGAverageCPUUtilization'},
+            'TargetValue': 60
+        }
+    })
+    result.has_resource_properties('AWS::AutoScaling::ScalingPolicy', {
+        'PolicyType': 'PredictiveScaling',
+        'PredictiveScalingConfiguration': Match.object_like({
+            'Mode': 'ForecastAndScale',
+            'SchedulingBufferTime': 300,
+            'MetricSpecifications': [Match.object_like({'TargetValue': 60})]
+        })
+    })
+
+def test_predictive_scaling_can_be_left_out():
+    result = template(predictive = None)
+    result.resource_count_is('AWS::AutoScaling::ScalingPolicy', 1)
+    result.has_resource_properties('AWS::AutoScaling::ScalingPolicy', {'PolicyType': 'TargetTrackingScaling'})
+
+@pytest.mark.parametrize('min_capacity, max_capacity, in_service', [(2, 10, 2), (3, 3, 2), (1, 1, 0)])
+def test_rolling_update_keeps_room_below_max_capacity(min_capacity, max_capacity, in_service):
+    group = only(template(min_capacity = min_capacity, max_capacity = max_capacity), 'AWS::AutoScaling::AutoScalingGroup')
+    assert group['UpdatePolicy']['AutoScalingRollingUpdate'] == {'MinInstancesInService': in_service, 'MaxBatchSize': 1, 'PauseTime': 'PT2M'}
+
+@pytest.mark.parametrize('options', [
+    {'volume_iops': 2000},
+    {'volume_iops': 3000, 'volume_throughput': 1000},
+    {'min_capacity': 0},
+    {'min_capacity': 5, 'max_capacity': 4},
+    {'predictive': 'Always'}
+])
+def test_invalid_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        template(**options)
+
+def test_graviton_types():
+    assert all(is_graviton(name) for name in ('m7g.large', 'c7gn.xlarge', 'r8gd.2xlarge', 't4g.micro'))
+    assert not any(is_graviton(name) for name in ('m7i.large', 'c6a.xlarge', 'g5.xlarge', 'm5.large'))
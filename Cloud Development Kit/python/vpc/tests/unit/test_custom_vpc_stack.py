@@ -0,0 +1,52 @@
+import pytest
+
+cdk = pytest.importorskip('aws_cdk')
+from aws_cdk.assertions import Template
+
+from vpc.custom_vpc_stack import CustomVpcStack
+
+def template(az_count):
+    app = cdk.App()
+    return Template.from_stack(CustomVpcStack(app, 'CustomVpcStack', az_count = az_count))
+
+# True when value is a Ref or GetAtt of the resource with logical_id
+def refers_to(value, logical_id):
+    return value == {'Ref': logical_id} or value.get('Fn::GetAtt', [None])[0] == logical_id
+
+@pytest.mark.parametrize('az_count', [1, 2, 3])
+def test_one_nat_gateway_and_private_route_table_per_az(az_count):
+    result = template(az_count)
+    result.resource_count_is('AWS::EC2::NatGateway', az_count)
+    result.resource_count_is('AWS::EC2::EIP', az_count)
+    route_tables = result.find_resources('AWS::EC2::RouteTable')
+    assert sorted(name for name in route_tables if name.startswith('PrivateRouteTable')) == ['PrivateRouteTable' + str(i + 1) for i in range(az_count)]
+    assert 'PublicRouteTable' in route_tables
+
+@pytest.mark.parametrize('az_count', [2, 3])
+def test_private_egress_stays_in_its_az(az_count):
+    resources = template(az_count).to_json()['Resources']
+    for i in range(1, az_count + 1):
+        route = resources['RouteNAT' + str(i)]['Properties']
+        assert route['DestinationCidrBlock'] == '0.0.0.0/0'
+        assert refers_to(route['NatGatewayId'], 'NATGateway' + str(i))
+        assert refers_to(route['RouteTableId'], 'PrivateRouteTable' + str(i))
+
+        assert refers_to(resources['NATGateway' + str(i)]['Properties']['SubnetId'], 'PublicSubnet' + str(i))
+        assert resources['PublicSubnet' + str(i)]['Properties']['AvailabilityZone'] == resources['PrivateSubnet' + str(i)]['Properties']['AvailabilityZone']
+
+        association = resources['PrivateSubnetRouteTableAssociation' + str(i)]['Properties']
+        assert refers_to(association['SubnetId'], 'PrivateSubnet' + str(i))
+        assert refers_to(association['RouteTableId'], 'PrivateRouteTable' + str(i))
+
+def test_public_subnets_route_to_the_internet_gateway():
+    resources = template(3).to_json()['Resources']
+    route = resources['RouteIGW']['Properties']
+    assert refers_to(route['GatewayId'], 'InternetGateway')
+    assert refers_to(route['RouteTableId'], 'PublicRouteTable')
+    for i in range(1, 4):
+        assert refers_to(resources['PublicSubnetRouteTableAssociation' + str(i)]['Properties']['RouteTableId'], 'PublicRouteTable')
+
+def test_subnets_come_from_the_planner():
+    resources = template(2).to_json()['Resources']
+    cidrs = [resources[name]['Properties']['CidrBlock'] for name in ('PublicSubnet1', 'PublicSubnet2', 'PrivateSubnet1', 'PrivateSubnet2')]
+    assert cidrs == ['10.0.0.0/18', '10.0.64.0/18', '10.0.128.0/18', '10.0.192.0/18']
@@ -0,0 +1,37 @@
+import ipaddress
+import math
+
+# Splits a VPC CIDR into non-overlapping subnet blocks
+#
+# Blocks are handed out largest first, each one aligned to its own size, which is how a buddy allocator packs
+# power-of-two blocks without gaps. Equal sized blocks come out in the order they were asked for.
+
+# requests is a list of (name, prefix length), returns {name: cidr}
+def allocate(vpc_cidr: str, requests: list) -> dict:
+    network = ipaddress.ip_network(vpc_cidr)
+    for name, prefix in requests:
+        if prefix < network.prefixlen or prefix > 28:
+            raise ValueError('Subnet ' + name + ' /' + str(prefix) + ' does not fit a /' + str(network.prefixlen) + ' VPC, subnets are /28 at the smallest')
+
+    blocks = {}
+    offset = 0
+    for name, prefix in sorted(requests, key = lambda request: request[1]):
+        size = 2 ** (network.max_prefixlen - prefix)
+        # Round up to the next multiple of the block size
+        offset = (offset + size - 1) // size * size
+        if offset + size > network.num_addresses:
+            raise ValueError(vpc_cidr + ' has no room left for subnet ' + name + ' /' + str(prefix))
+        blocks[name] = str(ipaddress.ip_network((int(network.network_address) + offset, prefix)))
+        offset += size
+    return {name: blocks[name] for name, prefix in requests}
+
+# One subnet per tier and AZ, returns {tier: [cidr of AZ 1, cidr of AZ 2, ...]}
+#
+# Without a prefix every subnet gets the largest equal share of the VPC, e.g. six /19s out of a /16.
+def plan_subnets(vpc_cidr: str, az_count: int, tiers: tuple = ('Public', 'Private'), prefix: int = None) -> dict:
+    if az_count < 1:
+        raise ValueError('az_count must be at least 1')
+    if prefix is None:
+        prefix = ipaddress.ip_network(vpc_cidr).prefixlen + math.ceil(math.log2(az_count * len(tiers)))
+    blocks = allocate(vpc_cidr, [(tier + str(i + 1), prefix) for tier in tiers for i in range(az_count)])
+    return {tier: [blocks[tier + str(i + 1)] for i in range(az_count)] for tier in tiers}
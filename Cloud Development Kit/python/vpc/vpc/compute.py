@@ -0,0 +1,213 @@
+import re
+
+from aws_cdk import (
+    CfnAutoScalingRollingUpdate,
+    CfnTag,
+    CfnUpdatePolicy,
+    aws_autoscaling as autoscaling,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+)
+from constructs import Construct
+
+# Graviton types have a 'g' after the generation, e.g. m7g, c7gn, r8gd, t4g
+GRAVITON = re.compile(r'^[a-z]+[0-9]+[a-z]*g[a-z]*\.')
+
+# gp3 includes 3000 IOPS and 125 MiB/s, and allows up to 16000 IOPS and 0.25 MiB/s per IOPS
+GP3_IOPS = (3000, 16000)
+GP3_THROUGHPUT = (125, 1000)
+
+PREDICTIVE_MODES = ('ForecastOnly', 'ForecastAndScale')
+
+# Latest Amazon Linux 2023 per architecture
+IMAGE_PARAMETERS = {
+    'arm64': '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-arm64',
+    'x86_64': '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64',
+}
+
+def is_graviton(instance_type: str) -> bool:
+    return GRAVITON.match(instance_type) is not None
+
+class ScalableCompute(Construct):
+
+    # An Auto Scaling group of instances from a launch template, spread across subnet_ids, for the VPC stacks.
+    # The AMI is the latest Amazon Linux 2023 for the architecture of instance_type. The root volume is gp3 with
+    # volume_iops and volume_throughput. cluster_placement packs the instances into a cluster placement group,
+    # which keeps them all in the first subnet's AZ. The group tracks cpu_target percent CPU, and predictive
+    # scaling ('ForecastOnly', 'ForecastAndScale' or None) launches ahead of the daily pattern.
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        vpc_id: str,
+        vpc_cidr: str,
+        subnet_ids: list,
+        instance_type: str = 'm7g.large',
+        volume_size: int = 20,
+        volume_iops: int = 3000,
+        volume_throughput: int = 125,
+        ena_express: bool = False,
+        cluster_placement: bool = False,
+        detailed_monitoring: bool = True,
+        min_capacity: int = 2,
+        max_capacity: int = 10,
+        cpu_target: int = 50,
+        predictive: str = 'ForecastOnly',
+        application_port: int = 80
+    ) -> None:
+        super().__init__(scope, construct_id)
+
+        if not GP3_IOPS[0] <= volume_iops <= GP3_IOPS[1]:
+            raise ValueError('volume_iops must be between %d and %d' % GP3_IOPS)
+        if not GP3_THROUGHPUT[0] <= volume_throughput <= min(GP3_THROUGHPUT[1], volume_iops // 4):
+            raise ValueError('volume_throughput must be between 125 and a quarter of volume_iops, at most 1000')
+        if not 0 < min_capacity <= max_capacity:
+            raise ValueError('min_capacity must be at least 1 and at most max_capacity')
+        if predictive is not None and predictive not in PREDICTIVE_MODES:
+            raise ValueError('predictive must be one of ' + ', '.join(PREDICTIVE_MODES) + ' or None')
+
+        # Create Security Group, the application port from inside the VPC
+        security_group = ec2.CfnSecurityGroup(
+            self,
+            'SecurityGroup',
+            group_description = 'Application port from the VPC',
+            vpc_id = vpc_id,
+            security_group_ingress = [
+                ec2.CfnSecurityGroup.IngressProperty(
+                    ip_protocol = 'tcp',
+                    from_port = application_port,
+                    to_port = application_port,
+                    cidr_ip = vpc_cidr
+                )
+            ],
+            tags = [CfnTag(key = 'Name', value = 'ComputeSecurityGroup')]
+        )
+
+        # Create Instance Role, Session Manager instead of SSH and the CloudWatch agent for memory and disk metrics
+        role = iam.Role(
+            self,
+            'InstanceRole',
+            assumed_by = iam.ServicePrincipal('ec2.amazonaws.com'),
+            managed_policies = [
+                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore'),
+                iam.ManagedPolicy.from_aws_managed_policy_name('CloudWatchAgentServerPolicy')
+            ]
+        )
+        instance_profile = iam.CfnInstanceProfile(self, 'InstanceProfile', roles = [role.role_name])
+
+        # Create Launch Template
+        image = ec2.MachineImage.from_ssm_parameter(IMAGE_PARAMETERS['arm64' if is_graviton(instance_type) else 'x86_64'])
+        launch_template = ec2.CfnLaunchTemplate(
+            self,
+            'LaunchTemplate',
+            launch_template_data = ec2.CfnLaunchTemplate.LaunchTemplateDataProperty(
+                image_id = image.get_image(self).image_id,
+                instance_type = instance_type,
+                iam_instance_profile = ec2.CfnLaunchTemplate.IamInstanceProfileProperty(arn = instance_profile.attr_arn),
+                ebs_optimized = True,
+                monitoring = ec2.CfnLaunchTemplate.MonitoringProperty(enabled = detailed_monitoring),
+                metadata_options = ec2.CfnLaunchTemplate.MetadataOptionsProperty(http_tokens = 'required', http_put_response_hop_limit = 2),
+                block_device_mappings = [
+                    ec2.CfnLaunchTemplate.BlockDeviceMappingProperty(
+                        device_name = '/dev/xvda',
+                        ebs = ec2.CfnLaunchTemplate.EbsProperty(
+                            volume_type = 'gp3',
+                            volume_size = volume_size,
+                            iops = volume_iops,
+                            throughput = volume_throughput,
+                            encrypted = True,
+                            delete_on_termination = True
+                        )
+                    )
+                ],
+                # Current generation types always use ENA, the interface only has to ask for ENA Express
+                network_interfaces = [
+                    ec2.CfnLaunchTemplate.NetworkInterfaceProperty(
+                        device_index = 0,
+                        associate_public_ip_address = False,
+                        groups = [security_group.attr_group_id],
+                        delete_on_termination = True
+                    )
+                ],
+                tag_specifications = [
+                    ec2.CfnLaunchTemplate.TagSpecificationProperty(resource_type = 'instance', tags = [CfnTag(key = 'Name', value = 'ComputeInstance')]),
+                    ec2.CfnLaunchTemplate.TagSpecificationProperty(resource_type = 'volume', tags = [CfnTag(key = 'Name', value = 'ComputeVolume')])
+                ]
+            )
+        )
+
+        # ENA Express is newer than this CDK version's launch template properties
+        if ena_express:
+            launch_template.add_property_override('LaunchTemplateData.NetworkInterfaces.0.EnaSrdSpecification', {
+                'EnaSrdEnabled': True,
+                'EnaSrdUdpSpecification': {'EnaSrdUdpEnabled': True}
+            })
+
+        # Create Cluster Placement Group, a cluster placement group lives in one AZ
+        placement_group = None
+        if cluster_placement:
+            placement_group = ec2.CfnPlacementGroup(self, 'PlacementGroup', strategy = 'cluster')
+            subnet_ids = subnet_ids[:1]
+
+        # Create Auto Scaling Group
+        self.auto_scaling_group = autoscaling.CfnAutoScalingGroup(
+            self,
+            'AutoScalingGroup',
+            launch_template = autoscaling.CfnAutoScalingGroup.LaunchTemplateSpecificationProperty(
+                launch_template_id = launch_template.ref,
+                version = launch_template.attr_latest_version_number
+            ),
+            vpc_zone_identifier = subnet_ids,
+            placement_group = placement_group.ref if placement_group else None,
+            min_size = str(min_capacity),
+            max_size = str(max_capacity),
+            health_check_type = 'EC2',
+            health_check_grace_period = 120,
+            default_instance_warmup = 120,
+            metrics_collection = [autoscaling.CfnAutoScalingGroup.MetricsCollectionProperty(granularity = '1Minute')]
+        )
+        # Replace instances one at a time when the launch template changes. CloudFormation wants the instances kept in
+        # service below max_capacity, a group of fixed size goes one instance down during the update.
+        self.auto_scaling_group.cfn_options.update_policy = CfnUpdatePolicy(
+            auto_scaling_rolling_update = CfnAutoScalingRollingUpdate(
+                min_instances_in_service = min(min_capacity, max_capacity - 1),
+                max_batch_size = 1,
+                pause_time = 'PT2M'
+            )
+        )
+
+        # Create Target Tracking Policy
+        autoscaling.CfnScalingPolicy(
+            self,
+            'CpuTargetTracking',
+            auto_scaling_group_name = self.auto_scaling_group.ref,
+            policy_type = 'TargetTrackingScaling',
+            target_tracking_configuration = autoscaling.CfnScalingPolicy.TargetTrackingConfigurationProperty(
+                predefined_metric_specification = autoscaling.CfnScalingPolicy.PredefinedMetricSpecificationProperty(
+                    predefined_metric_type = 'ASGAverageCPUUtilization'
+                ),
+                target_value = cpu_target
+            )
+        )
+
+        # Create Predictive Scaling Policy, launching 5 minutes ahead of the forecast so instances are warm in time
+        if predictive is not None:
+            autoscaling.CfnScalingPolicy(
+                self,
+                'CpuPredictiveScaling',
+                auto_scaling_group_name = self.auto_scaling_group.ref,
+                policy_type = 'PredictiveScaling',
+                predictive_scaling_configuration = autoscaling.CfnScalingPolicy.PredictiveScalingConfigurationProperty(
+                    mode = predictive,
+                    scheduling_buffer_time = 300,
+                    max_capacity_breach_behavior = 'HonorMaxCapacity',
+                    metric_specifications = [
+                        autoscaling.CfnScalingPolicy.PredictiveScalingMetricSpecificationProperty(
+                            target_value = cpu_target,
+                            predefined_metric_pair_specification = autoscaling.CfnScalingPolicy.PredictiveScalingPredefinedMetricPairProperty(
+                                predefined_metric_type = 'ASGCPUUtilization'
+                            )
+                        )
+                    ]
+                )
+            )
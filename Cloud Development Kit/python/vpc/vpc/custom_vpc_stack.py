@@ -5,17 +5,22 @@ from aws_cdk import (
     aws_ec2 as ec2,
 )
 from constructs import Construct
+from vpc.cidr_planner import plan_subnets
+from vpc.compute import ScalableCompute
 
 class CustomVpcStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    # A public and a private subnet in each of az_count AZs, carved out of vpc_cidr by the CIDR planner.
+    # Every AZ gets its own NAT gateway and private route table, so egress never crosses AZs.
+    # compute adds an Auto Scaling group across the private subnets, with the ScalableCompute options it holds.
+    def __init__(self, scope: Construct, construct_id: str, vpc_cidr: str = '10.0.0.0/16', az_count: int = 3, compute: dict = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         #  Create VPC
         vpc = ec2.CfnVPC(
             self,
             "VPC",
-            cidr_block = '10.0.0.0/16',
+            cidr_block = vpc_cidr,
             enable_dns_hostnames = True,
             enable_dns_support = True,
             instance_tenancy = 'default',
@@ -23,8 +28,9 @@ class CustomVpcStack(Stack):
         )
         
         # Subnets variables
-        public_subnet_cidr = ['10.0.0.0/19', '10.0.32.0/19', '10.0.64.0/19']
-        private_subnet_cidr = ['10.0.96.0/19', '10.0.128.0/19', '10.0.160.0/19']
+        subnet_cidr = plan_subnets(vpc_cidr, az_count)
+        public_subnet_cidr = subnet_cidr['Public']
+        private_subnet_cidr = subnet_cidr['Private']
         public_subnets = []
         private_subnets = []
 
@@ -64,14 +70,6 @@ class CustomVpcStack(Stack):
             tags = [CfnTag(key = 'Name', value = 'RouteTable')]
         )
 
-         # Create Private Route Table
-        private_route_table = ec2.CfnRouteTable(
-            self,
-            'PrivateRouteTable',
-            vpc_id = vpc.attr_vpc_id,
-            tags = [CfnTag(key = 'Name', value = 'RouteTable')]
-        )
-
         # Create Public Subnet Route Table Associations
         for i, subnet in enumerate(public_subnets):
             ec2.CfnSubnetRouteTableAssociation(
@@ -80,14 +78,6 @@ class CustomVpcStack(Stack):
                 route_table_id = public_route_table.attr_route_table_id,
                 subnet_id = subnet.attr_subnet_id
             )
-        # Create Private Subnet Route Table Associations
-        for i, subnet in enumerate(private_subnets):
-            ec2.CfnSubnetRouteTableAssociation(
-                self,
-                'PrivateSubnetRouteTableAssociation' + str(i+1),
-                route_table_id = private_route_table.attr_route_table_id,
-                subnet_id = subnet.attr_subnet_id
-            )
 
         # Create Internet Gateway 
         internet_gateway = ec2.CfnInternetGateway(
@@ -114,28 +104,64 @@ class CustomVpcStack(Stack):
             vpc_id = vpc.attr_vpc_id
         )
 
-        # Create EIP
-        eip = ec2.CfnEIP(
-            self,
-            'ElasticIP',
-            domain = 'vpc',
-            tags = [CfnTag(key = 'Name', value = 'ElasticIP')]
-        )
+        # Create a NAT Gateway and Private Route Table per AZ
+        nat_routes = []
+        for i, subnet in enumerate(private_subnets):
+            # Create EIP
+            eip = ec2.CfnEIP(
+                self,
+                'ElasticIP' + str(i+1),
+                domain = 'vpc',
+                tags = [CfnTag(key = 'Name', value = 'ElasticIP' + str(i+1))]
+            )
 
-        # Create NAT Gateway
-        nat_gateway = ec2.CfnNatGateway(
-            self, 
-            'NATGateway',
-            subnet_id = public_subnets[0].attr_subnet_id,
-            allocation_id = eip.attr_allocation_id,
-            tags = [CfnTag(key = 'Name', value = 'NATGateway')]
-        )
+            # Create NAT Gateway in the public subnet of the same AZ
+            nat_gateway = ec2.CfnNatGateway(
+                self, 
+                'NATGateway' + str(i+1),
+                subnet_id = public_subnets[i].attr_subnet_id,
+                allocation_id = eip.attr_allocation_id,
+                tags = [CfnTag(key = 'Name', value = 'NATGateway' + str(i+1))]
+            )
+            # The NAT can only come up once the Internet Gateway is attached
+            nat_gateway.add_dependency(vpc_gateway_attachment)
 
-        # Create Route for NAT Gateway
-        routeNat = ec2.CfnRoute(
-            self,
-            'RouteNAT',
-            route_table_id = private_route_table.attr_route_table_id,
-            destination_cidr_block = '0.0.0.0/0',
-            nat_gateway_id = nat_gateway.attr_nat_gateway_id
-        )
\ No newline at end of file
+            # Create Private Route Table
+            private_route_table = ec2.CfnRouteTable(
+                self,
+                'PrivateRouteTable' + str(i+1),
+                vpc_id = vpc.attr_vpc_id,
+                tags = [CfnTag(key = 'Name', value = 'PrivateRouteTable' + str(i+1))]
+            )
+
+            # Create Private Subnet Route Table Association
+            ec2.CfnSubnetRouteTableAssociation(
+                self,
+                'PrivateSubnetRouteTableAssociation' + str(i+1),
+                route_table_id = private_route_table.attr_route_table_id,
+                subnet_id = subnet.attr_subnet_id
+            )
+
+            # Create Route for NAT Gateway
+            nat_route = ec2.CfnRoute(
+                self,
+                'RouteNAT' + str(i+1),
+                route_table_id = private_route_table.attr_route_table_id,
+                destination_cidr_block = '0.0.0.0/0',
+                nat_gateway_id = nat_gateway.attr_nat_gateway_id
+            )
+            nat_routes.append(nat_route)
+
+        if compute is not None:
+            # Create Auto Scaling Group across the private subnets
+            scalable_compute = ScalableCompute(
+                self,
+                'Compute',
+                vpc_id = vpc.attr_vpc_id,
+                vpc_cidr = vpc_cidr,
+                subnet_ids = [subnet.attr_subnet_id for subnet in private_subnets],
+                **compute
+            )
+            # Instances come up with a route to the NAT gateway, so their user data can reach the internet
+            for nat_route in nat_routes:
+                scalable_compute.auto_scaling_group.add_dependency(nat_route)
@@ -4,11 +4,19 @@ from aws_cdk import (
     aws_ec2 as ec2,
 )
 from constructs import Construct
+from vpc.compute import ScalableCompute
 import string, random
 
+# Interface endpoints added by the endpoints profile unless a list is given, the services the reminder
+# Lambdas call. SES only offers an SMTP endpoint ('email-smtp'), so SES API calls still leave through the NAT.
+DEFAULT_INTERFACE_ENDPOINTS = ['states', 'sns', 'sqs', 'logs']
+
 class VpcStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    # endpoints adds gateway endpoints for S3 and DynamoDB and an interface endpoint with private DNS for each
+    # service in interface_endpoints, so traffic to them from the private subnets skips the NAT gateway.
+    # compute adds an Auto Scaling group across the private subnets, with the ScalableCompute options it holds.
+    def __init__(self, scope: Construct, construct_id: str, endpoints: bool = False, interface_endpoints: list = None, compute: dict = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         #  Create VPC
@@ -48,4 +56,47 @@ class VpcStack(Stack):
         # Add Tags to Public Subnets
         subnet_list = vpc.select_subnets(subnet_type=ec2.SubnetType.PUBLIC)
         for i, subnet in enumerate(subnet_list.subnets):
-            Tags.of(subnet).add('Name', 'PublicSubnet' + str(i + 1))
\ No newline at end of file
+            Tags.of(subnet).add('Name', 'PublicSubnet' + str(i + 1))
+
+        if endpoints:
+            private_subnets = ec2.SubnetSelection(subnet_type = ec2.SubnetType.PRIVATE_WITH_EGRESS)
+
+            # Create Gateway Endpoints, they only add routes to the private route tables and cost nothing
+            vpc.add_gateway_endpoint('S3Endpoint', service = ec2.GatewayVpcEndpointAwsService.S3, subnets = [private_subnets])
+            vpc.add_gateway_endpoint('DynamoDBEndpoint', service = ec2.GatewayVpcEndpointAwsService.DYNAMODB, subnets = [private_subnets])
+
+            # Create Endpoint Security Group, HTTPS from inside the VPC only
+            endpoint_security_group = ec2.SecurityGroup(
+                self,
+                'EndpointSecurityGroup',
+                vpc = vpc,
+                description = 'HTTPS from the VPC to the interface endpoints',
+                allow_all_outbound = False
+            )
+            endpoint_security_group.add_ingress_rule(ec2.Peer.ipv4(vpc.vpc_cidr_block), ec2.Port.tcp(443))
+            Tags.of(endpoint_security_group).add('Name', 'EndpointSecurityGroup')
+
+            # Create Interface Endpoints with one network interface in each AZ's private subnet
+            for service in (DEFAULT_INTERFACE_ENDPOINTS if interface_endpoints is None else interface_endpoints):
+                endpoint = vpc.add_interface_endpoint(
+                    ''.join(part.capitalize() for part in service.split('-')) + 'Endpoint',
+                    service = ec2.InterfaceVpcEndpointAwsService(service),
+                    private_dns_enabled = True,
+                    security_groups = [endpoint_security_group],
+                    subnets = ec2.SubnetSelection(subnet_type = ec2.SubnetType.PRIVATE_WITH_EGRESS, one_per_az = True)
+                )
+                Tags.of(endpoint).add('Name', service + '-endpoint')
+
+        if compute is not None:
+            # Create Auto Scaling Group across the private subnets
+            scalable_compute = ScalableCompute(
+                self,
+                'Compute',
+                vpc_id = vpc.vpc_id,
+                vpc_cidr = vpc.vpc_cidr_block,
+                subnet_ids = [subnet.subnet_id for subnet in vpc.private_subnets],
+                **compute
+            )
+            # Instances come up with a route to the NAT gateway, so their user data can reach the internet
+            for subnet in vpc.private_subnets:
+                scalable_compute.auto_scaling_group.node.add_dependency(subnet.internet_connectivity_established)
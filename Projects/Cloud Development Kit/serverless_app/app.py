@@ -3,10 +3,67 @@ import os
 
 import aws_cdk as cdk
 
+from serverless_app import bundling
 from serverless_app.serverless_app_stack import ServerlessAppStack
 
+# Per-function context, 'api_handler=512,email=256' on the command line or a JSON object in cdk.json
+def per_function(value):
+    if isinstance(value, dict):
+        return {name: int(number) for name, number in value.items()}
+    return {name.strip(): int(number) for name, number in (item.split('=') for item in (value or '').split(',') if item)}
+
+# 'api_handler,email' on the command line or a JSON list in cdk.json
+def function_names(value):
+    if isinstance(value, list):
+        return value
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+# Limits as 'rate:burst', or 'rate:burst:requests per day' for a usage plan, or a JSON list in cdk.json
+def limits(value):
+    numbers = value if isinstance(value, list) else str(value).split(':')
+    return (float(numbers[0]),) + tuple(int(number) for number in numbers[1:])
+
+# Limits per path or per client, '/reminders/batch=1:2' or 'website=10:20,partner=50:100:100000' on the
+# command line or a JSON object in cdk.json
+def named_limits(value):
+    if isinstance(value, dict):
+        return {name: limits(numbers) for name, numbers in value.items()}
+    return {name.strip(): limits(numbers) for name, numbers in (item.split('=') for item in (value or '').split(',') if item)}
 
 app = cdk.App()
-ServerlessAppStack(app, "ServerlessAppStack", env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region='eu-west-1') )
+ServerlessAppStack(
+    app,
+    "ServerlessAppStack",
+    env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=app.node.try_get_context('region') or 'eu-west-1'),
+    scheduler=app.node.try_get_context('scheduler') or 'stepfunctions',
+    express_wait_threshold=int(app.node.try_get_context('express_wait_threshold') or 0),
+    express_sync=str(app.node.try_get_context('express_sync')).lower() == 'true',
+    email_mode=app.node.try_get_context('email_mode') or 'single',
+    bundle_sdk=str(app.node.try_get_context('bundle_sdk')).lower() != 'false',
+    idempotency=str(app.node.try_get_context('idempotency')).lower() == 'true',
+    idempotency_ttl=int(app.node.try_get_context('idempotency_ttl') or 300),
+    integration=app.node.try_get_context('integration') or 'lambda',
+    ingestion=app.node.try_get_context('ingestion') or 'direct',
+    queue_concurrency=int(app.node.try_get_context('queue_concurrency') or 5),
+    website_deploy=app.node.try_get_context('website_deploy') or 'bucket',
+    tracing=str(app.node.try_get_context('tracing')).lower() == 'true',
+    architecture=app.node.try_get_context('architecture') or 'x86_64',
+    memory_sizes=per_function(app.node.try_get_context('memory_sizes')),
+    provisioned_concurrency=per_function(app.node.try_get_context('provisioned_concurrency')),
+    snap_start=function_names(app.node.try_get_context('snap_start')),
+    broadcast=str(app.node.try_get_context('broadcast')).lower() == 'true',
+    broadcast_concurrency=int(app.node.try_get_context('broadcast_concurrency') or 10),
+    broadcast_tolerated_failure=int(app.node.try_get_context('broadcast_tolerated_failure') if app.node.try_get_context('broadcast_tolerated_failure') is not None else 5),
+    claim_check_threshold=int(app.node.try_get_context('claim_check_threshold') if app.node.try_get_context('claim_check_threshold') is not None else 32768),
+    api_type=app.node.try_get_context('api_type') or 'rest',
+    throttle=limits(app.node.try_get_context('throttle')) if app.node.try_get_context('throttle') else None,
+    method_throttles=named_limits(app.node.try_get_context('method_throttles')),
+    usage_plans=named_limits(app.node.try_get_context('usage_plans')),
+    compression_threshold=int(app.node.try_get_context('compression_threshold') if app.node.try_get_context('compression_threshold') is not None else -1)
+)
+
+# Report import and init times of the functions this synth bundled so cold start regressions show up before deploy
+if str(app.node.try_get_context('cold_start_report')).lower() == 'true':
+    bundling.cold_start_report(bundling.bundled)
 
 app.synth()
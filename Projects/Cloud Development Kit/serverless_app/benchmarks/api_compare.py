@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Compare api_handler behind the REST API (payload 1.0) and the HTTP API (payload 2.0) variants
+#
+#   python3 benchmarks/api_compare.py --requests 5000 --batch 100
+#   python3 benchmarks/api_compare.py --compression-threshold -1
+#
+# Both variants run in this process through local/api.py, with Step Functions replaced by an in-process stub,
+# so the numbers cover the handler and its event shape, not API Gateway itself. Each request kind is sent
+# --requests times from --concurrency clients that accept gzip. The HTTP API variant gzips responses of
+# --compression-threshold bytes or more in the handler, as the stack sets it up. The REST API leaves that to
+# API Gateway, so its response sizes are before compression and its latency does not include it.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python'), os.path.join(ROOT, 'src', 'api_handler')]
+
+from load_test import local_target, payload
+from report import latency_summary
+
+VARIANTS = [('rest', '1.0'), ('http', '2.0')]
+
+async def measure(target, path, body, requests, concurrency):
+    in_flight = asyncio.Semaphore(concurrency)
+    latencies = []
+    sizes = []
+    statuses = set()
+    headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, deflate, br'}
+
+    async def send():
+        async with in_flight:
+            began = time.perf_counter()
+            status, response_headers, response_body = await target.request('POST', path, body, headers)
+            latencies.append(time.perf_counter() - began)
+        sizes.append(len(response_body))
+        statuses.add(status)
+
+    began = time.process_time()
+    await asyncio.gather(*(send() for i in range(requests)))
+    return latencies, (time.process_time() - began) / requests, sum(sizes) / len(sizes), statuses
+
+async def run(args):
+    import api_handler
+
+    kinds = [
+        ('single', '/reminders', payload('both', 0, args.wait_seconds)),
+        ('batch of %d' % args.batch, '/reminders/batch', '[' + ','.join(payload('both', i, args.wait_seconds) for i in range(args.batch)) + ']')
+    ]
+    print('%d requests per kind, %d clients, %.0f ms StartExecution' % (args.requests, args.concurrency, args.sfn_latency * 1000))
+    for name, path, body in kinds:
+        print()
+        for api_type, payload_version in VARIANTS:
+            api_handler.COMPRESSION_THRESHOLD = args.compression_threshold if api_type == 'http' else -1
+            target = local_target(args.lambda_concurrency, args.sfn_latency, None, payload_version)
+            try:
+                # Warm up so import and first call costs stay out of the numbers
+                await measure(target, path, body, min(100, args.requests), args.concurrency)
+                latencies, cpu, size, statuses = await measure(target, path, body, args.requests, args.concurrency)
+            finally:
+                target.close()
+            print(latency_summary('%s %s' % (api_type, name), latencies))
+            print('%-28s cpu=%7.0fus/request  response=%8.0f bytes  status=%s' % ('', cpu * 1e6, size, ','.join(str(status) for status in sorted(statuses))))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'REST API vs HTTP API variant of api_handler')
+    parser.add_argument('--requests', type = int, default = 2000, help = 'requests per kind and variant')
+    parser.add_argument('--concurrency', type = int, default = 20, help = 'requests in flight at most')
+    parser.add_argument('--batch', type = int, default = 100, help = 'reminders per batch request')
+    parser.add_argument('--wait-seconds', type = int, default = 300)
+    parser.add_argument('--compression-threshold', type = int, default = 1024, help = 'bytes, -1 to leave HTTP API responses uncompressed')
+    parser.add_argument('--lambda-concurrency', type = int, default = 100, help = 'api_handler instances')
+    parser.add_argument('--sfn-latency', type = float, default = 0.0, help = 'seconds StartExecution takes')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
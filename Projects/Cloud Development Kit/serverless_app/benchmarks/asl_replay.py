@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Replay reminders through the reminder workflow on the offline ASL interpreter, with a virtual clock
+#
+#   python3 benchmarks/asl_replay.py --reminders 1000000 --waits uniform --max-wait 86400
+#   python3 benchmarks/asl_replay.py --template cdk.out/ServerlessAppStack.template.json --lambda-concurrency 50
+#
+# The email and sms tasks run the real handlers against in-process SES and SNS stand-ins, SDK integration
+# tasks call the stand-ins directly. Each task takes --task-latency virtual seconds, and --lambda-concurrency
+# caps the invocations in flight per function so queueing behind the concurrency limit shows up in the
+# results.
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from report import latency_summary, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python'), os.path.join(ROOT, 'src', 'email'), os.path.join(ROOT, 'src', 'sms')]
+
+from local import asl
+from local.fakes import FakeSes, FakeSns
+from reminders_common import metrics
+from sms_dispatcher import SmsDispatcher
+import email_reminder
+import sms_reminder
+
+# waitSeconds distributions for a reminder submitted at the given virtual time, all bounded by --max-wait
+WAITS = {
+    'uniform': lambda max_wait, now: random.randint(0, max_wait),
+    'exponential': lambda max_wait, now: min(max_wait, int(random.expovariate(3.0 / max_wait))),
+    # Half of the reminders are due on the hour, the way people tend to set them
+    'on-the-hour': lambda max_wait, now: on_the_hour(max_wait, now) if random.random() < 0.5 else random.randint(0, max_wait)
+}
+
+def on_the_hour(max_wait, now):
+    due = (int(now + random.randint(0, max_wait)) // 3600) * 3600
+    return max(0, due - int(now))
+
+# Bind every task state in the definition to a local handler, keyed the way the interpreter looks them up
+def bind(definition, ses, sns, queued):
+    handlers = {}
+    for name, state in asl.task_states(definition):
+        resource = state['Resource']
+        if ':aws-sdk:ses:' in resource:
+            handler = lambda data: ses.send_email(**data)
+        elif ':aws-sdk:sns:' in resource:
+            handler = lambda data: sns.publish(**data)
+        elif ':sqs:sendMessage' in resource:
+            handler = queued.append
+        elif name.startswith('Email'):
+            handler = asl.lambda_task(email_reminder.lambda_handler)
+        elif name.startswith('Text'):
+            handler = asl.lambda_task(sms_reminder.lambda_handler)
+        else:
+            raise SystemExit('Do not know how to run task state ' + name)
+        handlers[asl.resource_key(state)] = handler
+    return handlers
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Replay reminders on the offline ASL interpreter')
+    parser.add_argument('--template', default = os.path.join(ROOT, 'src', 'step_function', 'step_function_template.json'),
+                        help = 'ASL definition, or a synthesized CloudFormation template')
+    parser.add_argument('--state-machine', default = None, help = 'logical id of the state machine in a template')
+    parser.add_argument('--reminders', type = int, default = 1000000)
+    parser.add_argument('--arrival-rate', type = float, default = 500, help = 'reminders submitted per virtual second')
+    parser.add_argument('--waits', choices = sorted(WAITS), default = 'uniform', help = 'waitSeconds distribution')
+    parser.add_argument('--max-wait', type = int, default = 86400)
+    parser.add_argument('--task-latency', type = float, default = 0.08, help = 'median virtual seconds per task')
+    parser.add_argument('--lambda-concurrency', type = int, default = None, help = 'in-flight tasks per function')
+    parser.add_argument('--seed', type = int, default = 1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    definition = asl.load(args.template, args.state_machine)
+    simulator = asl.Simulator()
+
+    # The handlers' clients are replaced with stand-ins, the dispatcher's rate limit and dedupe window run on
+    # virtual time and the task latency stands in for the SNS round trip
+    ses, sns, queued = FakeSes(), FakeSns(), []
+    email_reminder.ses = lambda: ses
+    sms_reminder.dispatcher = SmsDispatcher(sns, float('inf'), workers = 1, clock = lambda: simulator.now, sleep = lambda seconds: None)
+    # Every invocation carries one reminder, so it is published inline instead of through the thread pool
+    sms_reminder.dispatcher.executor = SimpleNamespace(map = map)
+
+    # A million invocations would print a million metric lines
+    metrics.emit = lambda line: None
+
+    handlers = bind(definition, ses, sns, queued)
+    concurrency = dict.fromkeys(handlers, args.lambda_concurrency) if args.lambda_concurrency else None
+    lateness = []
+    failures = {}
+    def on_finish(execution):
+        if execution.status == 'SUCCEEDED':
+            lateness.append(execution.stopped_at - execution.started_at - execution.input['waitSeconds'])
+        else:
+            failures[execution.error] = failures.get(execution.error, 0) + 1
+
+    machine = asl.StateMachine(
+        definition,
+        handlers,
+        simulator = simulator,
+        latency = lambda name, resource: args.task_latency * random.lognormvariate(0, 0.3),
+        concurrency = concurrency,
+        on_finish = on_finish
+    )
+
+    preferences = ['email', 'sms', 'both']
+    began = time.perf_counter()
+    arrival = 0.0
+    for i in range(args.reminders):
+        arrival += random.expovariate(args.arrival_rate)
+        machine.start({
+            'waitSeconds': WAITS[args.waits](args.max_wait, arrival),
+            'preference': preferences[i % 3],
+            'message': 'Reminder ' + str(i),
+            'email': 'someone@something.com',
+            'phone': '+15556667788'
+        }, at = arrival)
+    simulator.run()
+    wall_seconds = time.perf_counter() - began
+
+    stats = machine.stats
+    print('reminders           : %d (%d succeeded, %d failed %s)' % (stats['started'], stats['succeeded'], stats['failed'], failures or ''))
+    print('virtual time        : %.0fs, replayed in %.1fs wall (%.0f executions/s)' % (simulator.now, wall_seconds, stats['started'] / wall_seconds))
+    print('peak open executions: %d' % stats['peak_in_flight'])
+    print('sent                : %d emails, %d sms, %d queued' % (len(ses.sent), len(sns.published), len(queued)))
+    print(latency_summary('lateness past due time', lateness))
+    for key, pool in machine.pools.items():
+        print('%-50s calls=%-8d peak in flight=%-6d queue wait p50=%.2fs p99=%.2fs' % (
+            key[:50], pool.calls, pool.peak, percentile(pool.waits, 50), percentile(pool.waits, 99)
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Compare start and end-to-end latency of the Standard and Express reminder workflows on a deployed stack
+#
+#   python3 benchmarks/express_latency.py --runs 50
+#
+# The default preference 'none' ends in the DefaultState Fail state, so no email or SMS is sent and only
+# the workflow overhead is measured. Pass --preference email/sms/both to include the Lambda hops.
+import argparse
+import json
+import time
+import boto3
+from report import latency_summary
+
+def find_state_machine(sfn, name):
+    for page in sfn.get_paginator('list_state_machines').paginate():
+        for machine in page['stateMachines']:
+            if machine['name'] == name:
+                return machine['stateMachineArn']
+    raise SystemExit('State machine ' + name + ' not found, deploy the stack first')
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Standard vs Express workflow latency')
+    parser.add_argument('--runs', type = int, default = 50)
+    parser.add_argument('--preference', default = 'none')
+    parser.add_argument('--wait-seconds', type = int, default = 0)
+    parser.add_argument('--standard', default = 'MyStateMachine', help = 'Standard state machine name')
+    parser.add_argument('--express', default = 'MyExpressStateMachine', help = 'Express state machine name')
+    args = parser.parse_args()
+
+    sfn = boto3.client('stepfunctions')
+    standard_arn = find_state_machine(sfn, args.standard)
+    express_arn = find_state_machine(sfn, args.express)
+    payload = json.dumps({
+        'waitSeconds': args.wait_seconds,
+        'preference': args.preference,
+        'message': 'Latency test',
+        'email': 'someone@something.com',
+        'phone': '+15556667788'
+    })
+
+    results = {'standard start': [], 'standard end-to-end': [], 'express start': [], 'express sync end-to-end': []}
+    for i in range(args.runs):
+        # Standard: time the StartExecution call, then poll until the execution stops
+        began = time.perf_counter()
+        execution_arn = sfn.start_execution(stateMachineArn = standard_arn, input = payload)['executionArn']
+        results['standard start'].append(time.perf_counter() - began)
+        while True:
+            execution = sfn.describe_execution(executionArn = execution_arn)
+            if 'stopDate' in execution:
+                break
+            time.sleep(0.05)
+        results['standard end-to-end'].append((execution['stopDate'] - execution['startDate']).total_seconds())
+
+        # Express asynchronous start, the same call the API handler makes by default
+        began = time.perf_counter()
+        sfn.start_execution(stateMachineArn = express_arn, input = payload)
+        results['express start'].append(time.perf_counter() - began)
+
+        # Express synchronous run covers the whole workflow in one call
+        began = time.perf_counter()
+        sfn.start_sync_execution(stateMachineArn = express_arn, input = payload)
+        results['express sync end-to-end'].append(time.perf_counter() - began)
+
+    for name, values in results.items():
+        print(latency_summary(name, values))
+
+if __name__ == '__main__':
+    main()
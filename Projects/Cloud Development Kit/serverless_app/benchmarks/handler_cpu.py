@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# CPU time api_handler spends per request, with Step Functions stubbed out so only the handler itself is measured
+#
+#   python3 benchmarks/handler_cpu.py --requests 20000 --compare HEAD~1
+#
+# Each request kind (a valid reminder, one failing validation and a batch of 25) runs in its own fresh
+# interpreter. --compare also measures src/ as it was at a git revision, for a before and after.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REMINDER = {'waitSeconds': '300', 'preference': 'both', 'message': 'Feed the cat', 'email': 'someone@something.com', 'phone': '+15556667788'}
+
+KINDS = {
+    'valid': {'resource': '/reminders', 'body': json.dumps(REMINDER)},
+    'invalid': {'resource': '/reminders', 'body': json.dumps(dict(REMINDER, waitSeconds = 'soon'))},
+    'batch of 25': {'resource': '/reminders/batch', 'body': json.dumps([REMINDER] * 25)},
+}
+
+# Runs in the child interpreter, prints the CPU microseconds per request as JSON
+def worker(src, kind, requests):
+    sys.path[:0] = [ROOT, os.path.join(src, 'common', 'python'), os.path.join(src, 'api_handler')]
+    from local.fakes import FakeStepFunctions
+    import api_handler
+    try:
+        from reminders_common import metrics
+        metrics.emit = lambda line: None
+        metrics.LOG_SAMPLE_RATE = 0
+    except ImportError:
+        pass
+
+    stepfunctions = FakeStepFunctions()
+    api_handler.sfn = lambda: stepfunctions
+    event = dict(KINDS[kind], httpMethod = 'POST', headers = {'Content-type': 'application/json'})
+    with open(os.devnull, 'w') as devnull:
+        # Older handlers print every event
+        stdout, sys.stdout = sys.stdout, devnull
+        for i in range(min(1000, requests)):
+            api_handler.lambda_handler(dict(event), None)
+        began = time.process_time()
+        for i in range(requests):
+            api_handler.lambda_handler(dict(event), None)
+        elapsed = time.process_time() - began
+        sys.stdout = stdout
+    print(json.dumps(elapsed / requests * 1e6))
+
+def measure(src, requests):
+    results = {}
+    for kind in KINDS:
+        output = subprocess.run([sys.executable, __file__, '--worker', src, '--kind', kind, '--requests', str(requests)],
+                                capture_output = True, text = True, check = True).stdout
+        results[kind] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+# src/ of a git revision in a temporary directory
+def checkout(revision, target):
+    archive = subprocess.run(['git', 'archive', revision, 'src'], cwd = ROOT, capture_output = True, check = True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input = archive, check = True)
+    return os.path.join(target, 'src')
+
+def main():
+    parser = argparse.ArgumentParser(description = 'CPU time per request of api_handler')
+    parser.add_argument('--requests', type = int, default = 20000)
+    parser.add_argument('--compare', help = 'git revision to measure as well')
+    parser.add_argument('--worker', help = argparse.SUPPRESS)
+    parser.add_argument('--kind', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.kind, args.requests)
+
+    trees = [('working tree', os.path.join(ROOT, 'src'))]
+    temporary = None
+    if args.compare:
+        temporary = tempfile.mkdtemp()
+        trees.insert(0, (args.compare, checkout(args.compare, temporary)))
+    try:
+        results = [(name, measure(src, args.requests)) for name, src in trees]
+    finally:
+        if temporary:
+            shutil.rmtree(temporary)
+
+    print('%-16s' % 'us per request' + ''.join('%16s' % name for name, result in results))
+    for kind in KINDS:
+        print('%-16s' % kind + ''.join('%16.1f' % result[kind] for name, result in results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Compare the Lambda and SDK integrations of the reminder state machine
+#
+#   python3 benchmarks/integration_compare.py --synth --reminders 10000
+#
+# --synth builds the stack both ways (needs aws-cdk-lib) and prints a diff of the Standard state machine
+# definition and of the resources in each template. The latency model then samples the time each send task
+# takes: the Lambda path pays the invoke overhead and, now and then, a cold start on top of the SES/SNS call
+# that both paths make.
+import argparse
+import difflib
+import json
+import os
+import random
+import sys
+from report import latency_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local.asl import render_tokens
+
+# Model parameters in milliseconds, all of them can be overridden on the command line
+DEFAULTS = {
+    'task_overhead': 20.0,
+    'invoke_overhead': 15.0,
+    'cold_start': 350.0,
+    'cold_rate': 0.05,
+    'ses_call': 80.0,
+    'sns_call': 60.0,
+    'jitter': 0.35
+}
+
+def synth(integration):
+    import aws_cdk as cdk
+    from serverless_app.serverless_app_stack import ServerlessAppStack
+
+    app = cdk.App()
+    ServerlessAppStack(app, 'ServerlessAppStack', integration = integration, bundle_sdk = False)
+    return app.synth().get_stack_by_name('ServerlessAppStack').template
+
+def definition(template):
+    properties = template['Resources']['stepFunction']['Properties']
+    return json.dumps(json.loads(render_tokens(properties['DefinitionString'])), indent = 2, sort_keys = True).splitlines()
+
+def resource_counts(template):
+    counts = {}
+    for resource in template['Resources'].values():
+        counts[resource['Type']] = counts.get(resource['Type'], 0) + 1
+    return counts
+
+def print_synth_diff():
+    # bundling builds the function assets relative to the project directory
+    os.chdir(ROOT)
+    lambda_template = synth('lambda')
+    sdk_template = synth('sdk')
+
+    print('State machine definition, lambda -> sdk')
+    for line in difflib.unified_diff(definition(lambda_template), definition(sdk_template), 'lambda', 'sdk', lineterm = ''):
+        print(line)
+
+    print()
+    print('%-40s %8s %8s' % ('resource type', 'lambda', 'sdk'))
+    lambda_counts = resource_counts(lambda_template)
+    sdk_counts = resource_counts(sdk_template)
+    for resource_type in sorted(set(lambda_counts) | set(sdk_counts)):
+        marker = '' if lambda_counts.get(resource_type) == sdk_counts.get(resource_type) else '  *'
+        print('%-40s %8d %8d%s' % (resource_type, lambda_counts.get(resource_type, 0), sdk_counts.get(resource_type, 0), marker))
+    print()
+
+def sample(median, jitter):
+    return median * random.lognormvariate(0, jitter)
+
+# Time of one send task in milliseconds
+def task_ms(integration, service, model):
+    elapsed = sample(model['task_overhead'], model['jitter']) + sample(model[service + '_call'], model['jitter'])
+    if integration == 'lambda':
+        elapsed += sample(model['invoke_overhead'], model['jitter'])
+        if random.random() < model['cold_rate']:
+            elapsed += sample(model['cold_start'], model['jitter'])
+    return elapsed
+
+# Time from the Choice state to NextState for one reminder, 'both' waits for the slower of its two branches
+def reminder_ms(integration, preference, model):
+    if preference == 'email':
+        return task_ms(integration, 'ses', model)
+    if preference == 'sms':
+        return task_ms(integration, 'sns', model)
+    return sample(model['task_overhead'], model['jitter']) + max(task_ms(integration, 'ses', model), task_ms(integration, 'sns', model))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Lambda vs SDK integration of the reminder state machine')
+    parser.add_argument('--synth', action = 'store_true', help = 'diff the synthesized templates, needs aws-cdk-lib')
+    parser.add_argument('--reminders', type = int, default = 10000, help = 'reminders sampled per preference')
+    parser.add_argument('--seed', type = int, default = 1)
+    for name, value in DEFAULTS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type = float, default = value)
+    args = parser.parse_args()
+
+    if args.synth:
+        print_synth_diff()
+
+    random.seed(args.seed)
+    model = {name: getattr(args, name) for name in DEFAULTS}
+    for preference in ('email', 'sms', 'both'):
+        for integration in ('lambda', 'sdk'):
+            # latency_summary takes seconds
+            values = [reminder_ms(integration, preference, model) / 1000.0 for i in range(args.reminders)]
+            print(latency_summary(preference + ' via ' + integration, values))
+
+    invocations = {'email': 1, 'sms': 1, 'both': 2}
+    print()
+    print('Lambda invocations per 1000 reminders: ' + ', '.join(
+        '%s %d (sdk 0)' % (preference, count * 1000) for preference, count in invocations.items()
+    ))
+
+if __name__ == '__main__':
+    main()
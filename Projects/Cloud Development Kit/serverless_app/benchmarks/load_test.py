@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Drive POST /reminders at a fixed rate and report latency percentiles, error classes and achieved throughput
+#
+#   python3 benchmarks/load_test.py --rate 500 --duration 30 --mix email=2,sms=1,both=1
+#   python3 benchmarks/load_test.py --url https://example1a2s3d.execute-api.us-east-1.amazonaws.com/prod/reminders --rate 50
+#
+# Without --url requests go to api_handler in this process, through local/api.py, with Step Functions replaced
+# by an in-process stub. Arrivals are open loop: request i is due at i / rate seconds whether or not earlier ones
+# have answered, and its latency counts from when it was due, so time spent queued behind --concurrency is
+# not hidden. --rate 0 sends as fast as --concurrency allows instead.
+import argparse
+import asyncio
+import collections
+import json
+import os
+import ssl
+import sys
+import time
+import uuid
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python'), os.path.join(ROOT, 'src', 'api_handler')]
+
+from report import latency_summary
+
+# Same body as sendData in formlogic.js, where every field is the string value of an input box
+def payload(preference, i, wait_seconds):
+    return json.dumps({
+        'waitSeconds': str(wait_seconds),
+        'preference': preference,
+        'message': 'Load test ' + str(i),
+        'email': 'someone@something.com',
+        'phone': '+15556667788'
+    })
+
+# 'email=2,sms=1' -> ['email', 'email', 'sms'], picked round robin so any run follows the mix exactly
+def preference_cycle(mix):
+    weights = []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        weights.append((name.strip(), int(weight or 1)))
+    return [name for name, weight in weights for i in range(weight)]
+
+# Minimal HTTP/1.1 client with keep-alive connections, one request per connection at a time
+class HttpTarget:
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self.idle = []
+
+    async def request(self, method, path, body=None, headers=None):
+        connection = self.idle.pop() if self.idle else await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        try:
+            status, response_headers, response_body = await asyncio.wait_for(self.exchange(connection, method, body, headers or {}), self.timeout)
+        except BaseException:
+            connection[1].close()
+            raise
+        if response_headers.get('connection', '').lower() == 'close':
+            connection[1].close()
+        else:
+            self.idle.append(connection)
+        return status, response_headers, response_body
+
+    async def exchange(self, connection, method, body, headers):
+        reader, writer = connection
+        data = (body or '').encode('utf-8')
+        lines = [method + ' ' + self.path + ' HTTP/1.1', 'Host: ' + self.host, 'Content-Length: ' + str(len(data))]
+        lines += [name + ': ' + value for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + data)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            response_body = b''.join(chunks)
+        else:
+            response_body = await reader.readexactly(int(response_headers.get('content-length', '0')))
+        return status, response_headers, response_body.decode('utf-8', 'replace')
+
+    def close(self):
+        for reader, writer in self.idle:
+            writer.close()
+
+# The handler in this process, with Step Functions answering after sfn_latency seconds and throttling past sfn_limit calls
+# a second. payload_version '2.0' sends the events of the HTTP API variant.
+def local_target(concurrency, sfn_latency, sfn_limit, payload_version = '1.0'):
+    from local.api import LocalApi
+    from local.fakes import FakeStepFunctions
+    from reminders_common import metrics
+    import api_handler
+
+    metrics.emit = lambda line: None
+    metrics.LOG_SAMPLE_RATE = 0
+    stepfunctions = FakeStepFunctions(latency = sfn_latency, limit = sfn_limit)
+    api_handler.sfn = lambda: stepfunctions
+    return LocalApi(api_handler.lambda_handler, concurrency = concurrency, payload_version = payload_version)
+
+# How a response counts: None for a success, otherwise the error class it is reported under
+def classify(status, body):
+    if status >= 400:
+        try:
+            reason = json.loads(body).get('Reason') or json.loads(body).get('message')
+        except (ValueError, AttributeError):
+            reason = None
+        return 'HTTP ' + str(status) + (' ' + reason if reason else '')
+    return None
+
+async def run(target, path, args):
+    preferences = preference_cycle(args.mix)
+    total = args.requests or (int(args.rate * args.duration) if args.rate else None)
+    in_flight = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    service_times = []
+    errors = collections.Counter()
+    statuses = collections.Counter()
+
+    # The closed loop takes the slot before creating the request, the open loop once the request is due
+    async def send(i, due, holding):
+        if not holding:
+            await in_flight.acquire()
+        try:
+            began = time.perf_counter()
+            headers = {'Content-type': 'application/json', 'Idempotency-Key': uuid.uuid4().hex}
+            try:
+                status, response_headers, body = await target.request('POST', path, payload(preferences[i % len(preferences)], i, args.wait_seconds), headers)
+            except asyncio.TimeoutError:
+                status, error = None, 'Timeout'
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                status, error = None, type(e).__name__
+            else:
+                error = classify(status, body)
+            finished = time.perf_counter()
+        finally:
+            in_flight.release()
+        statuses[status] += 1
+        if error is None:
+            latencies.append(finished - due)
+            service_times.append(finished - began)
+        else:
+            errors[error] += 1
+
+    tasks = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    i = 0
+    while (total is None or i < total) and time.perf_counter() < deadline:
+        if args.rate:
+            due = start + i / args.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await in_flight.acquire()
+            due = time.perf_counter()
+        tasks.append(asyncio.ensure_future(send(i, due, not args.rate)))
+        i += 1
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    print('target            : ' + (args.url or 'local api_handler'))
+    print('requests          : %d in %.2fs' % (i, elapsed))
+    if args.rate:
+        print('offered rate      : %.0f/s' % args.rate)
+    print('achieved rate     : %.0f/s (%.0f/s succeeded)' % (i / elapsed, len(latencies) / elapsed))
+    print(latency_summary('latency', latencies))
+    print(latency_summary('service time', service_times))
+    print('status codes      : ' + ', '.join('%s=%d' % (status, count) for status, count in sorted(statuses.items(), key = lambda item: str(item[0]))))
+    for error, count in errors.most_common():
+        print('  %-50s %d' % (error, count))
+    if getattr(target, 'errors', None):
+        print('raised by the handler: ' + ', '.join('%s=%d' % item for item in target.errors.most_common()))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Load generator for POST /reminders')
+    parser.add_argument('--url', help = 'POST /reminders endpoint of a deployed stack, the local handler when left out')
+    parser.add_argument('--rate', type = float, default = 100, help = 'requests per second, 0 for as fast as the concurrency allows')
+    parser.add_argument('--duration', type = float, default = 10, help = 'seconds to send for')
+    parser.add_argument('--requests', type = int, help = 'stop after this many requests instead')
+    parser.add_argument('--concurrency', type = int, default = 50, help = 'requests in flight at most')
+    parser.add_argument('--mix', default = 'email=1,sms=1,both=1', help = 'preference weights')
+    parser.add_argument('--wait-seconds', type = int, default = 300)
+    parser.add_argument('--timeout', type = float, default = 30, help = 'seconds before a request counts as timed out')
+    parser.add_argument('--lambda-concurrency', type = int, default = 100, help = 'local only, api_handler instances')
+    parser.add_argument('--sfn-latency', type = float, default = 0.03, help = 'local only, seconds StartExecution takes')
+    parser.add_argument('--sfn-limit', type = int, help = 'local only, StartExecution calls a second before throttling')
+    parser.add_argument('--payload-version', choices = ['1.0', '2.0'], default = '1.0', help = 'local only, 2.0 for the events of the HTTP API variant')
+    args = parser.parse_args()
+
+    async def start():
+        if args.url:
+            target, path = HttpTarget(args.url, args.timeout), urlsplit(args.url).path
+        else:
+            target, path = local_target(args.lambda_concurrency, args.sfn_latency, args.sfn_limit, args.payload_version), '/reminders'
+        try:
+            await run(target, path, args)
+        finally:
+            target.close()
+
+    asyncio.run(start())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Find the memory size of a deployed function with the best cost/latency trade-off, by replaying recorded events
+#
+#   python3 benchmarks/power_tuning.py --function api_handler --events events.log --memory 128,256,512,1024,1769
+#
+# --events takes one event per line, either as JSON or as the 'EVENT: {...}' lines the functions log for a
+# LOG_SAMPLE_RATE share of their invocations, so an export of the function's log group works as is. Every
+# memory size is set on $LATEST in turn, warmed up with one invocation and then timed from the REPORT lines
+# Lambda returns. The original memory size is put back at the end. Traffic going through the 'live' alias
+# is not affected, but the replayed events really run: api_handler starts the reminders and email and sms
+# send them, so record events that go to test addresses.
+import argparse
+import base64
+import json
+import re
+import time
+import boto3
+from report import percentile
+
+# Price per GB-second and per request, us-east-1 and eu-west-1
+GB_SECOND_PRICE = {'x86_64': 0.0000166667, 'arm64': 0.0000133334}
+REQUEST_PRICE = 0.0000002
+
+REPORT = re.compile(r'REPORT RequestId: \S+\s+Duration: ([0-9.]+) ms\s+Billed Duration: ([0-9]+) ms\s+Memory Size: ([0-9]+) MB\s+Max Memory Used: ([0-9]+) MB')
+
+def read_events(path):
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if 'EVENT: ' in line:
+                line = line[line.index('EVENT: ') + len('EVENT: '):]
+            if line:
+                events.append(json.loads(line))
+    if not events:
+        raise SystemExit('No events in ' + path)
+    return events
+
+# (duration ms, billed ms, max memory used MB) from the log tail of one invocation
+def parse_report(log):
+    match = REPORT.search(log)
+    if match is None:
+        return None
+    return float(match.group(1)), int(match.group(2)), int(match.group(4))
+
+def cost(billed_ms, memory, architecture):
+    return billed_ms / 1000.0 * memory / 1024.0 * GB_SECOND_PRICE[architecture] + REQUEST_PRICE
+
+def set_memory(client, function, memory):
+    client.update_function_configuration(FunctionName = function, MemorySize = memory)
+    client.get_waiter('function_updated').wait(FunctionName = function)
+
+def invoke(client, function, event):
+    response = client.invoke(FunctionName = function, Qualifier = '$LATEST', LogType = 'Tail', Payload = json.dumps(event).encode('utf-8'))
+    return response.get('FunctionError'), parse_report(base64.b64decode(response.get('LogResult', '')).decode('utf-8', 'replace'))
+
+def measure(client, function, events, memory, invocations, architecture):
+    set_memory(client, function, memory)
+    # A new configuration always starts cold, the first invocation is left out
+    invoke(client, function, events[0])
+    durations, costs, used, errors = [], [], [], 0
+    for i in range(invocations):
+        error, report = invoke(client, function, events[i % len(events)])
+        if error:
+            errors += 1
+        if report is not None:
+            duration, billed, max_used = report
+            durations.append(duration)
+            costs.append(cost(billed, memory, architecture))
+            used.append(max_used)
+    return {
+        'memory': memory,
+        'p50': percentile(durations, 50),
+        'p90': percentile(durations, 90),
+        'p99': percentile(durations, 99),
+        'cost': sum(costs) / len(costs) if costs else 0.0,
+        'max_used': max(used) if used else 0,
+        'errors': errors
+    }
+
+# 'cost' takes the cheapest, 'speed' the lowest p90, 'balanced' the lowest sum of cost and p90 each relative to
+# their worst value, results above max_p90 ms are never picked
+def choose(results, strategy = 'balanced', max_p90 = None):
+    candidates = [result for result in results if not result['errors'] and (max_p90 is None or result['p90'] <= max_p90)]
+    if not candidates:
+        return None
+    if strategy == 'cost':
+        return min(candidates, key = lambda result: (result['cost'], result['p90']))
+    if strategy == 'speed':
+        return min(candidates, key = lambda result: (result['p90'], result['cost']))
+    worst_cost = max(result['cost'] for result in candidates) or 1.0
+    worst_p90 = max(result['p90'] for result in candidates) or 1.0
+    return min(candidates, key = lambda result: result['cost'] / worst_cost + result['p90'] / worst_p90)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Power tuning of a deployed function from recorded events')
+    parser.add_argument('--function', required = True, help = 'function name, e.g. api_handler')
+    parser.add_argument('--events', required = True, help = 'file of recorded events')
+    parser.add_argument('--memory', default = '128,256,512,1024,1769,3008', help = 'memory sizes in MB to try')
+    parser.add_argument('--invocations', type = int, default = 50, help = 'timed invocations per memory size')
+    parser.add_argument('--strategy', choices = ['cost', 'speed', 'balanced'], default = 'balanced')
+    parser.add_argument('--max-p90', type = float, help = 'ms, memory sizes slower than this are not picked')
+    args = parser.parse_args()
+
+    client = boto3.client('lambda')
+    events = read_events(args.events)
+    configuration = client.get_function_configuration(FunctionName = args.function)
+    architecture = configuration.get('Architectures', ['x86_64'])[0]
+
+    results = []
+    began = time.perf_counter()
+    try:
+        for memory in [int(memory) for memory in args.memory.split(',')]:
+            results.append(measure(client, args.function, events, memory, args.invocations, architecture))
+    finally:
+        set_memory(client, args.function, configuration['MemorySize'])
+
+    print('%8s %10s %10s %10s %14s %10s %7s' % ('MB', 'p50 ms', 'p90 ms', 'p99 ms', '$ per 1M', 'used MB', 'errors'))
+    for result in results:
+        print('%8d %10.1f %10.1f %10.1f %14.2f %10d %7d' % (
+            result['memory'], result['p50'], result['p90'], result['p99'], result['cost'] * 1e6, result['max_used'], result['errors']))
+    print('%d events replayed on %s in %.0fs' % (len(events), architecture, time.perf_counter() - began))
+
+    best = choose(results, args.strategy, args.max_p90)
+    if best is None:
+        print('No memory size ran without errors within the limits')
+        return
+    print('%s pick: %d MB, deploy with -c memory_sizes=%s=%d' % (args.strategy, best['memory'], args.function, best['memory']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+# Small helpers shared by the benchmark scripts
+import math
+
+# Nearest-rank percentile
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+# One line summary of a list of latencies in seconds, reported in milliseconds
+def latency_summary(name, values):
+    if not values:
+        return '%-28s n=0' % name
+    return '%-28s n=%-6d p50=%8.1fms p90=%8.1fms p99=%8.1fms max=%8.1fms' % (
+        name, len(values),
+        percentile(values, 50) * 1000, percentile(values, 90) * 1000,
+        percentile(values, 99) * 1000, max(values) * 1000
+    )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Compare a full and an incremental website deploy against an in-process S3 and CloudFront
+#
+#   python3 benchmarks/site_deploy.py --latency 0.02
+#
+# Deploys the website build to an empty bucket, changes one stylesheet and the page that links it and deploys
+# again, then reports the uploads, deletes and invalidated paths of each run.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from local.fakes import FakeCloudFront, FakeS3
+from serverless_app import site_sync, website
+
+def deploy(name, s3, cloudfront, site_dir, now):
+    began = time.perf_counter()
+    result = site_sync.sync(s3, cloudfront, 'website-bucket', 'deploy-bucket', 'DISTRIBUTION', site_dir = site_dir, now = now)
+    print('%-12s %6.2fs uploaded=%-4d (%d bytes) unchanged=%-4d deleted=%-3d kept=%-3d invalidated=%s' % (
+        name, time.perf_counter() - began, result['uploaded'], result['uploaded_bytes'], result['unchanged'],
+        result['deleted'], result['kept_stale'], result['invalidated']
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Incremental website deploy against a local S3 stand-in')
+    parser.add_argument('--latency', type = float, default = 0.02, help = 'stub S3 seconds per put')
+    args = parser.parse_args()
+
+    s3, cloudfront = FakeS3(latency = args.latency), FakeCloudFront()
+    work = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work, 'src')
+        shutil.copytree(website.SOURCE_DIR, source)
+        site_dir = os.path.join(work, 'site')
+
+        website.build(source, site_dir)
+        deploy('first', s3, cloudfront, site_dir, now = 0)
+        deploy('unchanged', s3, cloudfront, site_dir, now = 60)
+
+        with open(os.path.join(source, 'main.css'), 'a') as f:
+            f.write('\nbody { margin: 0; }\n')
+        website.build(source, site_dir)
+        deploy('css change', s3, cloudfront, site_dir, now = 120)
+        # Past the grace period the replaced stylesheet is deleted
+        deploy('next day', s3, cloudfront, site_dir, now = 120 + 86400)
+    finally:
+        shutil.rmtree(work)
+    print('S3 requests: ' + str(s3.requests))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Measure sustained throughput of the SMS dispatcher against a stubbed SNS client
+#
+#   python3 benchmarks/sms_benchmark.py --messages 2000 --rate 200 --sns-limit 250 --latency 0.02
+#
+# The sustained rate counts the publishes after the first --warmup seconds, when the initial burst is spent. The
+# busiest second is the most publishes SNS saw in any one second window, which has to stay under --sns-limit.
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python'), os.path.join(ROOT, 'src', 'sms')]
+
+from local.fakes import FakeSns
+from sms_dispatcher import SmsDispatcher
+
+def main():
+    parser = argparse.ArgumentParser(description = 'SMS dispatcher throughput benchmark')
+    parser.add_argument('--messages', type = int, default = 2000, help = 'reminders to send')
+    parser.add_argument('--batch', type = int, default = 100, help = 'reminders per dispatch call')
+    parser.add_argument('--rate', type = float, default = 200, help = 'dispatcher cap in messages per second')
+    parser.add_argument('--workers', type = int, default = 16, help = 'publish threads')
+    parser.add_argument('--sns-limit', type = int, default = 250, help = 'stub SNS throttling limit per second')
+    parser.add_argument('--latency', type = float, default = 0.02, help = 'stub SNS publish latency in seconds')
+    parser.add_argument('--warmup', type = float, default = 1.0, help = 'seconds left out of the sustained rate')
+    parser.add_argument('--duplicates', type = float, default = 0.05, help = 'fraction of repeated phone+message pairs')
+    args = parser.parse_args()
+
+    sns = FakeSns(latency = args.latency, limit = args.sns_limit)
+    dispatcher = SmsDispatcher(sns, args.rate, workers = args.workers)
+    repeat_every = int(1 / args.duplicates) if args.duplicates else 0
+    reminders = []
+    for i in range(args.messages):
+        n = i - 1 if repeat_every and i % repeat_every == 0 and i else i
+        reminders.append({'phone': '+1555%07d' % n, 'message': 'Feed the cat ' + str(n)})
+
+    counts = {'sent': 0, 'duplicate': 0, 'failed': 0}
+    began = time.perf_counter()
+    for i in range(0, len(reminders), args.batch):
+        for result in dispatcher.dispatch(reminders[i:i + args.batch]):
+            counts[result['status']] += 1
+    elapsed = time.perf_counter() - began
+
+    times = sns.published_at
+    after_warmup = [t for t in times if t >= times[0] + args.warmup] if times else []
+    busiest = 0
+    first = 0
+    for last, t in enumerate(times):
+        while t - times[first] >= 1.0:
+            first += 1
+        busiest = max(busiest, last - first + 1)
+
+    print('reminders          : ' + str(args.messages))
+    print('sent               : ' + str(counts['sent']))
+    print('duplicates skipped : ' + str(counts['duplicate']))
+    print('failed             : ' + str(counts['failed']))
+    print('throttled retries  : ' + str(dispatcher.throttled))
+    print('elapsed            : %.2fs' % elapsed)
+    print('overall rate       : %.1f messages/s' % (counts['sent'] / elapsed))
+    if len(after_warmup) > 1:
+        print('sustained rate     : %.1f messages/s after %.1fs warm-up (cap %.0f/s)' % ((len(after_warmup) - 1) / (after_warmup[-1] - after_warmup[0]), args.warmup, args.rate))
+    else:
+        print('sustained rate     : run too short for a %.1fs warm-up' % args.warmup)
+    print('busiest second     : %d messages (SNS limit %d/s)' % (busiest, args.sns_limit))
+
+if __name__ == '__main__':
+    main()
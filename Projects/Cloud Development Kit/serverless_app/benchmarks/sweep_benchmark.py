@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Measure how fast the bucket scheduler sweeper drains pending reminders, using an in-process table
+#
+#   python3 benchmarks/sweep_benchmark.py --pending 1000000
+#   python3 benchmarks/sweep_benchmark.py --pending 5000 --minutes 1 --latency 0.02 --email-rate 200 --sms-rate 200 --ses-limit 250 --sns-limit 250
+#
+# SES and SNS are stubs that take --latency seconds per send and throttle past --ses-limit and --sns-limit sends a
+# second, 0 never throttles. The sweeper paces its sends at --email-rate and --sms-rate, 0 sends as fast as the
+# threads allow. The defaults measure the sweep itself, the limits and rates show what the pacing saves.
+# Reminders that were throttled are rescheduled, as in a real sweep.
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python'), os.path.join(ROOT, 'src', 'scheduler')]
+
+from local.fakes import FakeSes, FakeSns, FakeTable
+from reminders_common.schedule import BUCKET_SECONDS, new_item
+import sweeper
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Sweep throughput benchmark for the bucket scheduler')
+    parser.add_argument('--pending', type = int, default = 1000000, help = 'number of pending reminders')
+    parser.add_argument('--minutes', type = int, default = 60, help = 'minutes the due times are spread over')
+    parser.add_argument('--shards', type = int, default = sweeper.SHARDS, help = 'shards per minute bucket')
+    parser.add_argument('--workers', type = int, default = sweeper.DISPATCH_WORKERS, help = 'dispatch threads')
+    parser.add_argument('--email-rate', type = float, default = 0, help = 'sweeper email cap per second, 0 for none')
+    parser.add_argument('--sms-rate', type = float, default = 0, help = 'sweeper SMS cap per second, 0 for none')
+    parser.add_argument('--ses-limit', type = int, default = 0, help = 'stub SES sends per second before throttling, 0 for none')
+    parser.add_argument('--sns-limit', type = int, default = 0, help = 'stub SNS publishes per second before throttling, 0 for none')
+    parser.add_argument('--latency', type = float, default = 0, help = 'stub seconds per send')
+    args = parser.parse_args()
+
+    table = FakeTable()
+    start = (int(time.time()) // BUCKET_SECONDS) * BUCKET_SECONDS
+    preferences = ['email', 'sms', 'both']
+
+    # Fill the table with reminders due evenly across the window
+    began = time.perf_counter()
+    for i in range(args.pending):
+        data = {
+            'waitSeconds': (i * args.minutes * BUCKET_SECONDS) // args.pending,
+            'preference': preferences[i % 3],
+            'message': 'Feed the cat',
+            'email': 'someone@something.com',
+            'phone': '+15556667788'
+        }
+        table.put_item(Item = new_item(data, start, args.shards))
+    load_seconds = time.perf_counter() - began
+
+    ses = FakeSes(latency = args.latency, limit = args.ses_limit or None)
+    sns = FakeSns(latency = args.latency, limit = args.sns_limit or None)
+    def send_email(data):
+        ses.send_email(Source = 'sender', Destination = {'ToAddresses': [data['email']]}, Message = {'Body': {'Text': {'Data': data['message']}}})
+    def send_sms(data):
+        sns.publish(PhoneNumber = data['phone'], Message = data['message'])
+
+    # Sweep once at the end of the window so every bucket is due
+    sweeper.LOOKBACK_MINUTES = args.minutes + 1
+    with ThreadPoolExecutor(max_workers = args.workers) as executor:
+        worker = sweeper.Sweeper(table, send_email, send_sms, executor, shards = args.shards,
+                                 email_rate = args.email_rate, sms_rate = args.sms_rate, burst = args.workers)
+        began = time.perf_counter()
+        stats = worker.sweep(start + args.minutes * BUCKET_SECONDS)
+        sweep_seconds = time.perf_counter() - began
+
+    print('pending reminders : ' + str(args.pending))
+    print('load time         : %.2fs' % load_seconds)
+    print('buckets swept     : ' + str(stats['buckets']))
+    print('reminders sent    : %d (%d emails, %d sms)' % (stats['sent'], len(ses.sent), len(sns.published)))
+    print('throttled         : %d emails, %d sms' % (ses.throttled, sns.throttled))
+    print('rescheduled       : %d, dropped %d' % (stats['retried'], stats['dropped']))
+    print('left in table     : ' + str(len(table) - 1))
+    print('sweep time        : %.2fs' % sweep_seconds)
+    print('sweep throughput  : %.0f reminders/s' % (stats['sent'] / sweep_seconds))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import asyncio
+import base64
+import collections
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# In-process stand-in for the API Gateway proxy integration in front of api_handler
+#
+# Requests are turned into the proxy event API Gateway sends, the handler runs on a thread pool the size of
+# the function's concurrency, and an unhandled error is answered the way API Gateway answers it, with a 502.
+# A request that finds every instance busy is answered 429, like a Lambda at its concurrency limit. The errors
+# the handler raised are counted in errors by their AWS error code or exception name. payload_version '1.0'
+# sends the events of a REST API, '2.0' those of an HTTP API.
+
+class LocalApi:
+
+    def __init__(self, handler, concurrency=10, stage=None, payload_version='1.0'):
+        self.handler = handler
+        self.event = {'1.0': proxy_event, '2.0': http_event}[payload_version]
+        self.stage = stage or {'1.0': 'prod', '2.0': '$default'}[payload_version]
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.errors = collections.Counter()
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.slots.locked():
+            return 429, {}, json.dumps({'message': 'Too Many Requests'})
+        async with self.slots:
+            event = self.event(method, path, body, headers or {}, self.stage)
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, self.invoke, event)
+        # API Gateway sends base64 encoded bodies on as the bytes they encode
+        body = response.get('body', '')
+        if response.get('isBase64Encoded'):
+            body = base64.b64decode(body)
+        return response.get('statusCode', 200), response.get('headers') or {}, body
+
+    def invoke(self, event):
+        try:
+            return self.handler(event, LambdaContext())
+        except Exception as e:
+            with self.lock:
+                self.errors[getattr(e, 'response', {}).get('Error', {}).get('Code', type(e).__name__)] += 1
+            return {'statusCode': 502, 'body': json.dumps({'message': 'Internal server error'})}
+
+# Only the fields api_handler reads are filled in
+def proxy_event(method, path, body, headers, stage='prod'):
+    return {
+        'resource': path,
+        'path': path,
+        'httpMethod': method,
+        'headers': headers,
+        'queryStringParameters': None,
+        'body': body,
+        'isBase64Encoded': False,
+        'requestContext': {
+            'resourcePath': path,
+            'httpMethod': method,
+            'stage': stage,
+            'requestId': str(uuid.uuid4()),
+            'requestTimeEpoch': int(time.time() * 1000)
+        }
+    }
+
+# HTTP API events have lower case header names and no body key without a body, routes are on the $default stage
+def http_event(method, path, body, headers, stage='$default'):
+    now = time.time()
+    event = {
+        'version': '2.0',
+        'routeKey': method + ' ' + path,
+        'rawPath': path,
+        'rawQueryString': '',
+        'headers': {name.lower(): value for name, value in headers.items()},
+        'isBase64Encoded': False,
+        'requestContext': {
+            'http': {'method': method, 'path': path},
+            'routeKey': method + ' ' + path,
+            'stage': stage,
+            'requestId': str(uuid.uuid4()),
+            'time': time.strftime('%d/%b/%Y:%H:%M:%S +0000', time.gmtime(now)),
+            'timeEpoch': int(now * 1000)
+        }
+    }
+    if body is not None:
+        event['body'] = body
+    return event
+
+class LambdaContext:
+
+    function_name = 'api_handler'
+    memory_limit_in_mb = 128
+
+    def __init__(self, timeout=30):
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.time() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.time()) * 1000))
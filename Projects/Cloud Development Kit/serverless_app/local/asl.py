@@ -0,0 +1,421 @@
+import collections
+import datetime
+import functools
+import heapq
+import itertools
+import json
+
+# Offline interpreter for the parts of the Amazon States Language the reminder workflow uses
+#
+# Executions run on a virtual clock: Wait states and task latencies only move the simulator's time forward, so
+# a million reminders spread over a day replay in as long as their task handlers take to run. Supported states
+# are Pass, Wait, Choice, Task, Parallel, Succeed and Fail, with InputPath, Parameters, ResultSelector,
+# ResultPath, OutputPath, Retry and Catch.
+
+# Raised for ASL errors, and used to carry a failed task's error name and cause
+class StatesError(Exception):
+
+    def __init__(self, error, cause=''):
+        super().__init__(error, cause)
+        self.error = error
+        self.cause = cause
+
+class Simulator:
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.queue = []
+        self.sequence = itertools.count()
+
+    def at(self, when, callback, *args):
+        heapq.heappush(self.queue, (when, next(self.sequence), callback, args))
+
+    def after(self, delay, callback, *args):
+        self.at(self.now + max(0.0, delay), callback, *args)
+
+    # Run events in time order until there are none left, or none before until
+    def run(self, until=None):
+        while self.queue and (until is None or self.queue[0][0] <= until):
+            when, sequence, callback, args = heapq.heappop(self.queue)
+            self.now = when
+            callback(*args)
+        if until is not None:
+            self.now = max(self.now, until)
+
+# Concurrency limit in front of one task resource, callers past the limit wait in FIFO order
+class Pool:
+
+    def __init__(self, simulator, limit=None):
+        self.simulator = simulator
+        self.limit = limit
+        self.busy = 0
+        self.peak = 0
+        self.calls = 0
+        self.waits = []
+        self.waiting = collections.deque()
+
+    def acquire(self, callback):
+        self.calls += 1
+        if self.limit is None or self.busy < self.limit:
+            self.busy += 1
+            self.peak = max(self.peak, self.busy)
+            self.waits.append(0.0)
+            callback()
+        else:
+            self.waiting.append((self.simulator.now, callback))
+
+    def release(self):
+        if self.waiting:
+            queued_at, callback = self.waiting.popleft()
+            self.waits.append(self.simulator.now - queued_at)
+            callback()
+        else:
+            self.busy -= 1
+
+class Execution:
+
+    def __init__(self, execution_id, data):
+        self.id = execution_id
+        self.input = data
+        self.status = 'RUNNING'
+        self.output = None
+        self.error = None
+        self.cause = None
+        self.started_at = None
+        self.stopped_at = None
+
+class StateMachine:
+
+    # handlers maps a Task state name or resource key to a callable taking the task input and returning its
+    # result, state names win. latency(state_name, resource) gives the virtual seconds a task takes,
+    # concurrency caps the tasks in flight per handler key. on_finish is called with every execution once it
+    # stops.
+    def __init__(self, definition, handlers, simulator=None, latency=None, concurrency=None, on_finish=None):
+        self.definition = json.loads(definition) if isinstance(definition, str) else definition
+        self.simulator = simulator or Simulator()
+        self.latency = latency or (lambda name, resource: 0.0)
+        self.on_finish = on_finish
+        self.ids = itertools.count()
+        self.stats = {'started': 0, 'succeeded': 0, 'failed': 0, 'in_flight': 0, 'peak_in_flight': 0, 'states': collections.Counter()}
+
+        self.handlers = {}
+        self.pools = {}
+        missing = []
+        for name, state in task_states(self.definition):
+            key = name if name in handlers else resource_key(state)
+            if key not in handlers:
+                missing.append(name)
+                continue
+            self.handlers[name] = (handlers[key], key)
+            if key not in self.pools:
+                self.pools[key] = Pool(self.simulator, (concurrency or {}).get(key))
+        if missing:
+            raise ValueError('No handler for task states: ' + ', '.join(missing))
+
+    def start(self, data, at=None):
+        execution = Execution('execution-' + str(next(self.ids)), data)
+        self.simulator.at(self.simulator.now if at is None else at, self.begin, execution)
+        return execution
+
+    def begin(self, execution):
+        execution.started_at = self.simulator.now
+        self.stats['started'] += 1
+        self.stats['in_flight'] += 1
+        self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+        self.enter(self.definition, self.definition['StartAt'], execution.input, execution, lambda output, error: self.finish(execution, output, error))
+
+    def finish(self, execution, output, error):
+        execution.stopped_at = self.simulator.now
+        self.stats['in_flight'] -= 1
+        if error is None:
+            execution.status, execution.output = 'SUCCEEDED', output
+            self.stats['succeeded'] += 1
+        else:
+            execution.status, execution.error, execution.cause = 'FAILED', error.error, error.cause
+            self.stats['failed'] += 1
+        if self.on_finish is not None:
+            self.on_finish(execution)
+
+    # Run states from name on until one has to wait for the clock, done(output, error) ends the branch
+    def enter(self, machine, name, data, execution, done):
+        while True:
+            state = machine['States'][name]
+            self.stats['states'][name] += 1
+            kind = state['Type']
+            try:
+                if kind == 'Choice':
+                    name = choose(state, data)
+                    continue
+                if kind == 'Fail':
+                    return done(None, StatesError(state.get('Error', 'States.Fail'), state.get('Cause', '')))
+                if kind == 'Succeed':
+                    return done(select(select(data, state.get('InputPath', '$')), state.get('OutputPath', '$')), None)
+                if kind == 'Pass':
+                    effective = self.effective_input(state, data, execution, name)
+                    data = self.output(state, data, state['Result'] if 'Result' in state else effective)
+                elif kind == 'Wait':
+                    return self.simulator.after(wait_seconds(state, data, self.simulator.now), self.advance, machine, state, data, execution, done)
+                elif kind == 'Task':
+                    return self.run_task(machine, name, state, data, execution, done, {})
+                elif kind == 'Parallel':
+                    return self.run_parallel(machine, name, state, data, execution, done, {})
+                else:
+                    raise StatesError('States.Runtime', 'Unsupported state type ' + kind)
+            except StatesError as e:
+                return done(None, e)
+            if state.get('End'):
+                return done(data, None)
+            name = state['Next']
+
+    def advance(self, machine, state, data, execution, done):
+        if state.get('End'):
+            done(data, None)
+        else:
+            self.enter(machine, state['Next'], data, execution, done)
+
+    def run_task(self, machine, name, state, data, execution, done, attempts):
+        handler, key = self.handlers[name]
+        pool = self.pools[key]
+
+        def call():
+            try:
+                result, error = handler(self.effective_input(state, data, execution, name)), None
+            except StatesError as e:
+                result, error = None, e
+            except Exception as e:
+                # Same error name Lambda reports for an unhandled exception
+                result, error = None, StatesError(type(e).__name__, str(e))
+            seconds = self.latency(name, state['Resource'])
+            if 'TimeoutSeconds' in state and seconds > state['TimeoutSeconds']:
+                seconds, result, error = state['TimeoutSeconds'], None, StatesError('States.Timeout', name + ' timed out')
+            self.simulator.after(seconds, complete, result, error)
+
+        def complete(result, error):
+            pool.release()
+            if error is not None:
+                return self.handle_error(machine, name, state, data, execution, done, attempts, error,
+                                         lambda: self.run_task(machine, name, state, data, execution, done, attempts))
+            try:
+                output = self.output(state, data, result)
+            except StatesError as e:
+                return done(None, e)
+            self.advance(machine, state, output, execution, done)
+
+        pool.acquire(call)
+
+    def run_parallel(self, machine, name, state, data, execution, done, attempts):
+        try:
+            effective = self.effective_input(state, data, execution, name)
+        except StatesError as e:
+            return done(None, e)
+        branches = state['Branches']
+        results = [None] * len(branches)
+        progress = {'remaining': len(branches), 'failed': False}
+
+        def branch_done(index, output, error):
+            if progress['failed']:
+                return
+            if error is not None:
+                # The first failing branch fails the whole state, the others are left to run out
+                progress['failed'] = True
+                return self.handle_error(machine, name, state, data, execution, done, attempts, error,
+                                         lambda: self.run_parallel(machine, name, state, data, execution, done, attempts))
+            results[index] = output
+            progress['remaining'] -= 1
+            if progress['remaining'] == 0:
+                try:
+                    output = self.output(state, data, results)
+                except StatesError as e:
+                    return done(None, e)
+                self.advance(machine, state, output, execution, done)
+
+        for index, branch in enumerate(branches):
+            self.enter(branch, branch['StartAt'], effective, execution, lambda output, error, index=index: branch_done(index, output, error))
+
+    # Retry the state if a retrier matches and has attempts left, otherwise hand the error to a catcher or fail
+    def handle_error(self, machine, name, state, data, execution, done, attempts, error, retry):
+        for index, retrier in enumerate(state.get('Retry', [])):
+            if matches(retrier['ErrorEquals'], error.error):
+                attempt = attempts.get(index, 0)
+                if attempt < retrier.get('MaxAttempts', 3):
+                    attempts[index] = attempt + 1
+                    delay = retrier.get('IntervalSeconds', 1) * retrier.get('BackoffRate', 2.0) ** attempt
+                    return self.simulator.after(delay, retry)
+                break
+        for catcher in state.get('Catch', []):
+            if matches(catcher['ErrorEquals'], error.error):
+                output = put(data, catcher.get('ResultPath', '$'), {'Error': error.error, 'Cause': error.cause})
+                return self.enter(machine, catcher['Next'], output, execution, done)
+        done(None, error)
+
+    def effective_input(self, state, data, execution, name):
+        effective = select(data, state.get('InputPath', '$'))
+        if 'Parameters' in state:
+            context = {
+                'Execution': {'Id': execution.id, 'Input': execution.input, 'StartTime': execution.started_at},
+                'State': {'Name': name, 'EnteredTime': self.simulator.now}
+            }
+            effective = resolve(state['Parameters'], effective, context)
+        return effective
+
+    def output(self, state, data, result):
+        if 'ResultSelector' in state:
+            result = resolve(state['ResultSelector'], result, {})
+        return select(put(data, state.get('ResultPath', '$'), result), state.get('OutputPath', '$'))
+
+# Every Task state in a definition, including those inside Parallel branches
+def task_states(machine):
+    for name, state in machine['States'].items():
+        if state['Type'] == 'Task':
+            yield name, state
+        for branch in state.get('Branches', []):
+            for item in task_states(branch):
+                yield item
+
+# The function a lambda:invoke task calls, or the Resource of any other task, tasks with the same key share
+# a handler and its concurrency limit
+def resource_key(state):
+    if state['Resource'].endswith(':lambda:invoke'):
+        return state.get('Parameters', {}).get('FunctionName', state['Resource'])
+    return state['Resource']
+
+# Wrap a Lambda handler for a Task state, the lambda:invoke integration passes the event as Payload and
+# returns the handler's result in a Payload field, a plain function ARN passes the event as is
+def lambda_task(handler, context=None):
+    def invoke(data):
+        if isinstance(data, dict) and 'FunctionName' in data and 'Payload' in data:
+            return {'Payload': handler(data['Payload'], context), 'StatusCode': 200}
+        return handler(data, context)
+    return invoke
+
+# Load an ASL definition, or the definition of a state machine in a synthesized CloudFormation template
+def load(path, logical_id=None):
+    with open(path) as f:
+        document = json.load(f)
+    if 'Resources' not in document:
+        return document
+    for resource_id, resource in document['Resources'].items():
+        if resource['Type'] == 'AWS::StepFunctions::StateMachine' and logical_id in (None, resource_id):
+            return json.loads(render_tokens(resource['Properties']['DefinitionString']))
+    raise ValueError('No state machine ' + (logical_id or '') + ' in ' + path)
+
+# Render CloudFormation tokens in a definition as <Ref> or <Resource.Attribute>
+def render_tokens(value):
+    if isinstance(value, str):
+        return value
+    if 'Ref' in value:
+        return '<' + value['Ref'] + '>'
+    if 'Fn::GetAtt' in value:
+        return '<' + '.'.join(value['Fn::GetAtt']) + '>'
+    if 'Fn::Join' in value:
+        separator, parts = value['Fn::Join']
+        return separator.join(render_tokens(part) for part in parts)
+    return '<' + json.dumps(value) + '>'
+
+# Only plain $.a.b paths are supported, a definition has few of them and they are looked up on every state
+@functools.lru_cache(maxsize=None)
+def path_parts(path):
+    if path == '$':
+        return ()
+    if not path.startswith('$.'):
+        raise StatesError('States.Runtime', 'Unsupported path ' + path)
+    return tuple(path[2:].split('.'))
+
+def select(data, path):
+    if path is None:
+        return {}
+    for part in path_parts(path):
+        if not isinstance(data, dict) or part not in data:
+            raise StatesError('States.Runtime', 'Path ' + path + ' not found in the input')
+        data = data[part]
+    return data
+
+def put(data, path, value):
+    if path is None:
+        return data
+    parts = path_parts(path)
+    if not parts:
+        return value
+    result = dict(data) if isinstance(data, dict) else {}
+    target = result
+    for part in parts[:-1]:
+        target[part] = dict(target[part]) if isinstance(target.get(part), dict) else {}
+        target = target[part]
+    target[parts[-1]] = value
+    return result
+
+# Fill in a Parameters or ResultSelector template, keys ending in .$ take a path or a States.Array intrinsic
+def resolve(template, data, context):
+    if isinstance(template, list):
+        return [resolve(item, data, context) for item in template]
+    if not isinstance(template, dict):
+        return template
+    result = {}
+    for key, value in template.items():
+        if key.endswith('.$'):
+            result[key[:-2]] = reference(value, data, context)
+        else:
+            result[key] = resolve(value, data, context)
+    return result
+
+def reference(value, data, context):
+    if value.startswith('$$'):
+        return select(context, value[1:])
+    if value.startswith('States.Array(') and value.endswith(')'):
+        return [reference(argument.strip(), data, context) for argument in value[len('States.Array('):-1].split(',')]
+    return select(data, value)
+
+COMPARATORS = {
+    'StringEquals': lambda a, b: isinstance(a, str) and a == b,
+    'NumericEquals': lambda a, b: is_number(a) and a == b,
+    'NumericLessThan': lambda a, b: is_number(a) and a < b,
+    'NumericLessThanEquals': lambda a, b: is_number(a) and a <= b,
+    'NumericGreaterThan': lambda a, b: is_number(a) and a > b,
+    'NumericGreaterThanEquals': lambda a, b: is_number(a) and a >= b,
+    'BooleanEquals': lambda a, b: isinstance(a, bool) and a == b
+}
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def choose(state, data):
+    for rule in state.get('Choices', []):
+        if evaluate(rule, data):
+            return rule['Next']
+    if 'Default' not in state:
+        raise StatesError('States.NoChoiceMatched', 'No choice rule matched')
+    return state['Default']
+
+def evaluate(rule, data):
+    if 'And' in rule:
+        return all(evaluate(item, data) for item in rule['And'])
+    if 'Or' in rule:
+        return any(evaluate(item, data) for item in rule['Or'])
+    if 'Not' in rule:
+        return not evaluate(rule['Not'], data)
+    if 'IsPresent' in rule:
+        try:
+            select(data, rule['Variable'])
+        except StatesError:
+            return not rule['IsPresent']
+        return rule['IsPresent']
+    value = select(data, rule['Variable'])
+    for name, compare in COMPARATORS.items():
+        if name in rule:
+            return compare(value, rule[name])
+    raise StatesError('States.Runtime', 'Unsupported choice rule ' + json.dumps(rule))
+
+def wait_seconds(state, data, now):
+    if 'Seconds' in state:
+        return state['Seconds']
+    if 'SecondsPath' in state:
+        seconds = select(data, state['SecondsPath'])
+        if not is_number(seconds) or seconds < 0:
+            raise StatesError('States.Runtime', state['SecondsPath'] + ' must be a non-negative number')
+        return seconds
+    timestamp = state['Timestamp'] if 'Timestamp' in state else select(data, state['TimestampPath'])
+    return datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() - now
+
+# States.ALL matches every error, States.TaskFailed every error but a timeout
+def matches(names, error):
+    return error in names or 'States.ALL' in names or ('States.TaskFailed' in names and error != 'States.Timeout')
@@ -0,0 +1,247 @@
+import bisect
+import copy
+import io
+import itertools
+import threading
+import time
+
+# In-process stand-ins for the AWS clients the reminder functions use, so they can be exercised without an account
+
+class FakeTable:
+
+    # Roughly how many reminder items DynamoDB returns in one 1MB query page
+    PAGE_SIZE = 1000
+
+    def __init__(self, hash_key='bucket', range_key='id'):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.partitions = {}
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    # A table without a range_key keeps each item alone in its partition
+    def sort_key(self, key):
+        return key[self.range_key] if self.range_key is not None else None
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        if ConditionExpression is not None:
+            existing = self.partitions.get(Item[self.hash_key], {}).get(self.sort_key(Item))
+            if not condition_holds(ConditionExpression, existing, ExpressionAttributeNames or {}, ExpressionAttributeValues or {}):
+                raise FakeClientError('ConditionalCheckFailedException', 'PutItem')
+        self.partitions.setdefault(Item[self.hash_key], {})[self.sort_key(Item)] = copy.copy(Item)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        item = self.partitions.get(Key[self.hash_key], {}).get(self.sort_key(Key))
+        return {'Item': copy.copy(item)} if item is not None else {}
+
+    def delete_item(self, Key, **kwargs):
+        self.partitions.get(Key[self.hash_key], {}).pop(self.sort_key(Key), None)
+        return {}
+
+    # Only the equality-on-hash-key form the sweeper uses is supported
+    def query(self, ExpressionAttributeValues, Limit=None, ExclusiveStartKey=None, **kwargs):
+        partition = self.partitions.get(next(iter(ExpressionAttributeValues.values())), {})
+        keys = sorted(partition)
+        start = bisect.bisect_right(keys, ExclusiveStartKey[self.range_key]) if ExclusiveStartKey else 0
+        page = keys[start:start + (Limit or self.PAGE_SIZE)]
+        response = {'Items': [copy.copy(partition[key]) for key in page], 'Count': len(page)}
+        if start + len(page) < len(keys):
+            last = partition[page[-1]]
+            response['LastEvaluatedKey'] = {self.hash_key: last[self.hash_key], self.range_key: last[self.range_key]}
+        return response
+
+    def batch_writer(self, **kwargs):
+        return FakeBatchWriter(self)
+
+class FakeBatchWriter:
+
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.delete_item(Key=Key)
+
+# Only conditions made of attribute_not_exists(name) and name < :value terms joined by OR are supported
+def condition_holds(expression, item, names, values):
+    for term in expression.split(' OR '):
+        term = term.strip()
+        if term.startswith('attribute_not_exists(') and term.endswith(')'):
+            name = term[len('attribute_not_exists('):-1]
+            if item is None or names.get(name, name) not in item:
+                return True
+            continue
+        name, operator, value = term.split()
+        if operator != '<':
+            raise ValueError('Unsupported condition ' + term)
+        if item is not None and names.get(name, name) in item and item[names.get(name, name)] < values[value]:
+            return True
+    return False
+
+# Same shape as botocore's ClientError, so handlers can read e.response['Error']['Code']
+class FakeClientError(Exception):
+
+    def __init__(self, code, operation):
+        super().__init__('An error occurred (' + code + ') when calling the ' + operation + ' operation')
+        self.response = {'Error': {'Code': code, 'Message': str(self)}}
+
+# Calls beyond limit per second of the monotonic clock raise the service's throttling error, None never throttles
+class RateWindow:
+
+    def __init__(self, limit, code, operation):
+        self.limit = limit
+        self.code = code
+        self.operation = operation
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.window = int(time.monotonic())
+        self.in_window = 0
+
+    def hit(self):
+        if self.limit is None:
+            return
+        with self.lock:
+            second = int(time.monotonic())
+            if second != self.window:
+                self.window, self.in_window = second, 0
+            if self.in_window >= self.limit:
+                self.throttled += 1
+                raise FakeClientError(self.code, self.operation)
+            self.in_window += 1
+
+class FakeSns:
+
+    # Each publish takes latency seconds, and publishes beyond limit per second are throttled
+    def __init__(self, latency=0.0, limit=None):
+        self.latency = latency
+        self.rate = RateWindow(limit, 'Throttling', 'Publish')
+        self.published = []
+        self.published_at = []
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    @property
+    def throttled(self):
+        return self.rate.throttled
+
+    def publish(self, PhoneNumber=None, Message=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.rate.hit()
+        with self.lock:
+            self.published.append((PhoneNumber, Message))
+            self.published_at.append(time.monotonic())
+            return {'MessageId': 'fake-' + str(next(self.ids))}
+
+class FakeStepFunctions:
+
+    # Each call takes latency seconds, and calls beyond limit per second are throttled
+    def __init__(self, latency=0.0, limit=None):
+        self.latency = latency
+        self.rate = RateWindow(limit, 'ThrottlingException', 'StartExecution')
+        self.started = {}
+        self.closed = set()
+        self.lock = threading.Lock()
+
+    @property
+    def throttled(self):
+        return self.rate.throttled
+
+    # A repeat with the same name and input is only accepted while the execution is running
+    def close_all(self):
+        with self.lock:
+            self.closed.update(self.started)
+
+    def start_execution(self, stateMachineArn=None, input=None, name=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.rate.hit()
+        with self.lock:
+            name = name or 'execution-' + str(len(self.started))
+            arn = stateMachineArn.replace(':stateMachine:', ':execution:') + ':' + name
+            if arn in self.closed or (arn in self.started and self.started[arn] != input):
+                raise FakeClientError('ExecutionAlreadyExists', 'StartExecution')
+            self.started[arn] = input
+            return {'executionArn': arn, 'startDate': time.time()}
+
+    # Runs nothing, the execution simply succeeds
+    def start_sync_execution(self, stateMachineArn=None, input=None, name=None, **kwargs):
+        execution = self.start_execution(stateMachineArn=stateMachineArn, input=input, name=name)
+        return dict(execution, status='SUCCEEDED', stopDate=time.time(), output=input)
+
+class FakeSes:
+
+    # Each send takes latency seconds, and sends beyond limit per second are throttled
+    def __init__(self, latency=0.0, limit=None):
+        self.latency = latency
+        self.rate = RateWindow(limit, 'Throttling', 'SendEmail')
+        self.sent = []
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    @property
+    def throttled(self):
+        return self.rate.throttled
+
+    def send_email(self, Source=None, Destination=None, Message=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.rate.hit()
+        with self.lock:
+            self.sent.append((Destination['ToAddresses'], Message['Body']['Text']['Data']))
+            return {'MessageId': 'fake-' + str(next(self.ids))}
+
+# Objects are kept in memory with the headers they were written with
+class FakeS3:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self.requests = {'PutObject': 0, 'GetObject': 0, 'DeleteObjects': 0}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests['PutObject'] += 1
+            self.objects[(Bucket, Key)] = (Body if isinstance(Body, bytes) else Body.read(), kwargs)
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket, Key, f.read(), **(ExtraArgs or {}))
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self.lock:
+            self.requests['GetObject'] += 1
+            if (Bucket, Key) not in self.objects:
+                raise FakeClientError('NoSuchKey', 'GetObject')
+            body, headers = self.objects[(Bucket, Key)]
+        return dict(headers, Body=io.BytesIO(body))
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        with self.lock:
+            self.requests['DeleteObjects'] += 1
+            for item in Delete['Objects']:
+                self.objects.pop((Bucket, item['Key']), None)
+        return {}
+
+class FakeCloudFront:
+
+    def __init__(self):
+        self.invalidations = []
+
+    def create_invalidation(self, DistributionId, InvalidationBatch):
+        self.invalidations.append((DistributionId, InvalidationBatch['Paths']['Items']))
+        return {'Invalidation': {'Id': 'fake-' + str(len(self.invalidations)), 'Status': 'InProgress'}}
@@ -1,5 +1,5 @@
 from aws_cdk import (
-    CfnOutput, Fn, RemovalPolicy, Stack,
+    ArnFormat, CfnOutput, Duration, Fn, RemovalPolicy, Stack,
     aws_lambda as _lambda,
     aws_apigateway as apigateway,
     aws_ses as ses,
@@ -10,12 +10,27 @@ from aws_cdk import (
     aws_stepfunctions_tasks as sfn_tasks
 )
 from constructs import Construct
+from serverless_app import bundling
+from serverless_app.serverless_app_stack import API_PATHS, MAX_COMPRESSION_THRESHOLD
+
+# Stage the API is deployed to
+STAGE_NAME = 'prod'
 
 class ServerlessAppStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    # throttle, method_throttles, compression_threshold and bundle_sdk are the options of the same name of
+    # serverless_app_stack.ServerlessAppStack, applied to the stage, the REST API and the function code
+    def __init__(self, scope: Construct, construct_id: str, throttle: tuple = None, method_throttles: dict = None,
+                 compression_threshold: int = -1, bundle_sdk: bool = True, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        method_throttles = method_throttles or {}
+        for path in method_throttles:
+            if path not in API_PATHS:
+                raise ValueError('Unknown path in method_throttles: ' + path)
+        if compression_threshold > MAX_COMPRESSION_THRESHOLD:
+            raise ValueError('compression_threshold must be at most ' + str(MAX_COMPRESSION_THRESHOLD) + ' bytes')
+
         # Create Lambda Role
         lambdaRole = iam.Role(
             self,
@@ -101,28 +116,27 @@ class ServerlessAppStack(Stack):
         )
         stepFunction.node.default_child.override_logical_id('stepFunction')
 
-        # Create API handler Lambda Function 
+        # Create API handler Lambda Function
+        # The handler is shipped as an asset because the batch mode no longer fits in the 4KB inline code limit
         apiHandler = _lambda.Function(
             self,
             'apiHandler',
             function_name = 'apiHandler',
-            handler = 'index.handler',
+            handler = 'api_handler.lambda_handler',
             runtime = _lambda.Runtime.PYTHON_3_12,
             role = lambdaRole,
-            code = _lambda.Code.from_inline(
-                Fn.join('"', 
-                    [
-                        'import boto3\nimport json\nimport os\nimport decimal\n\nSFN_ARN = ', 
-                        Fn.get_att('stepFunction', 'Arn').to_string(),
-                        '\n\nsfn = boto3.client("stepfunctions")\n\ndef lambda_handler(event, context):\n\tprint("EVENT:")\n\tprint(event)\n\tdata = json.loads(event["body"])\n\tdata["waitSeconds"] = int(data["waitSeconds"])\n\t\n\t# Validation Checks\n\tchecks = []\n\tchecks.append("waitSeconds" in data)\n\tchecks.append(type(data["waitSeconds"]) == int)\n\tchecks.append("preference" in data)\n\tchecks.append("message" in data)\n\tif data.get("preference") == "sms":\n\t\tchecks.append("phone" in data)\n\tif data.get("preference") == "email":\n\t\tchecks.append("email" in data)\n\n\t# Check for any errors in validation checks\n\tif False in checks:\n\t\tresponse = {\n\t\t\t"statusCode": 400,\n\t\t\t"headers": {"Access-Control-Allow-Origin":"*"},\n\t\t\t"body": json.dumps(\n\t\t\t\t{\n\t\t\t\t\t"Status": "Success", \n\t\t\t\t\t"Reason": "Input failed validation"\n\t\t\t\t},\n\t\t\t\tcls=DecimalEncoder\n\t\t\t)\n\t\t}\n\t# If none, run the state machine and return a 200 code saying this is fine :)\n\telse: \n\t\tsfn.start_execution(\n\t\t\tstateMachineArn=SFN_ARN,\n\t\t\tinput=json.dumps(data, cls=DecimalEncoder)\n\t\t)\n\t\tresponse = {\n\t\t\t"statusCode": 200,\n\t\t\t"headers": {"Access-Control-Allow-Origin":"*"},\n\t\t\t"body": json.dumps(\n\t\t\t\t{"Status": "Success"},\n\t\t\t\tcls=DecimalEncoder\n\t\t\t)\n\t\t}\n\treturn response\n\n# This is a workaround for: http://bugs.python.org/issue16535\nclass DecimalEncoder(json.JSONEncoder):\n\tdef default(self, obj):\n\t\tif isinstance(obj, decimal.Decimal):\n\t\t\treturn int(obj)\n\t\treturn super(DecimalEncoder, self).default(obj)\n\n'
-                    ]
-                )
-            )
+            timeout = Duration.seconds(29),
+            code = _lambda.Code.from_asset(bundling.bundle('api_handler', bundle_sdk)),
+            environment = {
+                'SFN_ARN': Fn.get_att('stepFunction', 'Arn').to_string(),
+                'MAX_BATCH_SIZE': '500',
+                'MAX_WORKERS': '32'
+            }
         )
         apiHandler.node.default_child.override_logical_id('apiHandler')
         
         # Create Rest API
-        api_reminder = apigateway.CfnRestApi( self, 'reminders', name = 'reminders' )
+        api_reminder = apigateway.CfnRestApi( self, 'reminders', name = 'reminders', minimum_compression_size = compression_threshold if compression_threshold >= 0 else None )
 
         # Create API Resource
         api_resource = apigateway.CfnResource( self, 'API_Resource', parent_id = api_reminder.attr_root_resource_id, path_part = 'reminders', rest_api_id = api_reminder.attr_rest_api_id )
@@ -142,14 +156,32 @@ class ServerlessAppStack(Stack):
             rest_api_id = api_reminder.attr_rest_api_id
         )
 
+        # Create API Batch Resource and Method
+        api_batch_resource = apigateway.CfnResource( self, 'API_Batch_Resource', parent_id = api_resource.attr_resource_id, path_part = 'batch', rest_api_id = api_reminder.attr_rest_api_id )
+        api_batch_method = apigateway.CfnMethod( 
+            self, 'API_Batch_Method', 
+            http_method = 'POST', 
+            integration = apigateway.CfnMethod.IntegrationProperty(
+                integration_http_method = 'POST', type = 'AWS_PROXY', 
+                uri = Fn.join('', ['arn:aws:apigateway:', self.region, ':lambda:path/2015-03-31/functions/', Fn.get_att('apiHandler', 'Arn').to_string(), '/invocations'])
+            ), 
+            resource_id = api_batch_resource.attr_resource_id, 
+            rest_api_id = api_reminder.attr_rest_api_id
+        )
+
         api_deployment.node.add_dependency(api_method)
+        api_deployment.node.add_dependency(api_batch_method)
+
+        # Execute API ARNs name the API, then the stage, method and path
+        def execute_api_arn(path):
+            return self.format_arn(service = 'execute-api', resource = api_reminder.attr_rest_api_id, resource_name = path, arn_format = ArnFormat.SLASH_RESOURCE_NAME)
 
         # Create Lambda Permissions for Method
         lambda_intergration_method_permissions = _lambda.CfnPermission( self, 'APILambdaIntegrationMethodPermissions', 
             function_name = Fn.get_att('apiHandler', 'Arn').to_string(),
             action = 'lambda:InvokeFunction',
             principal = 'apigateway.amazonaws.com',
-            source_arn = Fn.join('', ['arn:aws:execute-api:', self.region, self.account, ':', Fn.ref('reminders'), '/', Fn.ref('APIStage'), '/POST/reminders'] )
+            source_arn = execute_api_arn(STAGE_NAME + '/POST/reminders')
         )
 
         # Create Lambda Permissions Test for Method
@@ -157,11 +189,26 @@ class ServerlessAppStack(Stack):
             function_name = Fn.get_att('apiHandler', 'Arn').to_string(),
             action = 'lambda:InvokeFunction',
             principal = 'apigateway.amazonaws.com',
-            source_arn = Fn.join('', ['arn:aws:execute-api:', self.region, self.account, ':', '/test-invoke-stage/POST/reminders'] )
+            source_arn = execute_api_arn('test-invoke-stage/POST/reminders')
+        )
+
+        # Create Lambda Permissions for Batch Method
+        lambda_intergration_batch_permissions = _lambda.CfnPermission( self, 'APILambdaIntegrationBatchPermissions', 
+            function_name = Fn.get_att('apiHandler', 'Arn').to_string(),
+            action = 'lambda:InvokeFunction',
+            principal = 'apigateway.amazonaws.com',
+            source_arn = execute_api_arn(STAGE_NAME + '/POST/reminders/batch')
         )
 
+        # Stage and method limits, method settings name the resource path with each '/' in it escaped as '~1'
+        method_settings = []
+        if throttle:
+            method_settings.append(apigateway.CfnStage.MethodSettingProperty( http_method = '*', resource_path = '/*', throttling_rate_limit = throttle[0], throttling_burst_limit = throttle[1] ))
+        for path, limits in method_throttles.items():
+            method_settings.append(apigateway.CfnStage.MethodSettingProperty( http_method = 'POST', resource_path = '/' + path.replace('/', '~1'), throttling_rate_limit = limits[0], throttling_burst_limit = limits[1] ))
+
         # Create API Stage
-        api_stage = apigateway.CfnStage( self, 'API_Stage', deployment_id = api_deployment.attr_deployment_id, rest_api_id = api_reminder.attr_rest_api_id, stage_name = 'prod')
+        api_stage = apigateway.CfnStage( self, 'API_Stage', deployment_id = api_deployment.attr_deployment_id, rest_api_id = api_reminder.attr_rest_api_id, stage_name = STAGE_NAME, method_settings = method_settings or None )
 
         # CfnOutput(self, "Reminder", value = Fn.get_att('Reminders', ))
 
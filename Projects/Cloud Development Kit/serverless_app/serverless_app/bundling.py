@@ -0,0 +1,194 @@
+import compileall
+import hashlib
+import json
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+
+# Build step for the Lambda assets
+#
+# Every function is assembled under build/<name> from its handler directory plus the shared reminders_common
+# package, optionally with its own copy of boto3 trimmed down to the service models the function calls, and
+# byte-compiled so the read-only /var/task never has to compile on a cold start.
+
+# BUNDLE_BUILD_DIR gives synths running side by side, e.g. one per environment, a build directory each
+BUILD_DIR = os.environ.get('BUNDLE_BUILD_DIR', 'build')
+COMMON_SOURCES = 'src/common/python'
+
+# Python version of the Lambda runtime, bytecode is only shipped when it is built by the same version
+RUNTIME_VERSION = (3, 12)
+
+# SDK bundled into the functions when bundle_sdk is on
+SDK_REQUIREMENT = 'boto3==1.34.11'
+
+# Faster JSON for the API functions, a compiled wheel so it is installed for the Lambda platform
+FAST_JSON_REQUIREMENT = 'orjson==3.9.10'
+LAMBDA_PLATFORMS = {'x86_64': 'manylinux2014_x86_64', 'arm64': 'manylinux2014_aarch64'}
+
+# Handler sources, handler module, the AWS services each function calls and the packages bundled with the SDK
+FUNCTIONS = {
+    'api_handler': {'sources': ['src/api_handler'], 'module': 'api_handler', 'services': ['stepfunctions', 'dynamodb', 's3'], 'requirements': [FAST_JSON_REQUIREMENT]},
+    'queue_consumer': {'sources': ['src/api_handler'], 'module': 'queue_consumer', 'services': ['stepfunctions', 'dynamodb', 's3'], 'requirements': [FAST_JSON_REQUIREMENT]},
+    'email': {'sources': ['src/email'], 'module': 'email_reminder', 'services': ['ses', 's3']},
+    'sms': {'sources': ['src/sms'], 'module': 'sms_reminder', 'services': ['sns', 's3']},
+    'sweeper': {'sources': ['src/scheduler'], 'module': 'sweeper', 'services': ['dynamodb', 'ses', 'sns', 's3']},
+    'broadcast_report': {'sources': ['src/broadcast'], 'module': 'broadcast_report', 'services': ['s3']},
+}
+
+# Functions bundled by this process, build/ can still hold others from an earlier synth
+bundled = []
+
+# Assemble build/<name> and return its path for Code.from_asset
+def bundle(name: str, bundle_sdk: bool = True, architecture: str = 'x86_64') -> str:
+    function = FUNCTIONS[name]
+    target = os.path.join(BUILD_DIR, name)
+    if name not in bundled:
+        bundled.append(name)
+    shutil.rmtree(target, ignore_errors = True)
+    os.makedirs(target)
+
+    for source in function['sources'] + [COMMON_SOURCES]:
+        shutil.copytree(source, target, dirs_exist_ok = True, ignore = shutil.ignore_patterns('__pycache__', '*.pyc'))
+    if bundle_sdk:
+        shutil.copytree(sdk_dir(function['services']), target, dirs_exist_ok = True)
+        if function.get('requirements'):
+            shutil.copytree(requirements_dir(function['requirements'], architecture), target, dirs_exist_ok = True)
+
+    if sys.version_info[:2] == RUNTIME_VERSION:
+        # Unchecked hash pycs are used as is, without stat-ing or hashing the source
+        compileall.compile_dir(target, quiet = 1, invalidation_mode = py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    else:
+        print('bundling: skipping byte-compilation of ' + name + ', build Python %d.%d does not match the runtime' % sys.version_info[:2])
+    return target
+
+# Install the SDK once per service set and reuse it from the cache on later synths
+def sdk_dir(services: list) -> str:
+    key = hashlib.sha256(json.dumps([SDK_REQUIREMENT, sorted(services)]).encode('utf-8')).hexdigest()[:16]
+    target = os.path.join(BUILD_DIR, '.sdk-cache', key)
+    if os.path.isdir(target):
+        return target
+
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors = True)
+    subprocess.run(
+        [sys.executable, '-m', 'pip', 'install', '--quiet', '--no-compile', '--target', staging, SDK_REQUIREMENT],
+        check = True
+    )
+    prune_models(staging, services)
+    os.rename(staging, target)
+    return target
+
+# Binary wheels for the Lambda platform and runtime, whatever machine the synth runs on
+def requirements_dir(requirements: list, architecture: str = 'x86_64') -> str:
+    key = hashlib.sha256(json.dumps([LAMBDA_PLATFORMS[architecture], RUNTIME_VERSION, sorted(requirements)]).encode('utf-8')).hexdigest()[:16]
+    target = os.path.join(BUILD_DIR, '.requirements-cache', key)
+    if os.path.isdir(target):
+        return target
+
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors = True)
+    subprocess.run(
+        [sys.executable, '-m', 'pip', 'install', '--quiet', '--no-compile', '--target', staging,
+         '--platform', LAMBDA_PLATFORMS[architecture], '--implementation', 'cp', '--python-version', '%d.%d' % RUNTIME_VERSION,
+         '--only-binary', ':all:'] + requirements,
+        check = True
+    )
+    for entry in os.listdir(staging):
+        if entry == 'bin' or entry.endswith('.dist-info'):
+            shutil.rmtree(os.path.join(staging, entry))
+    os.rename(staging, target)
+    return target
+
+# Drop every service model directory the function never loads, the shared endpoint and retry files stay,
+# as do the parts of the install Lambda has no use for
+def prune_models(path: str, services: list) -> None:
+    for package in ('botocore', 'boto3'):
+        data = os.path.join(path, package, 'data')
+        for entry in os.listdir(data):
+            if os.path.isdir(os.path.join(data, entry)) and entry not in services:
+                shutil.rmtree(os.path.join(data, entry))
+    for entry in os.listdir(path):
+        if entry == 'bin' or entry.endswith('.dist-info'):
+            shutil.rmtree(os.path.join(path, entry))
+
+# Import every bundled handler in a fresh interpreter and report how long the init phase takes, along with
+# the cost of creating its clients, which the handlers defer to the first invocation
+#
+# The report is written to build/cold_start_report.json, and functions whose init got more than 20% slower
+# than in the previous report are flagged.
+def cold_start_report(names: list = None, region: str = 'eu-west-1') -> dict:
+    path = os.path.join(BUILD_DIR, 'cold_start_report.json')
+    previous = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+
+    report = {}
+    for name in FUNCTIONS if names is None else names:
+        target = os.path.join(BUILD_DIR, name)
+        if not os.path.isdir(target):
+            continue
+        function = FUNCTIONS[name]
+        entry = {'package_bytes': sum(os.path.getsize(os.path.join(root, f)) for root, dirs, files in os.walk(target) for f in files)}
+
+        # Best of three timed imports, then one run under -X importtime for the breakdown
+        script = (
+            'import time\n'
+            'began = time.perf_counter()\n'
+            'import ' + function['module'] + '\n'
+            'print((time.perf_counter() - began) * 1000)\n'
+            'began = time.perf_counter()\n'
+            'from reminders_common import clients\n'
+            'for service in ' + repr(function['services']) + ': clients.client(service)\n'
+            'print((time.perf_counter() - began) * 1000)\n'
+        )
+        runs = [run_python(['-c', script], target, region) for i in range(3)]
+        failed = [result for result in runs if result.returncode != 0]
+        if failed:
+            entry['error'] = failed[0].stderr.strip().splitlines()[-1]
+        else:
+            timings = [[float(value) for value in result.stdout.split()] for result in runs]
+            entry['init_ms'] = round(min(timing[0] for timing in timings), 1)
+            entry['first_clients_ms'] = round(min(timing[1] for timing in timings), 1)
+            entry.update(parse_importtime(run_python(['-X', 'importtime', '-c', 'import ' + function['module']], target, region).stderr, function['module']))
+        report[name] = entry
+
+    print('%-12s %10s %18s %12s  %s' % ('function', 'init ms', 'first clients ms', 'package KB', 'heaviest imports'))
+    for name, entry in report.items():
+        if 'error' in entry:
+            print('%-12s %s' % (name, entry['error']))
+            continue
+        heaviest = ', '.join('%s %.1fms' % (module, ms) for module, ms in entry['heaviest'])
+        flag = ''
+        before = previous.get(name, {}).get('init_ms')
+        if before and entry['init_ms'] > before * 1.2:
+            flag = '  REGRESSION from %.1fms' % before
+        print('%-12s %10.1f %18.1f %12.1f  %s%s' % (name, entry['init_ms'], entry['first_clients_ms'], entry['package_bytes'] / 1024.0, heaviest, flag))
+
+    with open(path, 'w') as f:
+        json.dump(report, f, indent = 2)
+    return report
+
+# Run the build's Python with only the bundle on the path, the way Lambda loads /var/task
+def run_python(arguments: list, cwd: str, region: str):
+    env = dict(os.environ, PYTHONPATH = os.path.abspath(cwd), PYTHONDONTWRITEBYTECODE = '1', AWS_DEFAULT_REGION = region)
+    return subprocess.run([sys.executable] + arguments, cwd = cwd, env = env, capture_output = True, text = True)
+
+# -X importtime lines look like "import time:   self [us] | cumulative | imported package", with nested imports
+# indented two more spaces and listed before the module that imported them
+def parse_importtime(output: str, module: str) -> dict:
+    children = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, package = line[len('import time:'):].split('|')
+        depth = (len(package) - len(package.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            children.append((package.strip(), int(cumulative_us) / 1000.0))
+        elif depth == 0:
+            if package.strip() == module:
+                return {'import_ms': int(cumulative_us) / 1000.0, 'heaviest': sorted(children, key = lambda item: -item[1])[:3]}
+            children = []
+    return {'import_ms': 0.0, 'heaviest': []}
@@ -1,7 +1,9 @@
 from aws_cdk import (
-    CfnOutput, Fn, RemovalPolicy, Stack,
+    ArnFormat, CfnOutput, Duration, Fn, RemovalPolicy, Size, Stack,
     aws_lambda as _lambda,
     aws_apigateway as apigateway,
+    aws_apigatewayv2 as apigatewayv2,
+    aws_apigatewayv2_integrations as apigatewayv2_integrations,
     aws_ses as ses,
     aws_s3 as s3,
     aws_s3_deployment as s3_deployment,
@@ -9,15 +11,183 @@ from aws_cdk import (
     aws_stepfunctions as sfn,
     aws_stepfunctions_tasks as sfn_tasks,
     aws_cloudfront as cloudfront,
-    aws_cloudfront_origins as cloudfront_origins
+    aws_cloudfront_origins as cloudfront_origins,
+    aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_applicationautoscaling as appscaling
 )
 from constructs import Construct
+from serverless_app import bundling, website
+
+# Verified SES identity the reminders are sent from
+SENDER_EMAIL = 'jirogal152@wenkuu.com'
+
+# Errors of the SDK integrations that are worth retrying, everything else (e.g. a rejected address) fails the task.
+# SES v1 throttles with the error code Throttling, which has no exception class of its own in the SDK and so
+# reaches Step Functions as Ses.SesException, with "Error Code: Throttling" in the cause.
+SDK_RETRY_ERRORS = {
+    'ses': ['Ses.SesException', 'States.Timeout'],
+    'sns': ['Sns.ThrottledException', 'Sns.InternalErrorException', 'States.Timeout']
+}
+
+# Memory of the functions not listed in memory_sizes, in MB
+DEFAULT_MEMORY_SIZES = {'api_handler': 128, 'queue_consumer': 128, 'email': 128, 'sms': 128, 'sweeper': 1024, 'broadcast_report': 256}
+
+# Recipients per batch of a broadcast, each batch is one Express child execution that has to finish in 5 minutes.
+# Email batches share the account send rate between broadcast_concurrency instances, so a batch takes
+# BROADCAST_BATCH_SIZE * broadcast_concurrency / send rate seconds.
+BROADCAST_BATCH_SIZE = 100
+
+# Lambda errors a broadcast batch is retried on
+LAMBDA_RETRY_ERRORS = ['Lambda.ServiceException', 'Lambda.AWSLambdaException', 'Lambda.SdkClientException', 'Lambda.TooManyRequestsException']
+
+# Provisioned concurrency scales between the configured floor and PROVISIONED_SCALE_FACTOR times it, keeping
+# utilisation around PROVISIONED_UTILIZATION. The floor is raised to PEAK_FACTOR times during PEAK_HOURS (UTC).
+PROVISIONED_SCALE_FACTOR = 4
+PROVISIONED_UTILIZATION = 0.7
+PEAK_FACTOR = 2
+PEAK_HOURS = (7, 22)
+
+# Paths of the reminders API, each of them takes POST
+API_PATHS = ['/reminders', '/reminders/batch']
+
+# API Gateway compresses responses of up to 10 MB
+MAX_COMPRESSION_THRESHOLD = 10 * 1024 * 1024
 
 class ServerlessAppStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    # scheduler picks how pending reminders are held until they are due:
+    #   'stepfunctions' - one Standard execution waiting in the SendReminder state per reminder
+    #   'buckets'       - a DynamoDB table partitioned by due minute, drained every minute by a sweeper Lambda
+    #
+    # Reminders with waitSeconds up to express_wait_threshold are started on the Express twin of the state
+    # machine instead, synchronously if express_sync is set. 0 (the default) turns the fast path off: Express
+    # executions started asynchronously run at least once rather than exactly once, so a reminder on the fast
+    # path can be sent twice.
+    #
+    # email_mode 'batched' queues email reminders in SQS and sends them with SES bulk templated sends
+    # instead of one Lambda invocation and one send_email call per reminder.
+    #
+    # Function code is assembled by bundling.bundle, bundle_sdk adds a copy of boto3 with only the service
+    # models each function calls.
+    #
+    # integration 'sdk' sends from the state machine with the native SES SendEmail and SNS Publish integrations
+    # instead of invoking the email and sms Lambdas. The Lambdas stay deployed for the 'lambda' (default) path,
+    # the sweeper and the email queue.
+    #
+    # ingestion 'queue' puts POST /reminders in front of an SQS queue through a direct API Gateway integration,
+    # the queue_consumer Lambda starts the reminders in batches with at most queue_concurrency instances.
+    #
+    # website_deploy 'incremental' leaves the website bucket to serverless_app.site_sync, which only uploads
+    # changed files and invalidates changed pages, instead of re-syncing everything with BucketDeployment.
+    #
+    # tracing turns on X-Ray active tracing for the functions, the state machines and the API stage.
+    #
+    # architecture 'arm64' runs every function on Graviton, memory_sizes ({function name: MB}) overrides
+    # DEFAULT_MEMORY_SIZES. Functions in provisioned_concurrency ({function name: instances}) or snap_start
+    # ([function name]) are published and invoked through a 'live' alias, with provisioned concurrency scaled
+    # on utilisation and on a schedule, or with SnapStart. Lambda takes one or the other per version.
+    #
+    # broadcast adds MyBroadcastStateMachine, which sends one message to every recipient of a CSV, JSON or JSONL
+    # list in BroadcastBucket. A Distributed Map reads the list in batches of BROADCAST_BATCH_SIZE, hands each
+    # batch to the email and sms Lambdas with at most broadcast_concurrency batches in flight, and gives up once
+    # more than broadcast_tolerated_failure percent of them failed. broadcast_report sums up the results.
+    #
+    # Messages over claim_check_threshold bytes are stored in PayloadBucket and only a reference travels through
+    # the workflows and the schedule table, the email, sms and sweeper functions fetch them back. 0 turns it
+    # off, as does integration 'sdk', where SES and SNS are called with the message from the state.
+    #
+    # idempotency makes the API answer repeats of a reminder (same Idempotency-Key header or same content)
+    # within idempotency_ttl seconds with the earlier result instead of submitting it again.
+    #
+    # api_type 'http' serves the API from an HTTP API, which hands api_handler payload format 2.0 events, instead
+    # of a REST API. It costs less and adds less latency, but has no X-Ray tracing, usage plans or queue ingestion.
+    # throttle (rate, burst) limits the whole stage, method_throttles ({path: (rate, burst)}) the POST method of
+    # single paths. usage_plans ({client: (rate, burst[, requests per day])}) gives every client an API key and a
+    # plan of its own, and makes the key required. Responses of compression_threshold bytes or more are gzipped
+    # for clients that accept it, by API Gateway on the REST API and by api_handler on the HTTP API, -1 turns it off.
+    def __init__(self, scope: Construct, construct_id: str, scheduler: str = 'stepfunctions',
+                 express_wait_threshold: int = 0, express_sync: bool = False, email_mode: str = 'single',
+                 bundle_sdk: bool = True, idempotency: bool = False, idempotency_ttl: int = 300,
+                 integration: str = 'lambda', ingestion: str = 'direct', queue_concurrency: int = 5,
+                 website_deploy: str = 'bucket', tracing: bool = False, architecture: str = 'x86_64',
+                 memory_sizes: dict = None, provisioned_concurrency: dict = None, snap_start: list = None,
+                 broadcast: bool = False, broadcast_concurrency: int = 10, broadcast_tolerated_failure: int = 5,
+                 claim_check_threshold: int = 32768, api_type: str = 'rest', throttle: tuple = None,
+                 method_throttles: dict = None, usage_plans: dict = None, compression_threshold: int = -1,
+                 **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        if scheduler not in ('stepfunctions', 'buckets'):
+            raise ValueError('Unknown scheduler: ' + scheduler)
+        if email_mode not in ('single', 'batched'):
+            raise ValueError('Unknown email_mode: ' + email_mode)
+        if integration not in ('lambda', 'sdk'):
+            raise ValueError('Unknown integration: ' + integration)
+        if ingestion not in ('direct', 'queue'):
+            raise ValueError('Unknown ingestion: ' + ingestion)
+        # Lambda polls an SQS queue with at least two instances
+        if queue_concurrency < 2:
+            raise ValueError('queue_concurrency must be at least 2')
+        if website_deploy not in ('bucket', 'incremental'):
+            raise ValueError('Unknown website_deploy: ' + website_deploy)
+        # Express executions are capped at five minutes, and a synchronous call has to fit in the API Gateway timeout
+        if express_wait_threshold > 240:
+            raise ValueError('express_wait_threshold must leave room inside the 5 minute Express limit')
+        if express_sync and express_wait_threshold > 20:
+            raise ValueError('express_sync needs an express_wait_threshold that fits in the 29 second API timeout')
+
+        # Distributed Map runs at most 10000 child executions at once
+        if not 1 <= broadcast_concurrency <= 10000:
+            raise ValueError('broadcast_concurrency must be between 1 and 10000')
+        if not 0 <= broadcast_tolerated_failure <= 100:
+            raise ValueError('broadcast_tolerated_failure is a percentage')
+        if claim_check_threshold < 0:
+            raise ValueError('claim_check_threshold must be 0 or more bytes')
+        if api_type not in ('rest', 'http'):
+            raise ValueError('Unknown api_type: ' + api_type)
+        # The direct SQS integration needs request templates, which HTTP APIs do not have, nor usage plans
+        if api_type == 'http' and ingestion == 'queue':
+            raise ValueError('ingestion queue needs api_type rest')
+        if api_type == 'http' and usage_plans:
+            raise ValueError('usage_plans need api_type rest')
+        method_throttles = method_throttles or {}
+        usage_plans = usage_plans or {}
+        for path in method_throttles:
+            if path not in API_PATHS:
+                raise ValueError('Unknown path in method_throttles: ' + path)
+        for name, limits in [('throttle', throttle)] + list(method_throttles.items()) + list(usage_plans.items()):
+            if limits is not None and (len(limits) < 2 or limits[0] <= 0 or limits[1] < 0):
+                raise ValueError('Limits of ' + name + ' must be a positive rate and a burst of 0 or more')
+        if compression_threshold > MAX_COMPRESSION_THRESHOLD:
+            raise ValueError('compression_threshold must be at most ' + str(MAX_COMPRESSION_THRESHOLD) + ' bytes')
+        if architecture not in ('x86_64', 'arm64'):
+            raise ValueError('Unknown architecture: ' + architecture)
+        memory_sizes = dict(DEFAULT_MEMORY_SIZES, **(memory_sizes or {}))
+        provisioned_concurrency = provisioned_concurrency or {}
+        snap_start = snap_start or []
+        for name in list(memory_sizes) + list(provisioned_concurrency) + list(snap_start):
+            if name not in bundling.FUNCTIONS:
+                raise ValueError('Unknown function: ' + name)
+        for name, size in memory_sizes.items():
+            if not 128 <= size <= 10240:
+                raise ValueError('Memory of ' + name + ' must be between 128 and 10240 MB')
+        for name, instances in provisioned_concurrency.items():
+            if instances < 1:
+                raise ValueError('Provisioned concurrency of ' + name + ' must be at least 1')
+            if name in snap_start:
+                raise ValueError(name + ' cannot have both provisioned concurrency and SnapStart')
+
+        function_tracing = _lambda.Tracing.ACTIVE if tracing else None
+        function_architecture = _lambda.Architecture.ARM_64 if architecture == 'arm64' else _lambda.Architecture.X86_64
+
+        # Alias the other resources invoke a function through, or the function itself when it needs none
+        def live(function, name):
+            return self.live_alias(function, name, provisioned_concurrency.get(name), name in snap_start)
+
         # Create Lambda Role
         lambdaRole = iam.Role(
             self,
@@ -44,27 +214,83 @@ class ServerlessAppStack(Stack):
 
         )
 
+        # Functions that read reminders and have to resolve messages kept in the payload bucket
+        payload_readers = []
+
         # Create Email Reminder Lambda function
         email = _lambda.Function(
             self,
             'email',
             function_name = 'email',
-            handler = 'index.handler',
+            handler = 'email_reminder.lambda_handler',
             runtime = _lambda.Runtime.PYTHON_3_12,
+            tracing = function_tracing,
+            architecture = function_architecture,
+            memory_size = memory_sizes['email'],
             role = lambdaRole,
-            code = _lambda.Code.from_asset('src/email')
+            timeout = Duration.minutes(5),
+            code = _lambda.Code.from_asset(bundling.bundle('email', bundle_sdk, architecture))
         )
+        email_target = live(email, 'email')
+        payload_readers.append(email)
+
+        email_queue = None
+        if email_mode == 'batched':
+            # Create Email Queue, reminders that keep failing end up in the dead letter queue
+            email_dead_letter_queue = sqs.Queue(self, 'EmailDeadLetterQueue', retention_period = Duration.days(14))
+            email_queue = sqs.Queue(
+                self,
+                'EmailQueue',
+                visibility_timeout = Duration.minutes(30),
+                dead_letter_queue = sqs.DeadLetterQueue(max_receive_count = 5, queue = email_dead_letter_queue)
+            )
+
+            # Drain the queue in batches, the account send rate is shared between max_concurrency instances
+            email_target.add_event_source(lambda_event_sources.SqsEventSource(
+                email_queue,
+                batch_size = 500,
+                max_batching_window = Duration.seconds(10),
+                max_concurrency = 2,
+                report_batch_item_failures = True
+            ))
+
+        if email_mode == 'batched' or broadcast:
+            # Create SES Template used by the bulk sends
+            ses.CfnTemplate(
+                self,
+                'ReminderTemplate',
+                template = ses.CfnTemplate.TemplateProperty(
+                    template_name = 'ReminderTemplate',
+                    subject_part = 'A reminder from your reminder service!',
+                    text_part = '{{message}}'
+                )
+            )
+            # Every instance that can be sending in bulk at the same time gets its share of the send rate
+            email.add_environment('TEMPLATE_NAME', 'ReminderTemplate')
+            email.add_environment('EMAIL_CONCURRENCY', str((2 if email_mode == 'batched' else 0) + (broadcast_concurrency if broadcast else 0)))
 
         # Create SMS Reminder Lambda function
         sms = _lambda.Function(
             self,
             'sms',
             function_name = 'sms',
-            handler = 'index.handler',
+            handler = 'sms_reminder.lambda_handler',
             runtime = _lambda.Runtime.PYTHON_3_12,
+            tracing = function_tracing,
+            architecture = function_architecture,
+            memory_size = memory_sizes['sms'],
             role = lambdaRole,
-            code = _lambda.Code.from_asset('src/sms')
+            timeout = Duration.minutes(1),
+            code = _lambda.Code.from_asset(bundling.bundle('sms', bundle_sdk, architecture)),
+            environment = {
+                'SMS_RATE': '20',
+                'SMS_WORKERS': '16',
+                'SMS_MAX_ATTEMPTS': '5',
+                'DEDUPE_WINDOW': '300'
+            }
         )
+        sms_target = live(sms, 'sms')
+        payload_readers.append(sms)
 
         # Create Step Function Role
         stepFunctionRole = iam.Role(
@@ -86,58 +312,241 @@ class ServerlessAppStack(Stack):
         )
 
         # Step Function State Machine
-        send_reminder = sfn.Wait( self, 'SendReminder', time = sfn.WaitTime.seconds_path('$.waitSeconds') )
-        choice_state = sfn.Choice( self, 'ChoiceState')
-        email_condition = sfn.Condition.string_equals('$.preference', 'email')
-        sms_condition = sfn.Condition.string_equals('$.preference', 'sms')
-        both_condition = sfn.Condition.string_equals('$.preference', 'both')
-        email_task = sfn_tasks.LambdaInvoke( self,  'EmailReminder', state_name = 'EmailReminder', lambda_function = email )
-        sms_task = sfn_tasks.LambdaInvoke (self, 'TextReminder', state_name = 'TextReminder', lambda_function = sms )
-        both_task = sfn.Parallel( self, 'BothReminders', state_name = 'BothReminders' 
-        ).branch( sfn_tasks.LambdaInvoke( self,  'EmailReminderPar', state_name = 'EmailReminderPar', lambda_function = email )
-        ).branch( sfn_tasks.LambdaInvoke (self, 'TextReminderPar', state_name = 'TextReminderPar', lambda_function = sms ) )
-        default_state = sfn.Fail( self, 'DefaultState', error = 'DefaultStateError', cause = 'No Matches!')
-        next_state = sfn.Pass( self, 'NextState' )
-        stepFunction = sfn.StateMachine( self,'StateMachine', state_machine_name = 'MyStateMachine', role = stepFunctionRole,
-            definition = send_reminder.next(choice_state.when(email_condition, email_task).when(sms_condition, sms_task).when(both_condition, both_task).otherwise(default_state).afterwards().next(next_state))
+        stepFunction = sfn.StateMachine( self,'StateMachine', state_machine_name = 'MyStateMachine', role = stepFunctionRole, tracing_enabled = tracing,
+            definition = self.reminder_definition('', email_target, sms_target, email_queue, integration)
         )
         stepFunction.node.default_child.override_logical_id('stepFunction')
 
-        # Create API handler Lambda Function 
+        # Express twin of the same definition for reminders that are due within express_wait_threshold seconds
+        expressStepFunction = sfn.StateMachine( self,'ExpressStateMachine', state_machine_name = 'MyExpressStateMachine', role = stepFunctionRole, tracing_enabled = tracing,
+            state_machine_type = sfn.StateMachineType.EXPRESS,
+            definition = self.reminder_definition('Express', email_target, sms_target, email_queue, integration)
+        )
+
+        if broadcast:
+            # Create Broadcast Report Lambda function
+            broadcast_report = _lambda.Function(
+                self,
+                'broadcast_report',
+                function_name = 'broadcast_report',
+                handler = 'broadcast_report.lambda_handler',
+                runtime = _lambda.Runtime.PYTHON_3_12,
+                tracing = function_tracing,
+                architecture = function_architecture,
+                memory_size = memory_sizes['broadcast_report'],
+                role = lambdaRole,
+                timeout = Duration.minutes(5),
+                code = _lambda.Code.from_asset(bundling.bundle('broadcast_report', bundle_sdk, architecture))
+            )
+            self.add_broadcast(email_target, sms_target, live(broadcast_report, 'broadcast_report'), broadcast_concurrency, broadcast_tolerated_failure)
+
+        # Create API handler Lambda Function
+        # The handler is shipped as an asset because the batch mode no longer fits in the 4KB inline code limit
         api_handler = _lambda.Function(
             self,
             'api_handler',
             function_name = 'api_handler',
-            handler = 'index.handler',
+            handler = 'api_handler.lambda_handler',
             runtime = _lambda.Runtime.PYTHON_3_12,
+            tracing = function_tracing,
+            architecture = function_architecture,
+            memory_size = memory_sizes['api_handler'],
             role = lambdaRole,
-            code = _lambda.Code.from_inline(
-                Fn.join('"', 
-                    [
-                        'import boto3\nimport json\nimport os\nimport decimal\n\nSFN_ARN = ', 
-                        Fn.get_att('stepFunction', 'Arn').to_string(),
-                        '\n\nsfn = boto3.client("stepfunctions")\n\ndef lambda_handler(event, context):\n\tprint("EVENT:")\n\tprint(event)\n\tdata = json.loads(event["body"])\n\tdata["waitSeconds"] = int(data["waitSeconds"])\n\t\n\t# Validation Checks\n\tchecks = []\n\tchecks.append("waitSeconds" in data)\n\tchecks.append(type(data["waitSeconds"]) == int)\n\tchecks.append("preference" in data)\n\tchecks.append("message" in data)\n\tif data.get("preference") == "sms":\n\t\tchecks.append("phone" in data)\n\tif data.get("preference") == "email":\n\t\tchecks.append("email" in data)\n\n\t# Check for any errors in validation checks\n\tif False in checks:\n\t\tresponse = {\n\t\t\t"statusCode": 400,\n\t\t\t"headers": {"Access-Control-Allow-Origin":"*"},\n\t\t\t"body": json.dumps(\n\t\t\t\t{\n\t\t\t\t\t"Status": "Success", \n\t\t\t\t\t"Reason": "Input failed validation"\n\t\t\t\t},\n\t\t\t\tcls=DecimalEncoder\n\t\t\t)\n\t\t}\n\t# If none, run the state machine and return a 200 code saying this is fine :)\n\telse: \n\t\tsfn.start_execution(\n\t\t\tstateMachineArn=SFN_ARN,\n\t\t\tinput=json.dumps(data, cls=DecimalEncoder)\n\t\t)\n\t\tresponse = {\n\t\t\t"statusCode": 200,\n\t\t\t"headers": {"Access-Control-Allow-Origin":"*"},\n\t\t\t"body": json.dumps(\n\t\t\t\t{"Status": "Success"},\n\t\t\t\tcls=DecimalEncoder\n\t\t\t)\n\t\t}\n\treturn response\n\n# This is a workaround for: http://bugs.python.org/issue16535\nclass DecimalEncoder(json.JSONEncoder):\n\tdef default(self, obj):\n\t\tif isinstance(obj, decimal.Decimal):\n\t\t\treturn int(obj)\n\t\treturn super(DecimalEncoder, self).default(obj)\n\n'
-                    ]
+            timeout = Duration.seconds(29),
+            code = _lambda.Code.from_asset(bundling.bundle('api_handler', bundle_sdk, architecture)),
+            environment = {
+                'SFN_ARN': stepFunction.state_machine_arn,
+                'SCHEDULER': scheduler,
+                'EXPRESS_SFN_ARN': expressStepFunction.state_machine_arn,
+                'EXPRESS_WAIT_THRESHOLD': str(express_wait_threshold),
+                'EXPRESS_SYNC': 'true' if express_sync else 'false',
+                'MAX_BATCH_SIZE': '500',
+                'MAX_WORKERS': '32'
+            }
+        )
+        api_handler_target = live(api_handler, 'api_handler')
+
+        # Functions that submit reminders and need the scheduler and idempotency settings
+        submitters = [api_handler]
+
+        reminder_queue = None
+        if ingestion == 'queue':
+            # Create Reminder Queue, messages that keep failing end up in the dead letter queue
+            reminder_dead_letter_queue = sqs.Queue(self, 'ReminderDeadLetterQueue', retention_period = Duration.days(14))
+            reminder_queue = sqs.Queue(
+                self,
+                'ReminderQueue',
+                visibility_timeout = Duration.minutes(6),
+                dead_letter_queue = sqs.DeadLetterQueue(max_receive_count = 5, queue = reminder_dead_letter_queue)
+            )
+
+            # Create Queue Consumer Lambda function, max_concurrency keeps Step Functions throttling on the queue side
+            queue_consumer = _lambda.Function(
+                self,
+                'queue_consumer',
+                function_name = 'queue_consumer',
+                handler = 'queue_consumer.lambda_handler',
+                runtime = _lambda.Runtime.PYTHON_3_12,
+                tracing = function_tracing,
+                architecture = function_architecture,
+                memory_size = memory_sizes['queue_consumer'],
+                role = lambdaRole,
+                timeout = Duration.minutes(1),
+                code = _lambda.Code.from_asset(bundling.bundle('queue_consumer', bundle_sdk, architecture)),
+                environment = {
+                    'SFN_ARN': stepFunction.state_machine_arn,
+                    'SCHEDULER': scheduler,
+                    'EXPRESS_SFN_ARN': expressStepFunction.state_machine_arn,
+                    'EXPRESS_WAIT_THRESHOLD': str(express_wait_threshold),
+                    'MAX_WORKERS': '16'
+                }
+            )
+            live(queue_consumer, 'queue_consumer').add_event_source(lambda_event_sources.SqsEventSource(
+                reminder_queue,
+                batch_size = 100,
+                max_batching_window = Duration.seconds(5),
+                max_concurrency = queue_concurrency,
+                report_batch_item_failures = True
+            ))
+            submitters.append(queue_consumer)
+
+        if idempotency:
+            # Create Idempotency Table, entries expire through the table TTL
+            idempotency_table = dynamodb.Table(
+                self,
+                'IdempotencyKeys',
+                partition_key = dynamodb.Attribute(name = 'key', type = dynamodb.AttributeType.STRING),
+                billing_mode = dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute = 'expiresAt',
+                removal_policy = RemovalPolicy.DESTROY
+            )
+            idempotency_table.grant_read_write_data(lambdaRole)
+            for function in submitters:
+                function.add_environment('IDEMPOTENCY', 'true')
+                function.add_environment('IDEMPOTENCY_TABLE', idempotency_table.table_name)
+                function.add_environment('IDEMPOTENCY_TTL', str(idempotency_ttl))
+
+        if scheduler == 'buckets':
+            # Create Reminder Schedule Table, one partition per due minute and shard
+            reminder_table = dynamodb.Table(
+                self,
+                'ReminderSchedule',
+                partition_key = dynamodb.Attribute(name = 'bucket', type = dynamodb.AttributeType.STRING),
+                sort_key = dynamodb.Attribute(name = 'id', type = dynamodb.AttributeType.STRING),
+                billing_mode = dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute = 'expiresAt',
+                removal_policy = RemovalPolicy.DESTROY
+            )
+            reminder_table.grant_read_write_data(lambdaRole)
+            for function in submitters:
+                function.add_environment('REMINDER_TABLE', reminder_table.table_name)
+                function.add_environment('SHARDS', '8')
+
+            # Create Sweeper Lambda function, limited to one concurrent run so sweeps never overlap
+            sweeper = _lambda.Function(
+                self,
+                'sweeper',
+                function_name = 'sweeper',
+                handler = 'sweeper.lambda_handler',
+                runtime = _lambda.Runtime.PYTHON_3_12,
+                tracing = function_tracing,
+                architecture = function_architecture,
+                memory_size = memory_sizes['sweeper'],
+                role = lambdaRole,
+                timeout = Duration.minutes(5),
+                reserved_concurrent_executions = 1,
+                code = _lambda.Code.from_asset(bundling.bundle('sweeper', bundle_sdk, architecture)),
+                environment = {
+                    'REMINDER_TABLE': reminder_table.table_name,
+                    'SHARDS': '8',
+                    'DISPATCH_WORKERS': '32',
+                    'SMS_RATE': '20'
+                }
+            )
+            payload_readers.append(sweeper)
+
+            # Run the sweeper every minute
+            sweep_rule = events.Rule(
+                self,
+                'SweepRule',
+                schedule = events.Schedule.rate(Duration.minutes(1))
+            )
+            sweep_rule.add_target(events_targets.LambdaFunction(live(sweeper, 'sweeper')))
+
+        if claim_check_threshold and integration == 'lambda':
+            # Create Payload Bucket, messages outlive the longest wait of a year
+            payload_bucket = s3.Bucket(
+                self,
+                'PayloadBucket',
+                block_public_access = s3.BlockPublicAccess.BLOCK_ALL,
+                enforce_ssl = True,
+                lifecycle_rules = [s3.LifecycleRule(prefix = 'messages/', expiration = Duration.days(400))],
+                removal_policy = RemovalPolicy.DESTROY,
+                auto_delete_objects = True
+            )
+            payload_bucket.grant_read_write(lambdaRole)
+            for function in submitters:
+                function.add_environment('PAYLOAD_BUCKET', payload_bucket.bucket_name)
+                function.add_environment('CLAIM_CHECK_THRESHOLD', str(claim_check_threshold))
+            for function in payload_readers:
+                function.add_environment('PAYLOAD_BUCKET', payload_bucket.bucket_name)
+
+        if api_type == 'http':
+            self.add_http_api(api_handler_target, throttle, method_throttles)
+            if compression_threshold >= 0:
+                api_handler.add_environment('COMPRESSION_THRESHOLD', str(compression_threshold))
+        else:
+            # Create Rest API, the stage limits and the method limits below them
+            api_reminder = apigateway.RestApi(
+                self,
+                'reminders',
+                rest_api_name = 'reminders',
+                min_compression_size = Size.bytes(compression_threshold) if compression_threshold >= 0 else None,
+                deploy_options = apigateway.StageOptions(
+                    tracing_enabled = tracing,
+                    throttling_rate_limit = throttle[0] if throttle else None,
+                    throttling_burst_limit = throttle[1] if throttle else None,
+                    method_options = {
+                        path + '/POST': apigateway.MethodDeploymentOptions(throttling_rate_limit = limits[0], throttling_burst_limit = limits[1])
+                        for path, limits in method_throttles.items()
+                    }
+                ),
+                default_cors_preflight_options = apigateway.CorsOptions(
+                    allow_origins = apigateway.Cors.ALL_ORIGINS,
+                    allow_methods = ['POST', 'OPTIONS'],
+                    allow_headers = ['Content-Type', 'Idempotency-Key'] + (['X-Api-Key'] if usage_plans else [])
                 )
             )
-        )
+            api_reminder.node.default_child.override_logical_id('apiReminders')
 
-        # Create Rest API
-        api_reminder = apigateway.RestApi(
-            self,
-            'reminders',
-            rest_api_name = 'reminders'
-        )
-        api_reminder.node.default_child.override_logical_id('apiReminders')
+            # Create API Lambda Intergration
+            api_reminder_integration = apigateway.LambdaIntegration(api_handler_target)
 
-        # Create API Lambda Intergration
-        api_reminder_integration = apigateway.LambdaIntegration(api_handler)
+            # Create API Resource
+            api_resource = api_reminder.root.add_resource('reminders')
 
-        # Create API Resource
-        api_resource = api_reminder.root.add_resource('reminders')
+            # Create API Resouce Method
+            if reminder_queue is None:
+                api_resource.add_method('POST', api_reminder_integration, api_key_required = bool(usage_plans))
+            else:
+                self.add_queue_method(api_reminder, api_resource, reminder_queue, bool(usage_plans))
 
-        # Create API Resouce Method
-        api_resource.add_method('POST', api_reminder_integration)
+            # Create API Batch Resource and Method
+            api_batch_resource = api_resource.add_resource('batch')
+            api_batch_resource.add_method('POST', api_reminder_integration, api_key_required = bool(usage_plans))
+
+            # Create a Usage Plan and API Key per client, aws apigateway get-api-key --include-value shows the key
+            for client, limits in usage_plans.items():
+                plan = api_reminder.add_usage_plan(
+                    'UsagePlan' + client,
+                    name = 'reminders-' + client,
+                    throttle = apigateway.ThrottleSettings(rate_limit = limits[0], burst_limit = limits[1]),
+                    quota = apigateway.QuotaSettings(limit = limits[2], period = apigateway.Period.DAY) if len(limits) > 2 else None
+                )
+                plan.add_api_stage(stage = api_reminder.deployment_stage)
+                api_key = api_reminder.add_api_key('ApiKey' + client, api_key_name = 'reminders-' + client)
+                plan.add_api_key(api_key)
+                CfnOutput(self, 'ApiKeyId' + client, value = api_key.key_id)
 
         # CfnOutput(self, "Reminder", value = Fn.get_att('reminder', ))
 
@@ -167,22 +576,405 @@ class ServerlessAppStack(Stack):
         #     )
         # )
 
-        deployment = s3_deployment.BucketDeployment(
-            self,
-            'S3 Deployment',
-            destination_bucket = website_bucket,
-            sources = [ s3_deployment.Source.asset('src/static_website')],
-        )
+        # Build the website, the pages keep their names and are revalidated, everything else is fingerprinted
+        # and cached for a year. Deployments share the bucket, so none of them prunes the others' files.
+        site = website.build()
+        if website_deploy == 'bucket':
+            s3_deployment.BucketDeployment(
+                self,
+                'S3 Deployment',
+                destination_bucket = website_bucket,
+                sources = [ s3_deployment.Source.asset(site['pages'])],
+                cache_control = [ s3_deployment.CacheControl.from_string(website.PAGE_CACHE_CONTROL)],
+                prune = False
+            )
+            s3_deployment.BucketDeployment(
+                self,
+                'S3 Assets Deployment',
+                destination_bucket = website_bucket,
+                sources = [ s3_deployment.Source.asset(site['assets'])],
+                cache_control = [ s3_deployment.CacheControl.from_string(website.ASSET_CACHE_CONTROL)],
+                prune = False
+            )
+            for encoding, directory in site['encodings'].items():
+                # Pre-compressed copies under br/ and gz/, same names and content types as the originals
+                s3_deployment.BucketDeployment(
+                    self,
+                    'S3 ' + encoding + ' Deployment',
+                    destination_bucket = website_bucket,
+                    destination_key_prefix = website.ENCODING_PREFIXES[encoding] + '/',
+                    sources = [ s3_deployment.Source.asset(directory)],
+                    cache_control = [ s3_deployment.CacheControl.from_string(website.ASSET_CACHE_CONTROL)],
+                    content_encoding = encoding,
+                    prune = False
+                )
 
         website_access_identity = cloudfront.OriginAccessIdentity(self, 'OriginAccessIdentity')
         website_bucket.grant_read(website_access_identity)
 
+        # Create Cache Policy that keeps the origin's Cache-Control, with Accept-Encoding in the cache key so the
+        # compressed copies are cached apart from the originals
+        website_cache_policy = cloudfront.CachePolicy(
+            self,
+            'WebsiteCachePolicy',
+            min_ttl = Duration.seconds(0),
+            default_ttl = Duration.days(1),
+            max_ttl = Duration.days(365),
+            enable_accept_encoding_gzip = True,
+            enable_accept_encoding_brotli = True
+        )
+
+        # Create CloudFront Function that sends requests to the pre-compressed copies
+        precompressed_function = cloudfront.Function(
+            self,
+            'PrecompressedAssets',
+            code = cloudfront.FunctionCode.from_inline(website.precompressed_function_code(site['encodings']))
+        )
+
         website_distribution = cloudfront.Distribution(
             self,
             'WebsiteDistribution',
             default_root_object = 'index.html',
             default_behavior = cloudfront.BehaviorOptions(
-                origin = cloudfront_origins.S3Origin(website_bucket, origin_access_identity = website_access_identity)
+                origin = cloudfront_origins.S3Origin(website_bucket, origin_access_identity = website_access_identity),
+                cache_policy = website_cache_policy,
+                compress = True,
+                function_associations = [ cloudfront.FunctionAssociation(
+                    function = precompressed_function,
+                    event_type = cloudfront.FunctionEventType.VIEWER_REQUEST
+                )]
+            )
+        )
+
+        # Outputs site_sync deploys the website with
+        CfnOutput(self, 'WebsiteBucketName', value = website_bucket.bucket_name)
+        CfnOutput(self, 'WebsiteDistributionId', value = website_distribution.distribution_id)
+        if website_deploy == 'incremental':
+            # Create an S3 bucket for the deploy manifest, CloudFront serves everything in the website bucket
+            deploy_bucket = s3.Bucket(
+                self,
+                'WebsiteDeployBucket',
+                block_public_access = s3.BlockPublicAccess.BLOCK_ALL,
+                enforce_ssl = True,
+                removal_policy = RemovalPolicy.DESTROY
+            )
+            CfnOutput(self, 'WebsiteDeployBucketName', value = deploy_bucket.bucket_name)
+
+    # Publish a version for the 'live' alias, with SnapStart or with provisioned concurrency that follows
+    # utilisation and is raised during PEAK_HOURS. Returns the function as is when it needs neither.
+    def live_alias(self, function: _lambda.Function, name: str, provisioned: int = None, snap_start: bool = False) -> _lambda.IFunction:
+        if not provisioned and not snap_start:
+            return function
+        if snap_start:
+            # The construct only offers SnapStart for Java in this CDK version
+            function.node.default_child.add_property_override('SnapStart', {'ApplyOn': 'PublishedVersions'})
+
+        alias = _lambda.Alias(
+            self,
+            name + 'Live',
+            alias_name = 'live',
+            version = function.current_version,
+            provisioned_concurrent_executions = provisioned
+        )
+        if provisioned:
+            scaling = alias.add_auto_scaling(min_capacity = provisioned, max_capacity = provisioned * PROVISIONED_SCALE_FACTOR)
+            scaling.scale_on_utilization(utilization_target = PROVISIONED_UTILIZATION)
+            scaling.scale_on_schedule(
+                'PeakStart',
+                schedule = appscaling.Schedule.cron(hour = str(PEAK_HOURS[0]), minute = '0'),
+                min_capacity = provisioned * PEAK_FACTOR
+            )
+            scaling.scale_on_schedule(
+                'PeakEnd',
+                schedule = appscaling.Schedule.cron(hour = str(PEAK_HOURS[1]), minute = '0'),
+                min_capacity = provisioned
+            )
+        return alias
+
+    # Build the wait/choice/email/sms/both definition, prefix keeps construct ids unique when it is built twice
+    # Email reminders are queued instead of sent when an email_queue is given, integration 'sdk' calls SES and SNS
+    # directly instead of going through the Lambdas. Nothing reads the task results, so every task and the
+    # Parallel state discard theirs and the reminder itself is what each state passes on.
+    def reminder_definition(self, prefix: str, email: _lambda.IFunction, sms: _lambda.IFunction,
+                            email_queue: sqs.IQueue = None, integration: str = 'lambda') -> sfn.IChainable:
+        def email_step(name):
+            if email_queue is not None:
+                return sfn_tasks.SqsSendMessage( self, prefix + name, state_name = name, queue = email_queue, message_body = sfn.TaskInput.from_json_path_at('$'), result_path = sfn.JsonPath.DISCARD )
+            if integration == 'sdk':
+                return self.sdk_step(prefix + name, name, 'ses', 'sendEmail', 'ses:SendEmail', {
+                    'Source': SENDER_EMAIL,
+                    'Destination': {'ToAddresses': sfn.JsonPath.array(sfn.JsonPath.string_at('$.email'))},
+                    'Message': {
+                        'Subject': {'Data': 'A reminder from your reminder service!'},
+                        'Body': {'Text': {'Data': sfn.JsonPath.string_at('$.message')}}
+                    }
+                })
+            return sfn_tasks.LambdaInvoke( self, prefix + name, state_name = name, lambda_function = email, result_path = sfn.JsonPath.DISCARD )
+
+        def sms_step(name):
+            if integration == 'sdk':
+                return self.sdk_step(prefix + name, name, 'sns', 'publish', 'sns:Publish', {
+                    'PhoneNumber': sfn.JsonPath.string_at('$.phone'),
+                    'Message': sfn.JsonPath.string_at('$.message')
+                })
+            return sfn_tasks.LambdaInvoke( self, prefix + name, state_name = name, lambda_function = sms, result_path = sfn.JsonPath.DISCARD )
+
+        send_reminder = sfn.Wait( self, prefix + 'SendReminder', state_name = 'SendReminder', time = sfn.WaitTime.seconds_path('$.waitSeconds') )
+        choice_state = sfn.Choice( self, prefix + 'ChoiceState', state_name = 'ChoiceState')
+        email_condition = sfn.Condition.string_equals('$.preference', 'email')
+        sms_condition = sfn.Condition.string_equals('$.preference', 'sms')
+        both_condition = sfn.Condition.string_equals('$.preference', 'both')
+        email_task = email_step('EmailReminder')
+        sms_task = sms_step('TextReminder')
+        both_task = sfn.Parallel( self, prefix + 'BothReminders', state_name = 'BothReminders', result_path = sfn.JsonPath.DISCARD 
+        ).branch( email_step('EmailReminderPar')
+        ).branch( sms_step('TextReminderPar') )
+        default_state = sfn.Fail( self, prefix + 'DefaultState', state_name = 'DefaultState', error = 'DefaultStateError', cause = 'No Matches!')
+        next_state = sfn.Pass( self, prefix + 'NextState', state_name = 'NextState' )
+        return send_reminder.next(choice_state.when(email_condition, email_task).when(sms_condition, sms_task).when(both_condition, both_task).otherwise(default_state).afterwards().next(next_state))
+
+    # One AWS SDK integration task with backoff on throttling, the SES/SNS response is dropped so the reminder
+    # itself is what reaches NextState
+    def sdk_step(self, construct_id: str, name: str, service: str, action: str, iam_action: str, parameters: dict) -> sfn.TaskStateBase:
+        task = sfn_tasks.CallAwsService(
+            self,
+            construct_id,
+            state_name = name,
+            service = service,
+            action = action,
+            iam_action = iam_action,
+            iam_resources = ['*'],
+            parameters = parameters,
+            result_path = sfn.JsonPath.DISCARD
+        )
+        task.add_retry(errors = SDK_RETRY_ERRORS[service], interval = Duration.seconds(1), backoff_rate = 2, max_attempts = 6)
+        return task
+
+    # Bucket for recipient lists and results, and the state machine that sends to every recipient of a list:
+    #   {"key": "lists/everyone.csv", "format": "csv" | "json" | "jsonl", "preference": "email" | "sms" | "both", "message": "..."}
+    # Lists have an email and/or phone field per recipient, CSV lists name them in their first row.
+    def add_broadcast(self, email: _lambda.IFunction, sms: _lambda.IFunction, report: _lambda.IFunction,
+                      max_concurrency: int, tolerated_failure: int) -> None:
+        # Create Broadcast Bucket, the per-batch results are only needed until the report is written
+        bucket = s3.Bucket(
+            self,
+            'BroadcastBucket',
+            block_public_access = s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl = True,
+            lifecycle_rules = [s3.LifecycleRule(prefix = 'results/', expiration = Duration.days(7))],
+            removal_policy = RemovalPolicy.DESTROY,
+            auto_delete_objects = True
+        )
+        bucket.grant_read_write(report)
+
+        def invoke(function, channel):
+            return {
+                'Type': 'Task',
+                'Resource': 'arn:aws:states:::lambda:invoke',
+                'Parameters': {'FunctionName': function.function_arn, 'Payload.$': '$'},
+                'ResultSelector': {channel + '.$': '$.Payload'},
+                'Retry': [{'ErrorEquals': LAMBDA_RETRY_ERRORS, 'IntervalSeconds': 2, 'MaxAttempts': 6, 'BackoffRate': 2}],
+                'End': True
+            }
+
+        # Each batch is {"Items": [recipients], "BatchInput": {"preference", "message"}} and returns
+        # {"email": {"sent", "failed"}, "sms": {"sent", "duplicate", "failed"}} for its channels
+        processor = {
+            'ProcessorConfig': {'Mode': 'DISTRIBUTED', 'ExecutionType': 'EXPRESS'},
+            'StartAt': 'BatchPreference',
+            'States': {
+                'BatchPreference': {
+                    'Type': 'Choice',
+                    'Choices': [
+                        {'Variable': '$.BatchInput.preference', 'StringEquals': 'email', 'Next': 'EmailBatch'},
+                        {'Variable': '$.BatchInput.preference', 'StringEquals': 'sms', 'Next': 'TextBatch'},
+                        {'Variable': '$.BatchInput.preference', 'StringEquals': 'both', 'Next': 'BothBatches'}
+                    ],
+                    'Default': 'UnknownPreference'
+                },
+                'EmailBatch': invoke(email, 'email'),
+                'TextBatch': invoke(sms, 'sms'),
+                'BothBatches': {
+                    'Type': 'Parallel',
+                    'Branches': [
+                        {'StartAt': 'EmailBatchPar', 'States': {'EmailBatchPar': invoke(email, 'email')}},
+                        {'StartAt': 'TextBatchPar', 'States': {'TextBatchPar': invoke(sms, 'sms')}}
+                    ],
+                    'ResultSelector': {'email.$': '$[0].email', 'sms.$': '$[1].sms'},
+                    'End': True
+                },
+                'UnknownPreference': {'Type': 'Fail', 'Error': 'UnknownPreference', 'Cause': 'preference must be email, sms or both'}
+            }
+        }
+
+        # One Distributed Map per list format, they only differ in how the list is read
+        readers = {
+            'csv': {'InputType': 'CSV', 'CSVHeaderLocation': 'FIRST_ROW'},
+            'json': {'InputType': 'JSON'},
+            'jsonl': {'InputType': 'JSONL'}
+        }
+        summarize = sfn_tasks.LambdaInvoke(
+            self,
+            'WriteBroadcastReport',
+            state_name = 'WriteBroadcastReport',
+            lambda_function = report,
+            payload = sfn.TaskInput.from_object({
+                'execution': sfn.JsonPath.string_at('$$.Execution.Name'),
+                'list': sfn.JsonPath.string_at('$.key'),
+                'preference': sfn.JsonPath.string_at('$.preference'),
+                'manifest': sfn.JsonPath.object_at('$.results.ResultWriterDetails')
+            }),
+            payload_response_only = True
+        )
+        choose_reader = sfn.Choice(self, 'ListFormat', state_name = 'ListFormat')
+        for list_format, reader in readers.items():
+            read_list = sfn.CustomState(self, 'Broadcast' + list_format.upper(), state_json = {
+                'Type': 'Map',
+                'ItemReader': {
+                    'Resource': 'arn:aws:states:::s3:getObject',
+                    'ReaderConfig': reader,
+                    'Parameters': {'Bucket': bucket.bucket_name, 'Key.$': '$.key'}
+                },
+                'ItemBatcher': {
+                    'MaxItemsPerBatch': BROADCAST_BATCH_SIZE,
+                    'BatchInput': {'preference.$': '$.preference', 'message.$': '$.message'}
+                },
+                'ItemProcessor': processor,
+                'MaxConcurrency': max_concurrency,
+                'ToleratedFailurePercentage': tolerated_failure,
+                'ResultWriter': {
+                    'Resource': 'arn:aws:states:::s3:putObject',
+                    'Parameters': {'Bucket': bucket.bucket_name, 'Prefix': 'results'}
+                },
+                'ResultPath': '$.results'
+            })
+            choose_reader.when(sfn.Condition.string_equals('$.format', list_format), read_list.next(summarize))
+        choose_reader.otherwise(sfn.Fail(self, 'UnknownFormat', state_name = 'UnknownFormat', error = 'UnknownFormat', cause = 'format must be csv, json or jsonl'))
+
+        broadcast = sfn.StateMachine(
+            self,
+            'BroadcastStateMachine',
+            state_machine_name = 'MyBroadcastStateMachine',
+            definition = choose_reader
+        )
+
+        # The map reads the list, writes the results and runs the batches as child executions of this state machine.
+        # The child executions are named after the state machine, referring to its ARN would be circular.
+        bucket.grant_read_write(broadcast)
+        email.grant_invoke(broadcast)
+        sms.grant_invoke(broadcast)
+        broadcast.add_to_role_policy(iam.PolicyStatement(
+            actions = ['states:StartExecution', 'states:DescribeExecution', 'states:StopExecution'],
+            resources = [
+                self.format_arn(service = 'states', resource = 'stateMachine', resource_name = 'MyBroadcastStateMachine', arn_format = ArnFormat.COLON_RESOURCE_NAME),
+                self.format_arn(service = 'states', resource = 'execution', resource_name = 'MyBroadcastStateMachine/*', arn_format = ArnFormat.COLON_RESOURCE_NAME)
+            ]
+        ))
+
+        CfnOutput(self, 'BroadcastBucketName', value = bucket.bucket_name)
+        CfnOutput(self, 'BroadcastStateMachineArn', value = broadcast.state_machine_arn)
+
+    # POST straight into the reminder queue, requests missing a required field are turned away by API Gateway
+    # and everything else is answered with a 202 once SQS has stored it
+    def add_queue_method(self, api: apigateway.RestApi, resource: apigateway.Resource, queue: sqs.IQueue, api_key_required: bool = False) -> None:
+        # Create API Gateway Role allowed to send to the queue
+        api_queue_role = iam.Role(self, 'ApiQueueRole', assumed_by = iam.ServicePrincipal('apigateway.amazonaws.com'))
+        queue.grant_send_messages(api_queue_role)
+
+        # The Idempotency-Key header travels as a message attribute, SQS rejects empty attribute values
+        request_template = (
+            'Action=SendMessage&MessageBody=$util.urlEncode($input.body)'
+            "#if($input.params('Idempotency-Key') != \"\")"
+            '&MessageAttribute.1.Name=IdempotencyKey'
+            '&MessageAttribute.1.Value.DataType=String'
+            "&MessageAttribute.1.Value.StringValue=$util.urlEncode($input.params('Idempotency-Key'))"
+            '#end'
+        )
+        cors = {'method.response.header.Access-Control-Allow-Origin': "'*'"}
+        queue_integration = apigateway.AwsIntegration(
+            service = 'sqs',
+            path = self.account + '/' + queue.queue_name,
+            integration_http_method = 'POST',
+            options = apigateway.IntegrationOptions(
+                credentials_role = api_queue_role,
+                passthrough_behavior = apigateway.PassthroughBehavior.NEVER,
+                request_parameters = {'integration.request.header.Content-Type': "'application/x-www-form-urlencoded'"},
+                request_templates = {'application/json': request_template},
+                integration_responses = [
+                    apigateway.IntegrationResponse(
+                        status_code = '202',
+                        response_parameters = cors,
+                        response_templates = {'application/json': '{"Status": "Success", "Queued": true}'}
+                    ),
+                    apigateway.IntegrationResponse(
+                        status_code = '503',
+                        selection_pattern = '[45]\\d{2}',
+                        response_parameters = cors,
+                        response_templates = {'application/json': '{"Status": "Failed", "Reason": "Reminder could not be queued"}'}
+                    )
+                ]
+            )
+        )
+
+        reminder_model = api.add_model(
+            'ReminderModel',
+            content_type = 'application/json',
+            schema = apigateway.JsonSchema(
+                schema = apigateway.JsonSchemaVersion.DRAFT4,
+                type = apigateway.JsonSchemaType.OBJECT,
+                required = ['waitSeconds', 'preference', 'message']
+            )
+        )
+        api.add_gateway_response(
+            'BadRequestBody',
+            type = apigateway.ResponseType.BAD_REQUEST_BODY,
+            status_code = '400',
+            response_headers = {'Access-Control-Allow-Origin': "'*'"},
+            templates = {'application/json': '{"Status": "Failed", "Reason": "Input failed validation"}'}
+        )
+
+        resource.add_method(
+            'POST',
+            queue_integration,
+            request_models = {'application/json': reminder_model},
+            request_validator_options = apigateway.RequestValidatorOptions(validate_request_body = True),
+            api_key_required = api_key_required,
+            method_responses = [
+                apigateway.MethodResponse(status_code = status_code, response_parameters = {'method.response.header.Access-Control-Allow-Origin': True})
+                for status_code in ('202', '503')
+            ]
+        )
+
+    def add_http_api(self, handler: _lambda.IFunction, throttle: tuple, method_throttles: dict) -> None:
+        # Create HTTP API, the Lambda proxy integration sends payload format 2.0 events
+        api = apigatewayv2.HttpApi(
+            self,
+            'remindersHttpApi',
+            api_name = 'reminders',
+            cors_preflight = apigatewayv2.CorsPreflightOptions(
+                allow_origins = ['*'],
+                allow_methods = [apigatewayv2.CorsHttpMethod.POST, apigatewayv2.CorsHttpMethod.OPTIONS],
+                allow_headers = ['Content-Type', 'Idempotency-Key']
             )
         )
+        integration = apigatewayv2_integrations.HttpLambdaIntegration('ApiHandlerIntegration', handler)
+        routes = []
+        for path in API_PATHS:
+            routes += api.add_routes(path = path, methods = [apigatewayv2.HttpMethod.POST], integration = integration)
+
+        # Limits go on the $default stage, route settings are keyed by route and need the routes to exist
+        stage = api.default_stage.node.default_child
+        if throttle:
+            stage.default_route_settings = apigatewayv2.CfnStage.RouteSettingsProperty(
+                throttling_rate_limit = throttle[0],
+                throttling_burst_limit = throttle[1]
+            )
+        if method_throttles:
+            stage.route_settings = {
+                'POST ' + path: {'ThrottlingRateLimit': limits[0], 'ThrottlingBurstLimit': limits[1]}
+                for path, limits in method_throttles.items()
+            }
+            for route in routes:
+                stage.node.add_dependency(route)
 
+        CfnOutput(self, 'HttpApiUrl', value = api.api_endpoint)
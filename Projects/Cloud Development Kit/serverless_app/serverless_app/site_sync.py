@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from serverless_app import website
+
+# Incremental website deployment, used instead of the BucketDeployments when website_deploy is 'incremental'
+#
+# A manifest of every deployed key with a hash of its content and headers is kept in a separate deploy bucket,
+# CloudFront serves the whole website bucket and would hand the manifest to anyone who asked. A deploy
+# uploads only the keys whose hash changed, in parallel and multipart for large files, deletes keys that left
+# the site and invalidates only the changed paths that are not fingerprinted. Fingerprinted assets are kept
+# for stale_grace seconds after they leave the site, so pages still open in a browser can load them.
+#
+#   python3 -m serverless_app.site_sync --stack ServerlessAppStack
+
+MANIFEST_KEY = '.deploy-manifest.json'
+
+# Parts of 8MB, uploaded by up to MAX_CONCURRENCY threads per file
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MAX_CONCURRENCY = 10
+UPLOAD_WORKERS = 16
+
+# CloudFront accepts at most 3000 paths in progress, past that the whole distribution is invalidated
+MAX_INVALIDATION_PATHS = 3000
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+# Every object of a website build: {key: {'path', 'ContentType', 'CacheControl', 'ContentEncoding'?, 'hash'}}
+def local_objects(site_dir: str = website.SITE_DIR) -> dict:
+    parts = [('pages', '', website.PAGE_CACHE_CONTROL, None), ('assets', '', website.ASSET_CACHE_CONTROL, None)]
+    parts += [(prefix, prefix + '/', website.ASSET_CACHE_CONTROL, encoding) for encoding, prefix in website.ENCODING_PREFIXES.items()]
+
+    objects = {}
+    for directory, prefix, cache_control, encoding in parts:
+        root = os.path.join(site_dir, directory)
+        for folder, dirs, names in os.walk(root):
+            for name in names:
+                path = os.path.join(folder, name)
+                key = prefix + os.path.relpath(path, root).replace(os.sep, '/')
+                entry = {
+                    'path': path,
+                    'ContentType': mimetypes.guess_type(key)[0] or 'application/octet-stream',
+                    'CacheControl': cache_control
+                }
+                if encoding is not None:
+                    entry['ContentEncoding'] = encoding
+                entry['hash'] = object_hash(path, entry)
+                objects[key] = entry
+    return objects
+
+# The headers are part of the hash, so changing a Cache-Control re-uploads the object
+def object_hash(path: str, entry: dict) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    digest.update(json.dumps({name: value for name, value in entry.items() if name != 'path'}, sort_keys = True).encode('utf-8'))
+    return digest.hexdigest()
+
+def read_manifest(s3, manifest_bucket: str) -> dict:
+    try:
+        return json.loads(s3.get_object(Bucket = manifest_bucket, Key = MANIFEST_KEY)['Body'].read())
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            raise
+        return {}
+
+# Bring the bucket in line with the build, returns what was done
+def sync(s3, cloudfront, bucket: str, manifest_bucket: str, distribution_id: str = None, site_dir: str = website.SITE_DIR,
+         stale_grace: int = 86400, now: float = None, transfer_config = None) -> dict:
+    now = time.time() if now is None else now
+    objects = local_objects(site_dir)
+    manifest = read_manifest(s3, manifest_bucket)
+
+    changed = [key for key, entry in objects.items() if manifest.get(key, {}).get('hash') != entry['hash']]
+    stale = {}
+    delete = []
+    for key, entry in manifest.items():
+        if key in objects:
+            continue
+        stale_since = entry.get('staleSince', now)
+        if entry['CacheControl'] != website.ASSET_CACHE_CONTROL or now - stale_since >= stale_grace:
+            delete.append(key)
+        else:
+            stale[key] = dict(entry, staleSince = stale_since)
+
+    def upload(key):
+        entry = objects[key]
+        extra = {name: entry[name] for name in ('ContentType', 'CacheControl', 'ContentEncoding') if name in entry}
+        s3.upload_file(Filename = entry['path'], Bucket = bucket, Key = key, ExtraArgs = extra, Config = transfer_config)
+        return os.path.getsize(entry['path'])
+
+    # Assets go up before the pages that reference them, so no page is live while its assets are missing
+    assets = [key for key in changed if objects[key]['CacheControl'] == website.ASSET_CACHE_CONTROL]
+    pages = [key for key in changed if objects[key]['CacheControl'] != website.ASSET_CACHE_CONTROL]
+    with ThreadPoolExecutor(max_workers = UPLOAD_WORKERS) as executor:
+        uploaded_bytes = sum(executor.map(upload, assets))
+        uploaded_bytes += sum(executor.map(upload, pages))
+
+    # Fingerprinted keys are new URLs whenever their content changes, only the rest can be cached stale
+    paths = sorted('/' + key for key in changed + delete if (objects.get(key) or manifest[key])['CacheControl'] != website.ASSET_CACHE_CONTROL)
+    if '/index.html' in paths:
+        paths.insert(0, '/')
+    invalidation = None
+    if paths and distribution_id is not None:
+        if len(paths) > MAX_INVALIDATION_PATHS:
+            paths = ['/*']
+        invalidation = cloudfront.create_invalidation(
+            DistributionId = distribution_id,
+            InvalidationBatch = {
+                'Paths': {'Quantity': len(paths), 'Items': paths},
+                'CallerReference': hashlib.sha256(json.dumps([paths, now]).encode('utf-8')).hexdigest()
+            }
+        )['Invalidation']['Id']
+
+    # The manifest goes up before anything is deleted, so an interrupted deploy never forgets a key it uploaded
+    new_manifest = {key: {name: value for name, value in entry.items() if name != 'path'} for key, entry in objects.items()}
+    new_manifest.update(stale)
+    s3.put_object(Bucket = manifest_bucket, Key = MANIFEST_KEY, Body = json.dumps(new_manifest, sort_keys = True).encode('utf-8'),
+                  ContentType = 'application/json', CacheControl = 'no-store')
+    for i in range(0, len(delete), 1000):
+        s3.delete_objects(Bucket = bucket, Delete = {'Objects': [{'Key': key} for key in delete[i:i + 1000]], 'Quiet': True})
+
+    return {
+        'uploaded': len(changed),
+        'uploaded_bytes': uploaded_bytes,
+        'unchanged': len(objects) - len(changed),
+        'deleted': len(delete),
+        'kept_stale': len(stale),
+        'invalidated': paths if invalidation else [],
+        'invalidation_id': invalidation
+    }
+
+def stack_outputs(stack_name: str) -> dict:
+    import boto3
+    stack = boto3.client('cloudformation').describe_stacks(StackName = stack_name)['Stacks'][0]
+    return {output['OutputKey']: output['OutputValue'] for output in stack.get('Outputs', [])}
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Deploy the website build incrementally')
+    parser.add_argument('--stack', default = 'ServerlessAppStack', help = 'stack to read the bucket and distribution from')
+    parser.add_argument('--bucket', help = 'website bucket, instead of the stack output')
+    parser.add_argument('--manifest-bucket', help = 'bucket the deploy manifest is kept in, instead of the stack output')
+    parser.add_argument('--distribution', help = 'CloudFront distribution id, instead of the stack output')
+    parser.add_argument('--stale-grace', type = int, default = 86400, help = 'seconds old fingerprinted assets are kept')
+    parser.add_argument('--no-build', action = 'store_true', help = 'deploy the existing build/website')
+    args = parser.parse_args()
+
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    bucket, manifest_bucket, distribution_id = args.bucket, args.manifest_bucket, args.distribution
+    if bucket is None or manifest_bucket is None or distribution_id is None:
+        outputs = stack_outputs(args.stack)
+        bucket = bucket or outputs['WebsiteBucketName']
+        manifest_bucket = manifest_bucket or outputs['WebsiteDeployBucketName']
+        distribution_id = distribution_id or outputs['WebsiteDistributionId']
+    if not args.no_build:
+        website.build()
+
+    result = sync(
+        boto3.client('s3'),
+        boto3.client('cloudfront'),
+        bucket,
+        manifest_bucket,
+        distribution_id,
+        stale_grace = args.stale_grace,
+        transfer_config = TransferConfig(multipart_threshold = MULTIPART_THRESHOLD, multipart_chunksize = MULTIPART_THRESHOLD, max_concurrency = MAX_CONCURRENCY)
+    )
+    print(json.dumps(result, indent = 2))
+
+if __name__ == '__main__':
+    main()
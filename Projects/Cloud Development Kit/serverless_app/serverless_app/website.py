@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+
+from serverless_app import bundling
+
+# Build step for the static website
+#
+# Every asset is renamed after a hash of its content so it can be cached for a year, and the pages are rewritten
+# to point at the new names. CSS and JS are also written pre-compressed under br/ and gz/, where a CloudFront
+# Function sends the requests that accept them, and images get resized WebP and AVIF variants the pages offer
+# through <picture>. Pillow and brotli are optional, without them the variants are skipped.
+
+SOURCE_DIR = 'src/static_website'
+SITE_DIR = os.path.join(bundling.BUILD_DIR, 'website')
+
+# Cache-Control of the fingerprinted assets and of the pages, which keep their names and have to be revalidated
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PAGE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+PAGES = ('.html',)
+IMAGES = ('.png', '.jpg', '.jpeg')
+# Assets stored pre-compressed, CloudFront compresses the pages itself
+COMPRESSIBLE = ('.css', '.js', '.svg')
+# Key prefix of the pre-compressed copies per Content-Encoding
+ENCODING_PREFIXES = {'br': 'br', 'gzip': 'gz'}
+
+# Widths of the responsive image variants, an image is never scaled up
+IMAGE_WIDTHS = (480, 960, 1440)
+IMAGE_FORMATS = (('avif', 'AVIF', 'image/avif'), ('webp', 'WEBP', 'image/webp'))
+
+# Local references in src/href attributes and CSS url()
+REFERENCE = re.compile(r'''((?:src|href)=["']|url\(["']?)([^"')]+)''')
+IMAGE_TAG = re.compile(r'<img\b[^>]*>')
+
+# Assemble build/website and return where each part goes:
+# {'pages': dir, 'assets': dir, 'encodings': {'br': dir, 'gzip': dir}, 'report': {...}}
+def build(source: str = SOURCE_DIR, target: str = SITE_DIR) -> dict:
+    shutil.rmtree(target, ignore_errors = True)
+    directories = {part: os.path.join(target, part) for part in ['pages', 'assets'] + list(ENCODING_PREFIXES.values())}
+    for directory in directories.values():
+        os.makedirs(directory)
+
+    files = sorted(
+        os.path.relpath(os.path.join(root, name), source).replace(os.sep, '/')
+        for root, dirs, names in os.walk(source) for name in names
+    )
+    # Images first, then the stylesheets and scripts that can refer to them, and the pages last
+    order = lambda path: (0 if path.endswith(IMAGES) else 2 if path.endswith(PAGES) else 1, path)
+
+    names = {}
+    variants = {}
+    encodings = {encoding: directories[prefix] for encoding, prefix in ENCODING_PREFIXES.items()}
+    compressors = {'gzip': lambda data: gzip.compress(data, 9, mtime = 0)}
+    try:
+        import brotli
+        compressors['br'] = lambda data: brotli.compress(data, quality = 11)
+    except ImportError:
+        print('website: brotli is not installed, only gzip variants are built')
+        del encodings['br']
+
+    report = {'assets': {}, 'pages': {}}
+    for path in sorted(files, key = order):
+        with open(os.path.join(source, path), 'rb') as f:
+            data = f.read()
+
+        if path.endswith(PAGES):
+            page = rewrite_page(data.decode('utf-8'), names, variants)
+            write(directories['pages'], path, page.encode('utf-8'))
+            report['pages'][path] = page_report(page, len(page.encode('utf-8')), report['assets'], variants)
+            continue
+
+        if path.endswith('.css'):
+            data = rewrite_references(data.decode('utf-8'), names).encode('utf-8')
+        names[path] = fingerprint(path, data)
+        write(directories['assets'], names[path], data)
+        entry = {'name': names[path], 'bytes': len(data)}
+
+        if path.endswith(COMPRESSIBLE):
+            for encoding, compress in compressors.items():
+                compressed = compress(data)
+                write(encodings[encoding], names[path], compressed)
+                entry[encoding] = len(compressed)
+        if path.endswith(IMAGES):
+            variants[path] = image_variants(data, names[path], directories['assets'])
+            entry['variants'] = {name: size for width, mime, name, size in variants[path]}
+        report['assets'][path] = entry
+
+    referenced = set(reference for page in report['pages'].values() for reference in page['local'])
+    report['unreferenced'] = [path for path in report['assets'] if path not in referenced]
+    print_report(report)
+    with open(os.path.join(bundling.BUILD_DIR, 'website_report.json'), 'w') as f:
+        json.dump(report, f, indent = 2)
+
+    return {'pages': directories['pages'], 'assets': directories['assets'], 'encodings': encodings, 'report': report}
+
+# name.css -> name.<first 10 hex digits of the sha256>.css
+def fingerprint(path: str, data: bytes) -> str:
+    stem, extension = os.path.splitext(path)
+    return stem + '.' + hashlib.sha256(data).hexdigest()[:10] + extension
+
+def write(directory: str, path: str, data: bytes) -> None:
+    target = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(target), exist_ok = True)
+    with open(target, 'wb') as f:
+        f.write(data)
+
+def local_path(url: str):
+    if url.startswith(('http:', 'https:', '//', 'data:', '#', 'mailto:')):
+        return None
+    return url.split('?')[0].split('#')[0].lstrip('./').lstrip('/')
+
+def rewrite_references(text: str, names: dict) -> str:
+    def replace(match):
+        path = local_path(match.group(2))
+        if path not in names:
+            return match.group(0)
+        return match.group(1) + '/' + names[path]
+    return REFERENCE.sub(replace, text)
+
+# Point the page at the fingerprinted assets and wrap images that have variants in a <picture>
+def rewrite_page(page: str, names: dict, variants: dict) -> str:
+    def picture(match):
+        tag = match.group(0)
+        source = re.search(r'''src=["']([^"']+)''', tag)
+        path = local_path(source.group(1)) if source else None
+        if not variants.get(path):
+            return tag
+        sources = ''
+        for extension, image_format, mime in IMAGE_FORMATS:
+            srcset = ', '.join('/' + name + ' ' + str(width) + 'w' for width, variant_mime, name, size in variants[path] if variant_mime == mime)
+            if srcset:
+                sources += '<source type="' + mime + '" srcset="' + srcset + '">'
+        return '<picture>' + sources + tag + '</picture>'
+    return rewrite_references(IMAGE_TAG.sub(picture, page), names)
+
+# Resized WebP and AVIF copies of an image, returns [(width, mime type, name, bytes)]
+def image_variants(data: bytes, name: str, directory: str) -> list:
+    try:
+        from PIL import Image
+    except ImportError:
+        print('website: Pillow is not installed, skipping image variants of ' + name)
+        return []
+
+    image = Image.open(io.BytesIO(data))
+    widths = sorted(set([width for width in IMAGE_WIDTHS if width < image.width] + [min(image.width, IMAGE_WIDTHS[-1])]))
+    stem = os.path.splitext(name)[0]
+    results = []
+    for extension, image_format, mime in IMAGE_FORMATS:
+        for width in widths:
+            resized = image if width == image.width else image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            output = io.BytesIO()
+            try:
+                resized.save(output, image_format, quality = 60)
+            except (KeyError, OSError, ValueError):
+                # AVIF needs a Pillow built with libavif
+                print('website: this Pillow cannot write ' + image_format + ', skipping those variants')
+                break
+            variant = stem + '-' + str(width) + 'w.' + extension
+            write(directory, variant, output.getvalue())
+            results.append((width, mime, variant, len(output.getvalue())))
+    return results
+
+# Requests and bytes a first visit to the page costs, counting the smallest variant of each local asset a
+# current browser would pick
+def page_report(page: str, page_bytes: int, assets: dict, variants: dict) -> dict:
+    local = []
+    external = []
+    for match in REFERENCE.finditer(page):
+        url = match.group(2)
+        path = local_path(url)
+        if path is None:
+            if url.startswith(('http:', 'https:', '//')):
+                external.append(url)
+            continue
+        original = next((source for source, entry in assets.items() if entry['name'] == path), None)
+        if original is not None and original not in local:
+            local.append(original)
+
+    transfer = page_bytes
+    for path in local:
+        entry = assets[path]
+        candidates = [entry['bytes']] + [entry[encoding] for encoding in ('br', 'gzip') if encoding in entry]
+        candidates += [size for width, mime, name, size in variants.get(path, []) if width == max(width for width, mime, name, size in variants[path])]
+        transfer += min(candidates)
+    return {'requests': 1 + len(local) + len(external), 'local': local, 'external': external, 'bytes': transfer}
+
+def print_report(report: dict) -> None:
+    print('%-40s %12s %10s %10s %14s' % ('asset', 'bytes', 'br', 'gzip', 'best variant'))
+    for path, entry in report['assets'].items():
+        best = min(entry.get('variants', {}).items(), key = lambda item: item[1], default = ('', ''))
+        print('%-40s %12d %10s %10s %14s' % (entry['name'][:40], entry['bytes'], entry.get('br', ''), entry.get('gzip', ''), best[1]))
+    for path, page in report['pages'].items():
+        print('page %s: %d requests (%d external), %.1f KB of local transfer' % (path, page['requests'], len(page['external']), page['bytes'] / 1024.0))
+    if report['unreferenced']:
+        print('not referenced by any page: ' + ', '.join(report['unreferenced']))
+
+# CloudFront Function that serves the pre-compressed copy of an asset when the viewer accepts it
+def precompressed_function_code(encodings: dict) -> str:
+    checks = []
+    for encoding, prefix in ENCODING_PREFIXES.items():
+        if encoding in encodings:
+            checks.append("if (accepted.indexOf('" + encoding + "') !== -1) { request.uri = '/" + prefix + "' + request.uri; return request; }")
+    return (
+        'function handler(event) {\n'
+        '    var request = event.request;\n'
+        "    var header = request.headers['accept-encoding'];\n"
+        "    if (!header || !/\\.[0-9a-f]{10}\\.(" + '|'.join(extension[1:] for extension in COMPRESSIBLE) + ')$/.test(request.uri)) { return request; }\n'
+        '    var accepted = header.value;\n'
+        '    ' + '\n    '.join(checks) + '\n'
+        '    return request;\n'
+        '}\n'
+    )
@@ -1,62 +1,269 @@
-import boto3
-import json
+import base64
+import gzip
 import os
-import decimal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from reminders_common import claimcheck, clients, fastjson, metrics, validation
+from reminders_common.idempotency import IdempotencyStore, execution_name, key_for
+from reminders_common.schedule import new_item
 
-SFN_ARN = 'STEP_FUNCTION_ARN'
+SFN_ARN = os.environ.get('SFN_ARN', 'STEP_FUNCTION_ARN')
 
-sfn = boto3.client('stepfunctions')
+# Reminders due within EXPRESS_WAIT_THRESHOLD seconds go to the Express workflow, a threshold of 0 or less disables it
+EXPRESS_SFN_ARN = os.environ.get('EXPRESS_SFN_ARN', 'EXPRESS_STEP_FUNCTION_ARN')
+EXPRESS_WAIT_THRESHOLD = int(os.environ.get('EXPRESS_WAIT_THRESHOLD', '0'))
+EXPRESS_SYNC = os.environ.get('EXPRESS_SYNC', 'false') == 'true'
 
+# Scheduler backend, either 'stepfunctions' or 'buckets'
+SCHEDULER = os.environ.get('SCHEDULER', 'stepfunctions')
+REMINDER_TABLE = os.environ.get('REMINDER_TABLE', 'ReminderSchedule')
+SHARDS = int(os.environ.get('SHARDS', '8'))
+
+# Optional idempotency, a repeat of a reminder within IDEMPOTENCY_TTL seconds is answered without submitting it again
+IDEMPOTENCY = os.environ.get('IDEMPOTENCY', 'false') == 'true'
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'IdempotencyKeys')
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '300'))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000'))
+
+# Batch settings
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '500'))
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '32'))
+
+# Responses of COMPRESSION_THRESHOLD bytes or more are gzipped for clients that accept it. REST APIs compress on
+# their own, so only the HTTP API variant sets it, a negative threshold turns it off.
+COMPRESSION_THRESHOLD = int(os.environ.get('COMPRESSION_THRESHOLD', '-1'))
+
+# A single client is shared by every worker thread, so its connection pool has to be as large as the pool
+def sfn():
+    return clients.client('stepfunctions', max_pool_connections=MAX_WORKERS)
+
+# Reminder table used by the bucket scheduler
+def table():
+    return clients.table(REMINDER_TABLE)
+
+# Warm-container LRU in front of the persistent store
+idempotency_store = None
+
+def idempotency():
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = IdempotencyStore(clients.table(IDEMPOTENCY_TABLE), ttl=IDEMPOTENCY_TTL, size=IDEMPOTENCY_CACHE_SIZE)
+    return idempotency_store
+
+# Bounded thread pool reused across warm invocations
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+# Bodies of the most common responses, serialized once per container
+SUCCESS_BODY = fastjson.dumps({"Status": "Success"})
+INVALID_JSON_BODY = fastjson.dumps({"Status": "Failed", "Reason": "Body is not valid JSON"})
+
+@metrics.handler('api_handler')
 def lambda_handler(event, context):
-    print('EVENT:')
-    print(event)
-    data = json.loads(event['body'])
-    data['waitSeconds'] = int(data['waitSeconds'])
-    
-    # Validation Checks
-    checks = []
-    checks.append('waitSeconds' in data)
-    checks.append(type(data['waitSeconds']) == int)
-    checks.append('preference' in data)
-    checks.append('message' in data)
-    if data.get('preference') == 'sms':
-        checks.append('phone' in data)
-    if data.get('preference') == 'email':
-        checks.append('email' in data)
-
-    # Check for any errors in validation checks
-    if False in checks:
-        response = {
-            "statusCode": 400,
-            "headers": {"Access-Control-Allow-Origin":"*"},
-            "body": json.dumps(
-                {
-                    "Status": "Success", 
-                    "Reason": "Input failed validation"
-                },
-                cls=DecimalEncoder
-            )
-        }
-    # If none, run the state machine and return a 200 code saying this is fine :)
-    else: 
-        sfn.start_execution(
-            stateMachineArn=SFN_ARN,
-            input=json.dumps(data, cls=DecimalEncoder)
-        )
-        response = {
-            "statusCode": 200,
-            "headers": {"Access-Control-Allow-Origin":"*"},
-            "body": json.dumps(
-                {"Status": "Success"},
-                cls=DecimalEncoder
-            )
-        }
+    metrics.log_event(event)
+
+    # POST /reminders/batch takes a list of reminders. REST API events (payload 1.0) name the resource, HTTP API
+    # events (payload 2.0) the route, e.g. 'POST /reminders/batch'
+    if (event.get('resource') or event.get('routeKey') or '').endswith('/batch'):
+        response = batch_handler(event)
+    else:
+        response = reminder_handler(event)
+    return compress(event, response)
+
+def reminder_handler(event):
+    try:
+        data = fastjson.loads(request_body(event))
+    except (TypeError, ValueError):
+        metrics.count('ValidationFailed')
+        return respond_raw(400, INVALID_JSON_BODY)
+
+    # Every field that failed is reported back
+    errors = validation.validate(data)
+    if errors:
+        metrics.count('ValidationFailed')
+        return respond(400, {"Status": "Failed", "Reason": "Input failed validation", "Errors": errors})
+
+    # Run the state machine and return a 200 code saying this is fine :)
+    try:
+        result = submit_once(data, header(event, 'Idempotency-Key'))
+    except ExpressExecutionFailed as e:
+        return respond(502, {"Status": "Failed", "Reason": e.error})
+    if result['status'] == 'conflict':
+        return respond(409, {"Status": "Failed", "Reason": "Idempotency-Key was already used for a different reminder"})
+    if result['status'] == 'in_progress':
+        return respond(409, {"Status": "Failed", "Reason": "The same reminder is still being submitted"})
+    response = respond_raw(200, SUCCESS_BODY)
+    if result.get('replayed'):
+        response['headers']['Idempotent-Replayed'] = 'true'
+    return response
+
+def batch_handler(event):
+    try:
+        body = fastjson.loads(request_body(event))
+    except (TypeError, ValueError):
+        return respond_raw(400, INVALID_JSON_BODY)
+
+    # Accept either a bare list or {"reminders": [...]}
+    reminders = body.get('reminders') if isinstance(body, dict) else body
+    if not isinstance(reminders, list) or not reminders:
+        return respond(400, {"Status": "Failed", "Reason": "Body must contain a non-empty list of reminders"})
+    if len(reminders) > MAX_BATCH_SIZE:
+        return respond(400, {"Status": "Failed", "Reason": "Batch exceeds " + str(MAX_BATCH_SIZE) + " reminders"})
+
+    # Validate every reminder first so nothing is started for items that can never succeed
+    results = []
+    valid = []
+    for i, data in enumerate(reminders):
+        errors = validation.validate(data)
+        if not errors:
+            results.append({"index": i, "status": "pending"})
+            valid.append(i)
+        else:
+            metrics.count('ValidationFailed')
+            results.append({"index": i, "status": "invalid", "reason": validation.reason(errors), "errors": errors})
+
+    # The bucket scheduler writes its share of the batch at once, unless every reminder has to pass the idempotency
+    # check on its own. Everything else is submitted concurrently over the shared client.
+    queued = [i for i in valid if SCHEDULER == 'buckets' and not IDEMPOTENCY and not use_express(reminders[i])]
+    queued_set = set(queued)
+    submitted = [i for i in valid if i not in queued_set]
+    if queued:
+        for i, result in zip(queued, schedule_batch([reminders[i] for i in queued])):
+            results[i].update(result)
+
+    # An Idempotency-Key on a batch covers each reminder by its position
+    header_key = header(event, 'Idempotency-Key')
+    item_keys = [header_key + '#' + str(i) if header_key else None for i in submitted]
+    for i, result in zip(submitted, executor.map(try_submit, [reminders[i] for i in submitted], item_keys)):
+        results[i].update(result)
+
+    started = sum(1 for result in results if result['status'] in ('started', 'scheduled', 'completed'))
+    return respond(200, {
+        "Status": "Success" if started == len(results) else "PartialSuccess",
+        "Started": started,
+        "Failed": len(results) - started,
+        "Results": results
+    })
+
+# Returns the reason a reminder failed validation, or None if it passed
+def validate(data):
+    return validation.reason(validation.validate(data))
+
+def use_express(data):
+    return EXPRESS_WAIT_THRESHOLD > 0 and data['waitSeconds'] <= EXPRESS_WAIT_THRESHOLD
+
+# Payload 2.0 events have no body key when the request had none, either version base64 encodes binary bodies
+def request_body(event):
+    body = event.get('body')
+    if body is not None and event.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    return body
+
+def header(event, name):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+# Submit a reminder unless it was already submitted, a repeat returns the earlier result with replayed set
+def submit_once(data, header_key=None):
+    if not IDEMPOTENCY:
+        return submit(data)
+
+    key, fingerprint = key_for(data, header_key)
+    previous = idempotency().begin(key, fingerprint)
+    if previous is not None:
+        if previous['status'] == 'completed':
+            return dict(previous['result'], replayed=True)
+        return {"status": previous['status']}
+
+    try:
+        result = submit(data, execution_name(key, time.time(), IDEMPOTENCY_TTL))
+    except Exception:
+        idempotency().release(key)
+        raise
+    idempotency().complete(key, fingerprint, result)
+    return result
+
+# Start the reminder on the right workflow or write it to the bucket scheduler, name makes it deterministic
+def submit(data, name=None):
+    data = claimcheck.check_in(data)
+    if SCHEDULER == 'buckets' and not use_express(data):
+        item = new_item(data, time.time(), SHARDS, name)
+        table().put_item(Item=item)
+        return {"status": "scheduled", "reminderId": item['id']}
+
+    execution = start_execution(data, name)
+    return {
+        "status": "completed" if 'stopDate' in execution else "started",
+        "workflow": "express" if use_express(data) else "standard",
+        "executionArn": execution['executionArn']
+    }
+
+def schedule_batch(reminders):
+    now = time.time()
+    items = [new_item(claimcheck.check_in(data), now, SHARDS) for data in reminders]
+    try:
+        # batch_writer groups the puts into BatchWriteItem calls of 25 and resends unprocessed items
+        with table().batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+    except Exception as e:
+        error = getattr(e, 'response', {}).get('Error', {}).get('Code', type(e).__name__)
+        return [{"status": "failed", "error": error} for item in items]
+    return [{"status": "scheduled", "reminderId": item['id']} for item in items]
+
+def start_execution(data, name=None):
+    request = {'input': fastjson.dumps(data)}
+    if name is not None:
+        request['name'] = name
+    if not use_express(data):
+        with metrics.timed('StartExecutionLatency'):
+            return sfn().start_execution(stateMachineArn=SFN_ARN, **request)
+    if EXPRESS_SYNC:
+        # Runs the whole workflow before returning
+        with metrics.timed('StartSyncExecutionLatency'):
+            execution = sfn().start_sync_execution(stateMachineArn=EXPRESS_SFN_ARN, **request)
+        if execution['status'] != 'SUCCEEDED':
+            raise ExpressExecutionFailed(execution['executionArn'], execution.get('error', execution['status']))
+        return execution
+    with metrics.timed('StartExecutionLatency'):
+        return sfn().start_execution(stateMachineArn=EXPRESS_SFN_ARN, **request)
+
+def try_submit(data, header_key=None):
+    try:
+        return submit_once(data, header_key)
+    except ExpressExecutionFailed as e:
+        return {"status": "failed", "error": e.error, "executionArn": e.execution_arn}
+    except Exception as e:
+        # Report the AWS error code (e.g. ThrottlingException) when there is one
+        error = getattr(e, 'response', {}).get('Error', {}).get('Code', type(e).__name__)
+        return {"status": "failed", "error": error}
+
+def respond(status_code, body):
+    return respond_raw(status_code, fastjson.dumps(body))
+
+# The headers are new for every response, callers add to them
+def respond_raw(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {"Access-Control-Allow-Origin":"*"},
+        "body": body
+    }
+
+def compress(event, response):
+    if COMPRESSION_THRESHOLD < 0 or len(response['body']) < COMPRESSION_THRESHOLD:
+        return response
+    if 'gzip' not in (header(event, 'Accept-Encoding') or ''):
+        return response
+    response['body'] = base64.b64encode(gzip.compress(response['body'].encode('utf-8'), compresslevel=5)).decode('ascii')
+    response['isBase64Encoded'] = True
+    response['headers']['Content-Encoding'] = 'gzip'
     return response
 
-# This is a workaround for: http://bugs.python.org/issue16535
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return int(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Raised when a synchronous Express execution does not succeed
+class ExpressExecutionFailed(Exception):
+    def __init__(self, execution_arn, error):
+        super().__init__(execution_arn, error)
+        self.execution_arn = execution_arn
+        self.error = error
 
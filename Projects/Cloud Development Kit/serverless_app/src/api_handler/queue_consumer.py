@@ -0,0 +1,52 @@
+import api_handler
+from reminders_common import fastjson, metrics
+from api_handler import ExpressExecutionFailed, submit, submit_once, validate
+
+# Drains the reminder queue that POST /reminders writes to when ingestion is 'queue'
+#
+# Reminders go through the same validation and submission as the API handler. Messages that can never
+# succeed are dropped, the ones that failed to start are reported back so SQS retries only those.
+
+@metrics.handler('queue_consumer')
+def lambda_handler(event, context):
+    records = event['Records']
+    results = list(api_handler.executor.map(process, records))
+    return {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record, done in zip(records, results) if not done]}
+
+# Returns False when the message should be delivered again
+def process(record):
+    try:
+        data = fastjson.loads(record['body'])
+    except ValueError:
+        data = None
+    reason = 'Body is not valid JSON' if data is None else validate(data)
+    if reason is not None:
+        metrics.count('ValidationFailed')
+        print('Dropping message ' + record['messageId'] + ': ' + reason)
+        return True
+
+    try:
+        if api_handler.IDEMPOTENCY:
+            result = submit_once(data, idempotency_key(record))
+        else:
+            # SQS can deliver a message twice, naming the execution after the message makes the repeat a no-op
+            # while the execution runs and an ExecutionAlreadyExists once it has closed
+            result = submit(data, 'message-' + record['messageId'])
+    except ExpressExecutionFailed as e:
+        print('Reminder in message ' + record['messageId'] + ' failed: ' + str(e.error))
+        return False
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ExecutionAlreadyExists':
+            print('Message ' + record['messageId'] + ' was already started')
+            return True
+        print('Failed to start message ' + record['messageId'] + ': ' + repr(e))
+        return False
+
+    if result['status'] == 'conflict':
+        print('Dropping message ' + record['messageId'] + ': Idempotency-Key was already used for a different reminder')
+    # Another delivery is still submitting it, look again once it has finished
+    return result['status'] != 'in_progress'
+
+def idempotency_key(record):
+    attribute = record.get('messageAttributes', {}).get('IdempotencyKey')
+    return attribute['stringValue'] if attribute else None
@@ -0,0 +1,52 @@
+import json
+from reminders_common import clients, metrics
+
+# Sums up a broadcast from the results its Distributed Map wrote to S3
+#
+# The map writes one entry per batch, with the batch's {'email': ..., 'sms': ...} summary as its output. The
+# report keeps the totals and the first MAX_FAILURES failed recipients, and is written next to the results as
+# reports/<execution name>.json.
+
+MAX_FAILURES = 1000
+
+def s3():
+    return clients.client('s3')
+
+def read_json(bucket, key):
+    return json.loads(s3().get_object(Bucket=bucket, Key=key)['Body'].read())
+
+@metrics.handler('broadcast_report')
+def lambda_handler(event, context):
+    bucket = event['manifest']['Bucket']
+    manifest = read_json(bucket, event['manifest']['Key'])
+
+    channels = {}
+    failures = []
+    batches = {'succeeded': 0, 'failed': 0}
+    for status, files in manifest['ResultFiles'].items():
+        for result_file in files:
+            for entry in read_json(bucket, result_file['Key']):
+                if status != 'SUCCEEDED':
+                    batches['failed'] += 1
+                    failures.append({'batch': entry.get('Name'), 'error': entry.get('Error', status)})
+                    continue
+                batches['succeeded'] += 1
+                for channel, summary in json.loads(entry['Output']).items():
+                    totals = channels.setdefault(channel, {'sent': 0, 'duplicate': 0, 'failed': 0})
+                    totals['sent'] += summary['sent']
+                    totals['duplicate'] += summary.get('duplicate', 0)
+                    totals['failed'] += len(summary['failed'])
+                    failures.extend(dict(failure, channel=channel) for failure in summary['failed'])
+
+    report = {
+        'execution': event['execution'],
+        'list': event['list'],
+        'preference': event['preference'],
+        'batches': batches,
+        'channels': channels,
+        'failures': failures[:MAX_FAILURES],
+        'failuresTruncated': len(failures) > MAX_FAILURES
+    }
+    key = 'reports/' + event['execution'] + '.json'
+    s3().put_object(Bucket=bucket, Key=key, Body=json.dumps(report, separators=(',', ':')).encode('utf-8'), ContentType='application/json')
+    return {'report': 's3://' + bucket + '/' + key, 'batches': batches, 'channels': channels}
@@ -0,0 +1,38 @@
+import hashlib
+import os
+from reminders_common import clients
+
+# Messages larger than CLAIM_CHECK_THRESHOLD bytes are kept in PAYLOAD_BUCKET instead of travelling with the reminder
+#
+# check_in swaps the message for a messageRef {'bucket', 'key'} before the reminder is started or stored, and the
+# functions that send it call check_out to get the message back. Keys are content hashes, so submitting the same
+# message twice writes it once. Without a PAYLOAD_BUCKET messages always stay inline.
+
+PAYLOAD_BUCKET = os.environ.get('PAYLOAD_BUCKET')
+CLAIM_CHECK_THRESHOLD = int(os.environ.get('CLAIM_CHECK_THRESHOLD', '32768'))
+
+def s3():
+    return clients.client('s3')
+
+def check_in(data):
+    if PAYLOAD_BUCKET is None or not isinstance(data.get('message'), str):
+        return data
+    message = data['message'].encode('utf-8')
+    if len(message) <= CLAIM_CHECK_THRESHOLD:
+        return data
+
+    key = 'messages/' + hashlib.sha256(message).hexdigest()
+    s3().put_object(Bucket=PAYLOAD_BUCKET, Key=key, Body=message, ContentType='text/plain; charset=utf-8')
+    checked = {name: value for name, value in data.items() if name != 'message'}
+    checked['messageRef'] = {'bucket': PAYLOAD_BUCKET, 'key': key}
+    return checked
+
+# The reminder with its message inline, reminders that never went through check_in are returned as they are
+def check_out(data):
+    if 'messageRef' not in data:
+        return data
+    reference = data['messageRef']
+    body = s3().get_object(Bucket=reference['bucket'], Key=reference['key'])['Body'].read()
+    resolved = {name: value for name, value in data.items() if name != 'messageRef'}
+    resolved['message'] = body.decode('utf-8')
+    return resolved
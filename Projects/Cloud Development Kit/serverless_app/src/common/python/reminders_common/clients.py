@@ -0,0 +1,33 @@
+import threading
+
+# boto3 clients are created on first use and kept for the life of the container
+#
+# boto3 itself is only imported when the first client is needed, so a cold start that never calls AWS
+# (e.g. a request that fails validation) skips the SDK import entirely.
+
+_clients = {}
+_lock = threading.Lock()
+
+def client(service, max_pool_connections=10, max_attempts=None):
+    key = ('client', service, max_pool_connections, max_attempts)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                import boto3
+                from botocore.config import Config
+                retries = {'mode': 'standard'}
+                if max_attempts is not None:
+                    retries['max_attempts'] = max_attempts
+                _clients[key] = boto3.client(service, config=Config(max_pool_connections=max_pool_connections, retries=retries))
+    return _clients[key]
+
+def table(name, max_pool_connections=10):
+    key = ('table', name, max_pool_connections)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                import boto3
+                from botocore.config import Config
+                resource = boto3.resource('dynamodb', config=Config(max_pool_connections=max_pool_connections, retries={'mode': 'standard'}))
+                _clients[key] = resource.Table(name)
+    return _clients[key]
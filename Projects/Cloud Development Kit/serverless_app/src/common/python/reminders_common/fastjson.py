@@ -0,0 +1,28 @@
+import decimal
+import json
+
+# JSON through orjson when it is bundled, the standard library otherwise
+#
+# With either backend dumps returns a str and writes Decimals coming back from DynamoDB as ints. orjson leaves
+# out the spaces after separators, which JSON readers do not mind.
+
+def default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return int(obj)
+    raise TypeError('Object of type ' + type(obj).__name__ + ' is not JSON serializable')
+
+try:
+    import orjson
+
+    BACKEND = 'orjson'
+    loads = orjson.loads
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=default).decode('utf-8')
+except ImportError:
+    BACKEND = 'json'
+    loads = json.loads
+    encoder = json.JSONEncoder(default=default, separators=(', ', ': '))
+
+    def dumps(obj):
+        return encoder.encode(obj)
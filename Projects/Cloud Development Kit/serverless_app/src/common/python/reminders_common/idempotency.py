@@ -0,0 +1,102 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from reminders_common import metrics
+
+# Remembers which reminders were already submitted so repeats can be answered without starting anything
+#
+# Keys are checked in a per-container LRU first and then claimed in a DynamoDB table with a TTL, so a repeat
+# that lands on another container is still caught. A claim is a conditional put that only succeeds when the
+# key is new or its entry has expired; the result of the submission is written back once it is known.
+
+# Returns the idempotency key and a fingerprint of the reminder, the key is the client's Idempotency-Key when
+# there is one and the fingerprint otherwise
+def key_for(data, header_key=None):
+    fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+    if header_key:
+        return 'key:' + hashlib.sha256(header_key.encode('utf-8')).hexdigest(), fingerprint
+    return 'content:' + fingerprint, fingerprint
+
+# Step Functions execution names must be unique for 90 days, so the name also carries the TTL window
+def execution_name(key, now, ttl):
+    return 'reminder-' + hashlib.sha256((key + '#' + str(int(now // ttl))).encode('utf-8')).hexdigest()
+
+class IdempotencyStore:
+
+    def __init__(self, table=None, ttl=300, size=10000, clock=time.time):
+        self.table = table
+        self.ttl = ttl
+        self.size = size
+        self.clock = clock
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Returns None when the caller should go ahead and submit, otherwise the entry of the earlier submission:
+    # {'status': 'completed', 'result': ...}, {'status': 'in_progress'} or {'status': 'conflict'}
+    def begin(self, key, fingerprint):
+        now = self.clock()
+        with self.lock:
+            entry = self.recent.get(key)
+            if entry is not None and entry['expiresAt'] > now:
+                self.recent.move_to_end(key)
+                metrics.count('IdempotencyLocalHit')
+                return self.compare(entry, fingerprint)
+
+        if self.table is not None:
+            try:
+                self.table.put_item(
+                    Item={'key': key, 'fingerprint': fingerprint, 'status': 'in_progress', 'expiresAt': int(now + self.ttl)},
+                    ConditionExpression='attribute_not_exists(#k) OR expiresAt < :now',
+                    ExpressionAttributeNames={'#k': 'key'},
+                    ExpressionAttributeValues={':now': int(now)}
+                )
+            except Exception as e:
+                if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    # The store is an optimisation, carry on without it
+                    print('Idempotency store unavailable: ' + repr(e))
+                    metrics.count('IdempotencyMiss')
+                    return None
+                entry = self.table.get_item(Key={'key': key}, ConsistentRead=True).get('Item')
+                if entry is not None:
+                    metrics.count('IdempotencyStoreHit')
+                    if entry['status'] == 'completed':
+                        self.remember(key, entry)
+                    return self.compare(entry, fingerprint)
+
+        metrics.count('IdempotencyMiss')
+        return None
+
+    def complete(self, key, fingerprint, result):
+        entry = {'fingerprint': fingerprint, 'status': 'completed', 'result': json.dumps(result), 'expiresAt': int(self.clock() + self.ttl)}
+        self.remember(key, entry)
+        if self.table is not None:
+            try:
+                self.table.put_item(Item=dict(entry, key=key))
+            except Exception as e:
+                print('Idempotency store unavailable: ' + repr(e))
+
+    # Forget a claim whose submission failed so a retry can go through
+    def release(self, key):
+        with self.lock:
+            self.recent.pop(key, None)
+        if self.table is not None:
+            try:
+                self.table.delete_item(Key={'key': key})
+            except Exception as e:
+                print('Idempotency store unavailable: ' + repr(e))
+
+    def compare(self, entry, fingerprint):
+        if entry['fingerprint'] != fingerprint:
+            return {'status': 'conflict'}
+        if entry['status'] != 'completed':
+            return {'status': 'in_progress'}
+        return {'status': 'completed', 'result': json.loads(entry['result'])}
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.recent[key] = entry
+            self.recent.move_to_end(key)
+            while len(self.recent) > self.size:
+                self.recent.popitem(last=False)
@@ -0,0 +1,117 @@
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from reminders_common import fastjson
+
+# Per-invocation metrics written as Embedded Metric Format log lines
+#
+# Handlers wrapped with handler() record their duration and whether the container was cold. Code running
+# inside them, on any thread, adds latencies with timed() and counters with count(). Everything is flushed
+# as one log line when the handler returns, with every sample of a latency kept so CloudWatch can build
+# high-resolution percentiles from them.
+
+NAMESPACE = 'Reminders'
+
+# Share of invocations whose event is logged, 1 logs every event
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.01'))
+
+# EMF takes at most 100 values per metric in one line
+MAX_VALUES = 100
+
+cold = True
+current = None
+
+class Metrics:
+
+    def __init__(self, function_name, clock=time.time):
+        self.function_name = function_name
+        self.clock = clock
+        self.samples = {}
+        self.units = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, value, unit='Milliseconds'):
+        with self.lock:
+            self.samples.setdefault(name, []).append(value)
+            self.units[name] = unit
+
+    def count(self, name, value=1):
+        with self.lock:
+            counts = self.samples.setdefault(name, [0])
+            counts[0] += value
+            self.units[name] = 'Count'
+
+    # One log line per 100 samples of the busiest metric, returns the lines
+    def flush(self):
+        with self.lock:
+            samples, units = self.samples, self.units
+            self.samples, self.units = {}, {}
+        lines = []
+        for offset in range(0, max([len(values) for values in samples.values()] or [0]), MAX_VALUES):
+            chunk = {name: values[offset:offset + MAX_VALUES] for name, values in samples.items() if values[offset:offset + MAX_VALUES]}
+            line = {name: values[0] if len(values) == 1 else values for name, values in chunk.items()}
+            line['Function'] = self.function_name
+            line['_aws'] = {
+                'Timestamp': int(self.clock() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Function']],
+                    'Metrics': [{'Name': name, 'Unit': units[name], 'StorageResolution': 1} for name in chunk]
+                }]
+            }
+            lines.append(fastjson.dumps(line))
+        for line in lines:
+            emit(line)
+        return lines
+
+# Where the lines go, CloudWatch Logs picks them up from stdout
+def emit(line):
+    print(line)
+
+# Metrics go to the invocation in progress, and are dropped outside of one
+def count(name, value=1):
+    invocation = current
+    if invocation is not None:
+        invocation.count(name, value)
+
+def record(name, value, unit='Milliseconds'):
+    invocation = current
+    if invocation is not None:
+        invocation.record(name, value, unit)
+
+@contextmanager
+def timed(name):
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - began) * 1000)
+
+def log_event(event):
+    if LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE:
+        print('EVENT: ' + json.dumps(event, default=str))
+
+# Wrap a Lambda handler so every invocation records HandlerDuration and ColdStart or WarmStart
+def handler(function_name):
+    def wrap(function):
+        @functools.wraps(function)
+        def invoke(event, context):
+            global cold, current
+            # Lambda runs one invocation per process at a time, local runs can overlap them
+            invocation = current = Metrics(function_name)
+            invocation.count('ColdStart' if cold else 'WarmStart')
+            cold = False
+            began = time.perf_counter()
+            try:
+                return function(event, context)
+            finally:
+                invocation.record('HandlerDuration', (time.perf_counter() - began) * 1000)
+                invocation.flush()
+                if current is invocation:
+                    current = None
+        return invoke
+    return wrap
@@ -0,0 +1,32 @@
+import threading
+import time
+
+# Token bucket shared by the threads of one Lambda instance
+#
+# A caller asking for more tokens than are available waits until the bucket is full enough, then takes them all,
+# possibly leaving the bucket in debt, so large sends are paced at the same average rate as small ones.
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        needed = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Rounding can leave a hair short after sleeping exactly the wait, which a clock that only moves
+                # by the sleeps would never make up
+                if self.tokens >= needed - 1e-9:
+                    self.tokens -= tokens
+                    return
+                wait = (needed - self.tokens) / self.rate
+            self.sleep(wait)
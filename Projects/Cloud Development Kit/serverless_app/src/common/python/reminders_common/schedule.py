@@ -0,0 +1,46 @@
+import json
+import uuid
+import zlib
+
+# Reminders are grouped into one partition per minute, spread over a number of shards
+BUCKET_SECONDS = 60
+
+# Keep reminders around for a day past their due time in case the sweeper falls behind
+RETENTION_SECONDS = 86400
+
+# The sweeper keeps its progress in the same table under this key
+CURSOR_KEY = '#cursor'
+
+def minute_of(timestamp):
+    return int(timestamp // BUCKET_SECONDS)
+
+def bucket_key(minute, shard):
+    return str(minute) + '#' + str(shard)
+
+def bucket_keys(minute, shards):
+    return [bucket_key(minute, shard) for shard in range(shards)]
+
+def shard_of(reminder_id, shards):
+    return zlib.crc32(reminder_id.encode('utf-8')) % shards
+
+# Build the table item for a validated reminder that is due waitSeconds from now
+def new_item(data, now, shards, reminder_id=None):
+    reminder_id = reminder_id or uuid.uuid4().hex
+    due_at = int(now) + data['waitSeconds']
+    return {
+        'bucket': bucket_key(minute_of(due_at), shard_of(reminder_id, shards)),
+        'id': reminder_id,
+        'dueAt': due_at,
+        'expiresAt': due_at + RETENTION_SECONDS,
+        'attempts': 0,
+        'reminder': json.dumps(data)
+    }
+
+# Move a reminder that failed to send into a later bucket, sent lists the channels that already went out
+def reschedule(item, minute, shards, sent=()):
+    retry = dict(item)
+    retry['bucket'] = bucket_key(minute, shard_of(item['id'], shards))
+    retry['attempts'] = int(item.get('attempts', 0)) + 1
+    if sent:
+        retry['sent'] = sorted(sent)
+    return retry
@@ -0,0 +1,108 @@
+import re
+
+# Reminder validation, compiled from a schema once per container
+#
+# compile_schema turns the schema into a list of field checkers that run in one pass over the reminder and
+# report every field that failed, e.g. [{'field': 'phone', 'error': 'must be an E.164 number'}]. waitSeconds
+# is converted to an int in place, since the static website sends every field as a string.
+
+# Standard workflow executions run for a year at most
+MAX_WAIT_SECONDS = 365 * 24 * 60 * 60
+
+# SNS cuts SMS messages at 1600 characters, email-only reminders can be longer
+MAX_SMS_MESSAGE = 1600
+MAX_EMAIL_MESSAGE = 65536
+
+EMAIL = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+E164 = re.compile(r'\+[1-9][0-9]{1,14}')
+# Past 18 significant digits a value is far outside any limit, and int() refuses strings past 4300 digits
+INTEGER = re.compile(r'\s*-?0*[0-9]{1,18}\s*')
+
+# Each field is required, or required only for the preferences listed in required_for. maxLengthFor overrides
+# maxLength for some preferences.
+SCHEMA = {
+    'waitSeconds': {'type': 'integer', 'required': True, 'minimum': 0, 'maximum': MAX_WAIT_SECONDS},
+    'preference': {'type': 'string', 'required': True, 'enum': ('email', 'sms', 'both')},
+    'message': {'type': 'string', 'required': True, 'minLength': 1, 'maxLength': MAX_SMS_MESSAGE, 'maxLengthFor': {'email': MAX_EMAIL_MESSAGE}},
+    'email': {'type': 'string', 'required_for': ('email', 'both'), 'maxLength': 254, 'pattern': EMAIL, 'format': 'an email address'},
+    'phone': {'type': 'string', 'required_for': ('sms', 'both'), 'pattern': E164, 'format': 'an E.164 number'},
+}
+
+def compile_schema(schema):
+    checkers = [field_checker(name, rules) for name, rules in schema.items()]
+
+    def validate(data):
+        if not isinstance(data, dict):
+            return [{'field': None, 'error': 'Reminder must be an object'}]
+        # Fields that depend on the preference only look at it once it is a string, its own checker reports the rest
+        preference = data.get('preference')
+        if not isinstance(preference, str):
+            preference = None
+        errors = []
+        for checker in checkers:
+            error = checker(data, preference)
+            if error is not None:
+                errors.append(error)
+        return errors
+    return validate
+
+def field_checker(name, rules):
+    required = rules.get('required', False)
+    required_for = rules.get('required_for', ())
+    convert = integer if rules['type'] == 'integer' else string
+    minimum, maximum = rules.get('minimum'), rules.get('maximum')
+    min_length, max_length = rules.get('minLength'), rules.get('maxLength')
+    max_length_for = rules.get('maxLengthFor', {})
+    enum = rules.get('enum')
+    pattern = rules.get('pattern')
+
+    def fail(error):
+        return {'field': name, 'error': error}
+
+    def check(data, preference):
+        # Optional fields are not looked at, the website sends them all, empty when unused
+        if not required and preference not in required_for:
+            return None
+        if name not in data:
+            return fail('is required')
+        value = convert(data[name])
+        if value is None:
+            return fail('must be ' + ('an integer' if convert is integer else 'a string'))
+        if minimum is not None and value < minimum:
+            return fail('must be at least ' + str(minimum))
+        if maximum is not None and value > maximum:
+            return fail('must be at most ' + str(maximum))
+        if min_length is not None and len(value) < min_length:
+            return fail('must not be empty' if min_length == 1 else 'must be at least ' + str(min_length) + ' characters')
+        limit = max_length_for.get(preference, max_length)
+        if limit is not None and len(value) > limit:
+            return fail('must be at most ' + str(limit) + ' characters')
+        if enum is not None and value not in enum:
+            return fail('must be one of ' + ', '.join(enum))
+        if pattern is not None and not pattern.fullmatch(value):
+            return fail('must be ' + rules['format'])
+        if convert is integer:
+            data[name] = value
+        return None
+    return check
+
+# The value as an int, None when it is not a whole number or a string of one
+def integer(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, str):
+        return int(value) if INTEGER.fullmatch(value) else None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return None
+
+def string(value):
+    return value if isinstance(value, str) else None
+
+validate = compile_schema(SCHEMA)
+
+# One line summary of the errors, None when there are none
+def reason(errors):
+    if not errors:
+        return None
+    return '; '.join(error['error'] if error['field'] is None else error['field'] + ' ' + error['error'] for error in errors)
@@ -1,18 +1,112 @@
-import boto3
+import json
+import os
+from reminders_common import claimcheck, clients, metrics
+from reminders_common.ratelimit import TokenBucket
 
-VERIFIED_EMAIL = 'jirogal152@wenkuu.com'
+VERIFIED_EMAIL = os.environ.get('SENDER_EMAIL', 'jirogal152@wenkuu.com')
 
-ses = boto3.client('ses')
+# Batched mode settings
+TEMPLATE_NAME = os.environ.get('TEMPLATE_NAME', 'ReminderTemplate')
+# SES accepts at most 50 destinations per bulk send
+MAX_DESTINATIONS = 50
+# The account send rate is split between this many concurrent instances
+EMAIL_CONCURRENCY = int(os.environ.get('EMAIL_CONCURRENCY', '2'))
 
+def ses():
+    return clients.client('ses')
+
+limiter = None
+
+@metrics.handler('email')
 def lambda_handler(event, context):
-    ses.send_email(
-        Source=VERIFIED_EMAIL,
-        Destination={
-            'ToAddresses': [event['email']]
-        },
-        Message={
-            'Subject': {'Data': 'A reminder from your reminder service!'},
-            'Body': {'Text': {'Data': event['message']}}
-        }
-    )
-    return 'Success!'
\ No newline at end of file
+    # Reminders buffered in the email queue arrive as an SQS batch
+    if 'Records' in event:
+        return batch_handler(event)
+    # A batch of a broadcast's recipient list from the Distributed Map
+    if 'Items' in event:
+        return broadcast_handler(event)
+
+    event = claimcheck.check_out(event)
+    with metrics.timed('SendEmailLatency'):
+        ses().send_email(
+            Source=VERIFIED_EMAIL,
+            Destination={
+                'ToAddresses': [event['email']]
+            },
+            Message={
+                'Subject': {'Data': 'A reminder from your reminder service!'},
+                'Body': {'Text': {'Data': event['message']}}
+            }
+        )
+    return 'Success!'
+
+def batch_handler(event):
+    failures = []
+    reminders = []
+    for record in event['Records']:
+        try:
+            data = claimcheck.check_out(json.loads(record['body']))
+            reminders.append((record['messageId'], data['email'], data['message']))
+        except (ValueError, KeyError, TypeError):
+            metrics.count('ValidationFailed')
+            print('Malformed reminder in message ' + record['messageId'])
+            failures.append(record['messageId'])
+
+    for i in range(0, len(reminders), MAX_DESTINATIONS):
+        failures.extend(send_bulk(reminders[i:i + MAX_DESTINATIONS]))
+
+    # Only the failed messages go back to the queue
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+# Every recipient of the batch gets the same message, returns {'sent': n, 'failed': [{'recipient', 'error'}]}
+def broadcast_handler(event):
+    message = event['BatchInput']['message']
+    reminders = []
+    failed = []
+    for i, recipient in enumerate(event['Items']):
+        if recipient.get('email'):
+            reminders.append((str(i), recipient['email'], message))
+        else:
+            failed.append({'recipient': recipient.get('phone', ''), 'error': 'Missing email'})
+
+    for i in range(0, len(reminders), MAX_DESTINATIONS):
+        chunk = reminders[i:i + MAX_DESTINATIONS]
+        chunk_failed = set(send_bulk(chunk))
+        failed.extend({'recipient': email, 'error': 'Not sent'} for message_id, email, message in chunk if message_id in chunk_failed)
+    return {'sent': len(event['Items']) - len(failed), 'failed': failed}
+
+# Send up to 50 reminders in one call, returns the message ids that were not sent
+def send_bulk(reminders):
+    get_limiter().acquire(len(reminders))
+    try:
+        with metrics.timed('SendBulkEmailLatency'):
+            response = ses().send_bulk_templated_email(
+                Source=VERIFIED_EMAIL,
+                Template=TEMPLATE_NAME,
+                DefaultTemplateData=json.dumps({'message': ''}),
+                Destinations=[
+                    {
+                        'Destination': {'ToAddresses': [email]},
+                        'ReplacementTemplateData': json.dumps({'message': message})
+                    }
+                    for message_id, email, message in reminders
+                ]
+            )
+    except Exception as e:
+        print('Bulk send failed: ' + repr(e))
+        return [message_id for message_id, email, message in reminders]
+
+    failed = []
+    for (message_id, email, message), status in zip(reminders, response['Status']):
+        if status['Status'] != 'Success':
+            print('Failed to send message ' + message_id + ': ' + status['Status'] + ' ' + status.get('Error', ''))
+            failed.append(message_id)
+    return failed
+
+# Paced at the account's max send rate, looked up once per container unless SEND_RATE is set
+def get_limiter():
+    global limiter
+    if limiter is None:
+        rate = float(os.environ.get('SEND_RATE') or ses().get_send_quota()['MaxSendRate'])
+        limiter = TokenBucket(rate / EMAIL_CONCURRENCY)
+    return limiter
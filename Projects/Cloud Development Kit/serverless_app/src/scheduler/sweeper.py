@@ -0,0 +1,150 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from reminders_common import claimcheck, clients, metrics
+from reminders_common.ratelimit import TokenBucket
+from reminders_common.schedule import CURSOR_KEY, bucket_keys, minute_of, reschedule
+
+TABLE_NAME = os.environ.get('REMINDER_TABLE', 'ReminderSchedule')
+SHARDS = int(os.environ.get('SHARDS', '8'))
+SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'jirogal152@wenkuu.com')
+
+# Sweep settings
+DISPATCH_WORKERS = int(os.environ.get('DISPATCH_WORKERS', '32'))
+MAX_ATTEMPTS = int(os.environ.get('MAX_ATTEMPTS', '3'))
+LOOKBACK_MINUTES = int(os.environ.get('LOOKBACK_MINUTES', '60'))
+
+# Sends per second, SEND_RATE defaults to the account's SES max send rate. A full minute bucket would otherwise
+# go out as fast as the dispatch threads allow, get throttled and use up the reminders' attempts.
+SEND_RATE = os.environ.get('SEND_RATE')
+SMS_RATE = float(os.environ.get('SMS_RATE', '20'))
+
+# Stop starting new pages this many milliseconds before the Lambda times out
+DEADLINE_MARGIN_MS = 10000
+
+class Sweeper:
+
+    # email_rate and sms_rate cap the sends per second, with a burst of at most one send per dispatch thread
+    def __init__(self, table, send_email, send_sms, executor, shards=SHARDS, email_rate=None, sms_rate=None, burst=DISPATCH_WORKERS):
+        self.table = table
+        self.send_email = send_email
+        self.send_sms = send_sms
+        self.executor = executor
+        self.shards = shards
+        self.email_limiter = TokenBucket(email_rate, capacity=min(burst, max(email_rate, 1))) if email_rate else None
+        self.sms_limiter = TokenBucket(sms_rate, capacity=min(burst, max(sms_rate, 1))) if sms_rate else None
+
+    # Drain every bucket that has come due since the last sweep
+    def sweep(self, now, deadline=None):
+        current = minute_of(now)
+        cursor = self.read_cursor()
+        if cursor is None:
+            cursor = current - LOOKBACK_MINUTES
+        stats = {'buckets': 0, 'sent': 0, 'retried': 0, 'dropped': 0, 'complete': True}
+
+        for minute in range(cursor + 1, current + 1):
+            for key in bucket_keys(minute, self.shards):
+                if not self.drain(key, now, stats, deadline):
+                    # Out of time, pick up from this minute on the next run
+                    self.write_cursor(minute - 1)
+                    stats['complete'] = False
+                    return stats
+                stats['buckets'] += 1
+
+        # The current minute can still receive reminders, so it is swept again next time
+        self.write_cursor(current - 1)
+        return stats
+
+    # Send and delete everything in one bucket that is due, returns False if the deadline was hit
+    def drain(self, key, now, stats, deadline):
+        query = {
+            'KeyConditionExpression': '#b = :b',
+            'ExpressionAttributeNames': {'#b': 'bucket'},
+            'ExpressionAttributeValues': {':b': key}
+        }
+        while True:
+            if deadline is not None and time.time() > deadline:
+                return False
+            page = self.table.query(**query)
+            items = [item for item in page['Items'] if item['dueAt'] <= now]
+            results = list(self.executor.map(self.send, items))
+
+            with self.table.batch_writer() as batch:
+                for item, (ok, sent) in zip(items, results):
+                    batch.delete_item(Key={'bucket': item['bucket'], 'id': item['id']})
+                    if ok:
+                        stats['sent'] += 1
+                    elif int(item.get('attempts', 0)) + 1 < MAX_ATTEMPTS:
+                        batch.put_item(Item=reschedule(item, minute_of(now) + 1, self.shards, sent))
+                        stats['retried'] += 1
+                    else:
+                        print('Dropping reminder ' + item['id'] + ' after ' + str(MAX_ATTEMPTS) + ' attempts')
+                        stats['dropped'] += 1
+
+            if 'LastEvaluatedKey' not in page:
+                return True
+            query['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    # Returns whether the reminder is done and the channels it went out on, channels sent on an earlier
+    # attempt are skipped so a retry of a 'both' reminder does not send the email again
+    def send(self, item):
+        sent = set(item.get('sent', ()))
+        try:
+            data = claimcheck.check_out(json.loads(item['reminder']))
+            if data['preference'] in ('email', 'both') and 'email' not in sent:
+                if self.email_limiter is not None:
+                    self.email_limiter.acquire()
+                self.send_email(data)
+                sent.add('email')
+            if data['preference'] in ('sms', 'both') and 'sms' not in sent:
+                if self.sms_limiter is not None:
+                    self.sms_limiter.acquire()
+                self.send_sms(data)
+                sent.add('sms')
+        except Exception as e:
+            print('Failed to send reminder ' + item['id'] + ': ' + repr(e))
+            return False, sent
+        return True, sent
+
+    def read_cursor(self):
+        item = self.table.get_item(Key={'bucket': CURSOR_KEY, 'id': CURSOR_KEY}).get('Item')
+        return int(item['minute']) if item else None
+
+    def write_cursor(self, minute):
+        self.table.put_item(Item={'bucket': CURSOR_KEY, 'id': CURSOR_KEY, 'minute': minute})
+
+sweeper = None
+
+# Clients are created on the first invocation and reused while the container is warm
+def get_sweeper():
+    global sweeper
+    if sweeper is None:
+        table = clients.table(TABLE_NAME)
+        ses = clients.client('ses', max_pool_connections=DISPATCH_WORKERS)
+        sns = clients.client('sns', max_pool_connections=DISPATCH_WORKERS)
+
+        def send_email(data):
+            ses.send_email(
+                Source=SENDER_EMAIL,
+                Destination={'ToAddresses': [data['email']]},
+                Message={
+                    'Subject': {'Data': 'A reminder from your reminder service!'},
+                    'Body': {'Text': {'Data': data['message']}}
+                }
+            )
+
+        def send_sms(data):
+            sns.publish(PhoneNumber=data['phone'], Message=data['message'])
+
+        email_rate = float(SEND_RATE or ses.get_send_quota()['MaxSendRate'])
+        sweeper = Sweeper(table, send_email, send_sms, ThreadPoolExecutor(max_workers=DISPATCH_WORKERS),
+                          email_rate=email_rate, sms_rate=SMS_RATE)
+    return sweeper
+
+@metrics.handler('sweeper')
+def lambda_handler(event, context):
+    deadline = time.time() + (context.get_remaining_time_in_millis() - DEADLINE_MARGIN_MS) / 1000.0
+    stats = get_sweeper().sweep(time.time(), deadline)
+    print(json.dumps(stats))
+    return stats
@@ -0,0 +1,88 @@
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from reminders_common import metrics
+from reminders_common.ratelimit import TokenBucket
+
+# Error codes SNS returns when a publish is throttled
+THROTTLING_ERRORS = {'Throttling', 'ThrottlingException', 'Throttled', 'ThrottledException', 'TooManyRequestsException'}
+
+def error_code(e):
+    return getattr(e, 'response', {}).get('Error', {}).get('Code', type(e).__name__)
+
+# Publishes batches of SMS reminders concurrently under a per-second cap
+#
+# The cap allows a burst of one publish per worker at most, so no second, the first one included, goes past
+# rate plus workers. Throttled publishes are retried with full jitter backoff, and a phone+message pair that was
+# sent within the dedupe window is skipped. The dedupe state lives in the container, so it only covers warm
+# invocations.
+class SmsDispatcher:
+
+    def __init__(self, sns, rate, workers=16, max_attempts=5, base_delay=0.1, max_delay=5.0, dedupe_window=300,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.sns = sns
+        self.limiter = TokenBucket(rate, capacity=min(workers, max(rate, 1)), clock=clock, sleep=sleep)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dedupe_window = dedupe_window
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = {}
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    # Returns one result per reminder, in order
+    def dispatch(self, reminders):
+        results = [None] * len(reminders)
+        pending = []
+        for i, reminder in enumerate(reminders):
+            if self.claim(reminder):
+                pending.append(i)
+            else:
+                results[i] = {'status': 'duplicate'}
+        for i, result in zip(pending, self.executor.map(self.publish, [reminders[i] for i in pending])):
+            results[i] = result
+        return results
+
+    def publish(self, reminder):
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            try:
+                with metrics.timed('PublishLatency'):
+                    response = self.sns.publish(PhoneNumber=reminder['phone'], Message=reminder['message'])
+                return {'status': 'sent', 'messageId': response['MessageId']}
+            except Exception as e:
+                code = error_code(e)
+                if code in THROTTLING_ERRORS:
+                    metrics.count('PublishThrottled')
+                if code not in THROTTLING_ERRORS or attempt + 1 == self.max_attempts:
+                    # Let a later attempt at the same reminder through the dedupe check
+                    self.release(reminder)
+                    return {'status': 'failed', 'error': code}
+                with self.lock:
+                    self.throttled += 1
+                self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    # Record the reminder as sent, returns False if it was already sent within the window
+    def claim(self, reminder):
+        key = self.dedupe_key(reminder)
+        now = self.clock()
+        with self.lock:
+            if len(self.sent) > 100000:
+                self.sent = {k: t for k, t in self.sent.items() if now - t < self.dedupe_window}
+            sent_at = self.sent.get(key)
+            if sent_at is not None and now - sent_at < self.dedupe_window:
+                return False
+            self.sent[key] = now
+            return True
+
+    def release(self, reminder):
+        with self.lock:
+            self.sent.pop(self.dedupe_key(reminder), None)
+
+    def dedupe_key(self, reminder):
+        return hashlib.sha1((reminder['phone'] + '\0' + reminder['message']).encode('utf-8')).digest()
@@ -1,7 +1,47 @@
-import boto3
+import os
+from reminders_common import claimcheck, clients, metrics
+from sms_dispatcher import SmsDispatcher
 
-sns = boto3.client('sns')
+# Dispatcher settings
+SMS_RATE = float(os.environ.get('SMS_RATE', '20'))
+SMS_WORKERS = int(os.environ.get('SMS_WORKERS', '16'))
+SMS_MAX_ATTEMPTS = int(os.environ.get('SMS_MAX_ATTEMPTS', '5'))
+DEDUPE_WINDOW = int(os.environ.get('DEDUPE_WINDOW', '300'))
 
+dispatcher = None
+
+# Created on the first invocation and reused while the container is warm
+def get_dispatcher():
+    global dispatcher
+    if dispatcher is None:
+        # Throttling is retried by the dispatcher, so the client itself makes a single attempt
+        sns = clients.client('sns', max_pool_connections=SMS_WORKERS, max_attempts=1)
+        dispatcher = SmsDispatcher(sns, SMS_RATE, workers=SMS_WORKERS, max_attempts=SMS_MAX_ATTEMPTS, dedupe_window=DEDUPE_WINDOW)
+    return dispatcher
+
+@metrics.handler('sms')
 def lambda_handler(event, context):
-    sns.publish(PhoneNumber=event['phone'], Message=event['message'])
-    return 'Success!'
\ No newline at end of file
+    # A batch of reminders returns one result per reminder
+    if 'reminders' in event:
+        return {'results': get_dispatcher().dispatch([claimcheck.check_out(reminder) for reminder in event['reminders']])}
+    # A batch of a broadcast's recipient list from the Distributed Map
+    if 'Items' in event:
+        return broadcast_handler(event)
+
+    result = get_dispatcher().dispatch([claimcheck.check_out(event)])[0]
+    if result['status'] == 'failed':
+        raise SmsSendFailed(result['error'])
+    return 'Success!'
+
+# Every recipient of the batch gets the same message, returns {'sent': n, 'duplicate': n, 'failed': [{'recipient', 'error'}]}
+def broadcast_handler(event):
+    message = event['BatchInput']['message']
+    recipients = [recipient for recipient in event['Items'] if recipient.get('phone')]
+    failed = [{'recipient': recipient.get('email', ''), 'error': 'Missing phone'} for recipient in event['Items'] if not recipient.get('phone')]
+    results = get_dispatcher().dispatch([{'phone': recipient['phone'], 'message': message} for recipient in recipients])
+    failed.extend({'recipient': recipient['phone'], 'error': result['error']} for recipient, result in zip(recipients, results) if result['status'] == 'failed')
+    duplicate = sum(1 for result in results if result['status'] == 'duplicate')
+    return {'sent': len(event['Items']) - len(failed) - duplicate, 'duplicate': duplicate, 'failed': failed}
+
+class SmsSendFailed(Exception):
+    pass
@@ -15,6 +15,18 @@ function messageValue() { return document.getElementById('message').value }
 function emailValue() { return document.getElementById('email').value }
 function phoneValue() { return document.getElementById('phone').value }
 
+// Resubmitting the same reminder reuses its Idempotency-Key, so the API only sends it once
+var lastPayload = null;
+var lastIdempotencyKey = null;
+
+function idempotencyKey(payload) {
+    if (payload !== lastPayload) {
+        lastPayload = payload;
+        lastIdempotencyKey = Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+    return lastIdempotencyKey;
+}
+
 function clearNotifications() {
     // Clear any exisiting notifications in the browser notifications divs
     errorDiv.textContent = '';
@@ -41,18 +53,20 @@ function sendData (e, pref) {
     clearNotifications()
     // Prepare the appropriate HTTP request to the API with fetch
     // create uses the root /prometheon endpoint and requires a JSON payload
+    var payload = JSON.stringify({
+        waitSeconds: waitSecondsValue(),
+        preference: pref,
+        message: messageValue(),
+        email: emailValue(),
+        phone: phoneValue()
+    });
     fetch(API_ENDPOINT, {
         headers:{
-            "Content-type": "application/json"
+            "Content-type": "application/json",
+            "Idempotency-Key": idempotencyKey(payload)
         },
         method: 'POST',
-        body: JSON.stringify({
-            waitSeconds: waitSecondsValue(),
-            preference: pref,
-            message: messageValue(),
-            email: emailValue(),
-            phone: phoneValue()
-        }),
+        body: payload,
         mode: 'cors'
     })
     .then((resp) => resp.json())
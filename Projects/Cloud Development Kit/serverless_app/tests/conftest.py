@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src', 'common', 'python')] + [os.path.join(ROOT, 'src', name) for name in ('api_handler', 'sms', 'scheduler')]
+
+# api_handler with Step Functions replaced by the in-process stub and the metrics lines dropped
+@pytest.fixture
+def api_handler(monkeypatch):
+    from local.fakes import FakeStepFunctions
+    from reminders_common import metrics
+    import api_handler
+
+    monkeypatch.setattr(metrics, 'emit', lambda line: None)
+    monkeypatch.setattr(metrics, 'LOG_SAMPLE_RATE', 0)
+    stepfunctions = FakeStepFunctions()
+    monkeypatch.setattr(api_handler, 'sfn', lambda: stepfunctions)
+    return api_handler
@@ -0,0 +1,105 @@
+import pytest
+
+cdk = pytest.importorskip('aws_cdk')
+from aws_cdk.assertions import Match, Template
+
+from tests.conftest import ROOT
+
+@pytest.fixture(autouse = True)
+def in_root(monkeypatch):
+    # Function and website assets are built from paths relative to the project
+    monkeypatch.chdir(ROOT)
+
+def template(**options):
+    from serverless_app.serverless_app_stack import ServerlessAppStack
+    return Template.from_stack(ServerlessAppStack(cdk.App(), 'ServerlessAppStack', bundle_sdk = False, **options))
+
+def legacy_template(**options):
+    from serverless_app.api import ServerlessAppStack
+    return Template.from_stack(ServerlessAppStack(cdk.App(), 'LegacyStack', bundle_sdk = False, **options))
+
+def test_rest_stage_and_method_throttling():
+    template(throttle = (100, 200), method_throttles = {'/reminders/batch': (1, 2)}).has_resource_properties('AWS::ApiGateway::Stage', {
+        'MethodSettings': Match.array_with([
+            Match.object_like({'HttpMethod': '*', 'ResourcePath': '/*', 'ThrottlingRateLimit': 100, 'ThrottlingBurstLimit': 200}),
+            Match.object_like({'HttpMethod': 'POST', 'ResourcePath': '/~1reminders~1batch', 'ThrottlingRateLimit': 1, 'ThrottlingBurstLimit': 2})
+        ])
+    })
+
+def test_usage_plan_and_api_key_per_client():
+    result = template(usage_plans = {'website': (10, 20), 'partner': (50, 100, 100000)})
+    result.resource_count_is('AWS::ApiGateway::UsagePlan', 2)
+    result.resource_count_is('AWS::ApiGateway::ApiKey', 2)
+    result.resource_count_is('AWS::ApiGateway::UsagePlanKey', 2)
+    result.has_resource_properties('AWS::ApiGateway::UsagePlan', {
+        'UsagePlanName': 'reminders-partner',
+        'Throttle': {'RateLimit': 50, 'BurstLimit': 100},
+        'Quota': {'Limit': 100000, 'Period': 'DAY'},
+        'ApiStages': [Match.object_like({'ApiId': {'Ref': 'apiReminders'}})]
+    })
+    result.has_resource_properties('AWS::ApiGateway::UsagePlan', {
+        'UsagePlanName': 'reminders-website',
+        'Throttle': {'RateLimit': 10, 'BurstLimit': 20},
+        'Quota': Match.absent()
+    })
+    post_methods = result.find_resources('AWS::ApiGateway::Method', {'Properties': {'HttpMethod': 'POST'}})
+    assert len(post_methods) == 2
+    assert all(method['Properties']['ApiKeyRequired'] for method in post_methods.values())
+
+def test_api_key_is_not_required_without_usage_plans():
+    result = template()
+    result.resource_count_is('AWS::ApiGateway::UsagePlan', 0)
+    post_methods = result.find_resources('AWS::ApiGateway::Method', {'Properties': {'HttpMethod': 'POST'}})
+    assert not any(method['Properties'].get('ApiKeyRequired') for method in post_methods.values())
+
+def test_rest_compression():
+    template(compression_threshold = 1024).has_resource_properties('AWS::ApiGateway::RestApi', {'MinimumCompressionSize': 1024})
+    template().has_resource_properties('AWS::ApiGateway::RestApi', {'MinimumCompressionSize': Match.absent()})
+
+def test_http_api_limits_and_compression_in_the_handler():
+    result = template(api_type = 'http', throttle = (100, 200), method_throttles = {'/reminders/batch': (1, 2)}, compression_threshold = 1024)
+    result.resource_count_is('AWS::ApiGateway::RestApi', 0)
+    result.has_resource_properties('AWS::ApiGatewayV2::Api', {'ProtocolType': 'HTTP'})
+    result.has_resource_properties('AWS::ApiGatewayV2::Integration', {'PayloadFormatVersion': '2.0'})
+    result.has_resource_properties('AWS::ApiGatewayV2::Stage', {
+        'StageName': '$default',
+        'DefaultRouteSettings': {'ThrottlingRateLimit': 100, 'ThrottlingBurstLimit': 200},
+        'RouteSettings': {'POST /reminders/batch': {'ThrottlingRateLimit': 1, 'ThrottlingBurstLimit': 2}}
+    })
+    result.has_resource_properties('AWS::Lambda::Function', {
+        'FunctionName': 'api_handler',
+        'Environment': {'Variables': Match.object_like({'COMPRESSION_THRESHOLD': '1024'})}
+    })
+
+@pytest.mark.parametrize('options', [
+    {'api_type': 'http', 'ingestion': 'queue'},
+    {'api_type': 'http', 'usage_plans': {'website': (10, 20)}},
+    {'method_throttles': {'/reminders/other': (1, 2)}},
+    {'throttle': (0, 10)},
+    {'compression_threshold': 20 * 1024 * 1024}
+])
+def test_invalid_api_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        template(**options)
+
+def test_legacy_stack_takes_the_same_options():
+    result = legacy_template(throttle = (100, 200), method_throttles = {'/reminders/batch': (1, 2)}, compression_threshold = 1024)
+    result.has_resource_properties('AWS::ApiGateway::RestApi', {'MinimumCompressionSize': 1024})
+    result.has_resource_properties('AWS::ApiGateway::Stage', {
+        'StageName': 'prod',
+        'MethodSettings': [
+            {'HttpMethod': '*', 'ResourcePath': '/*', 'ThrottlingRateLimit': 100, 'ThrottlingBurstLimit': 200},
+            {'HttpMethod': 'POST', 'ResourcePath': '/~1reminders~1batch', 'ThrottlingRateLimit': 1, 'ThrottlingBurstLimit': 2}
+        ]
+    })
+
+def test_legacy_permissions_name_the_api_and_stage():
+    permissions = legacy_template().find_resources('AWS::Lambda::Permission')
+    for name, path in (('APILambdaIntegrationMethodPermissions', '/prod/POST/reminders'), ('APILambdaIntegrationBatchPermissions', '/prod/POST/reminders/batch')):
+        parts = permissions[name]['Properties']['SourceArn']['Fn::Join'][1]
+        assert parts[0] == 'arn:'
+        assert ':execute-api:' in parts
+        assert {'Ref': 'AWS::Region'} in parts and {'Ref': 'AWS::AccountId'} in parts
+        assert parts.index({'Ref': 'AWS::AccountId'}) == parts.index({'Ref': 'AWS::Region'}) + 2
+        assert {'Fn::GetAtt': ['reminders', 'RestApiId']} in parts
+        assert parts[-1] == path
@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from local import asl
+from tests.conftest import ROOT
+
+TEMPLATE = os.path.join(ROOT, 'src', 'step_function', 'step_function_template.json')
+
+def reminder(preference, wait_seconds = 30):
+    return {'waitSeconds': wait_seconds, 'preference': preference, 'message': 'Feed the cat'}
+
+def workflow(latency = 1.0, concurrency = None):
+    calls = []
+    handlers = {
+        'EMAIL_REMINDER_ARN': lambda data: calls.append(('email', data['message'])),
+        'TEXT_REMINDER_ARN': lambda data: calls.append(('sms', data['message']))
+    }
+    machine = asl.StateMachine(asl.load(TEMPLATE), handlers, latency = lambda name, resource: latency, concurrency = concurrency)
+    return machine, calls
+
+def test_wait_choice_and_task():
+    machine, calls = workflow()
+    execution = machine.start(reminder('email'))
+    machine.simulator.run()
+
+    assert execution.status == 'SUCCEEDED'
+    assert execution.output == reminder('email')
+    assert (execution.started_at, execution.stopped_at) == (0, 31)
+    assert calls == [('email', 'Feed the cat')]
+    assert machine.stats['states']['TextReminder'] == 0
+
+def test_parallel_runs_both_branches_at_once():
+    machine, calls = workflow()
+    execution = machine.start(reminder('both'))
+    machine.simulator.run()
+
+    assert execution.status == 'SUCCEEDED'
+    assert execution.stopped_at == 31
+    assert sorted(calls) == [('email', 'Feed the cat'), ('sms', 'Feed the cat')]
+
+def test_unmatched_choice_goes_to_the_fail_state():
+    machine, calls = workflow()
+    execution = machine.start(reminder('pigeon'))
+    machine.simulator.run()
+
+    assert (execution.status, execution.error, execution.cause) == ('FAILED', 'DefaultStateError', 'No Matches!')
+    assert execution.stopped_at == 30
+    assert calls == []
+
+def test_negative_wait_fails_the_execution():
+    machine, calls = workflow()
+    execution = machine.start(reminder('email', -1))
+    machine.simulator.run()
+
+    assert (execution.status, execution.error) == ('FAILED', 'States.Runtime')
+
+def test_executions_finish_in_virtual_time_order():
+    finished = []
+    machine, calls = workflow(latency = 0)
+    machine.on_finish = lambda execution: finished.append((execution.stopped_at, execution.input['message']))
+    for wait_seconds, at in [(300, 0), (10, 5), (100, 50)]:
+        machine.start(dict(reminder('sms', wait_seconds), message = str(wait_seconds)), at = at)
+    machine.simulator.run()
+
+    assert finished == [(15, '10'), (150, '100'), (300, '300')]
+    assert [message for channel, message in calls] == ['10', '100', '300']
+    assert machine.simulator.now == 300
+
+def test_concurrency_limit_queues_tasks():
+    machine, calls = workflow(latency = 1.0, concurrency = {'EMAIL_REMINDER_ARN': 1})
+    executions = [machine.start(reminder('email', 0)) for i in range(3)]
+    machine.simulator.run()
+
+    assert [execution.stopped_at for execution in executions] == [1, 2, 3]
+    pool = machine.pools['EMAIL_REMINDER_ARN']
+    assert (pool.calls, pool.peak, pool.waits) == (3, 1, [0.0, 1.0, 2.0])
+
+def test_missing_handler_is_rejected():
+    with pytest.raises(ValueError, match = 'TextReminder'):
+        asl.StateMachine(asl.load(TEMPLATE), {'EMAIL_REMINDER_ARN': lambda data: None})
+
+# A task that retries Flaky twice with backoff and catches everything else into $.error
+RETRYING = {
+    'StartAt': 'Send',
+    'States': {
+        'Send': {
+            'Type': 'Task',
+            'Resource': 'SEND',
+            'ResultPath': '$.result',
+            'TimeoutSeconds': 10,
+            'Retry': [{'ErrorEquals': ['Flaky'], 'IntervalSeconds': 2, 'BackoffRate': 2.0, 'MaxAttempts': 2}],
+            'Catch': [{'ErrorEquals': ['States.ALL'], 'ResultPath': '$.error', 'Next': 'Caught'}],
+            'End': True
+        },
+        'Caught': {'Type': 'Pass', 'End': True}
+    }
+}
+
+def retrying(failures, latency = 0.0):
+    calls = []
+    def send(data):
+        calls.append(len(calls))
+        if failures:
+            raise asl.StatesError(failures.pop(0), 'try again')
+        return 'sent'
+    machine = asl.StateMachine(RETRYING, {'SEND': send}, latency = lambda name, resource: latency)
+    execution = machine.start({'id': 1})
+    machine.simulator.run()
+    return execution, calls
+
+def test_retry_backs_off_then_succeeds():
+    execution, calls = retrying(['Flaky', 'Flaky'])
+
+    assert execution.status == 'SUCCEEDED'
+    assert execution.output == {'id': 1, 'result': 'sent'}
+    assert len(calls) == 3
+    assert execution.stopped_at == 2 + 4
+
+def test_catch_after_the_retries_run_out():
+    execution, calls = retrying(['Flaky', 'Flaky', 'Flaky'])
+
+    assert execution.status == 'SUCCEEDED'
+    assert execution.output == {'id': 1, 'error': {'Error': 'Flaky', 'Cause': 'try again'}}
+    assert len(calls) == 3
+
+def test_other_errors_are_caught_without_a_retry():
+    execution, calls = retrying(['Broken'])
+
+    assert execution.output['error']['Error'] == 'Broken'
+    assert len(calls) == 1
+
+def test_task_timeout_is_caught():
+    execution, calls = retrying([], latency = 30)
+
+    assert execution.output['error']['Error'] == 'States.Timeout'
+    assert execution.stopped_at == 10
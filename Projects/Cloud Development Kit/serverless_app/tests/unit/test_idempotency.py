@@ -0,0 +1,116 @@
+import pytest
+
+from local.fakes import FakeClientError, FakeTable
+from reminders_common.idempotency import IdempotencyStore, execution_name, key_for
+
+REMINDER = {'waitSeconds': 300, 'preference': 'email', 'message': 'Feed the cat', 'email': 'someone@something.com'}
+
+class Clock:
+
+    def __init__(self, now = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def table():
+    return FakeTable(hash_key = 'key', range_key = None)
+
+@pytest.fixture
+def submit_once(api_handler, monkeypatch):
+    monkeypatch.setattr(api_handler, 'IDEMPOTENCY', True)
+    def submit_once(store, data, header_key = None):
+        monkeypatch.setattr(api_handler, 'idempotency_store', store)
+        return api_handler.submit_once(data, header_key)
+    return submit_once
+
+def test_repeat_is_answered_from_the_first_result(api_handler, submit_once, table):
+    store = IdempotencyStore(table)
+    first = submit_once(store, REMINDER, 'abc')
+    repeat = submit_once(store, REMINDER, 'abc')
+
+    assert first['status'] == 'started'
+    assert repeat == dict(first, replayed = True)
+    assert len(api_handler.sfn().started) == 1
+
+def test_repeat_on_another_container_is_found_in_the_table(api_handler, submit_once, table):
+    first = submit_once(IdempotencyStore(table), REMINDER)
+    repeat = submit_once(IdempotencyStore(table), REMINDER)
+
+    assert repeat == dict(first, replayed = True)
+    assert len(api_handler.sfn().started) == 1
+
+def test_same_key_with_a_different_body_conflicts(api_handler, submit_once, table):
+    store = IdempotencyStore(table)
+    submit_once(store, REMINDER, 'abc')
+
+    assert submit_once(store, dict(REMINDER, message = 'Walk the dog'), 'abc') == {'status': 'conflict'}
+    assert submit_once(IdempotencyStore(table), dict(REMINDER, message = 'Walk the dog'), 'abc') == {'status': 'conflict'}
+    assert len(api_handler.sfn().started) == 1
+
+def test_claim_held_by_another_container_is_in_progress(table):
+    key, fingerprint = key_for(REMINDER)
+    assert IdempotencyStore(table).begin(key, fingerprint) is None
+    assert IdempotencyStore(table).begin(key, fingerprint) == {'status': 'in_progress'}
+
+def test_expired_claim_can_be_taken_again(table):
+    clock = Clock()
+    key, fingerprint = key_for(REMINDER)
+    assert IdempotencyStore(table, ttl = 300, clock = clock).begin(key, fingerprint) is None
+    clock.now += 301
+    assert IdempotencyStore(table, ttl = 300, clock = clock).begin(key, fingerprint) is None
+
+def test_failed_submission_releases_the_claim(api_handler, submit_once, table, monkeypatch):
+    store = IdempotencyStore(table)
+    stepfunctions = api_handler.sfn()
+    start_execution, failures = stepfunctions.start_execution, [FakeClientError('ThrottlingException', 'StartExecution')]
+    def flaky(**request):
+        if failures:
+            raise failures.pop()
+        return start_execution(**request)
+    monkeypatch.setattr(stepfunctions, 'start_execution', flaky)
+    with pytest.raises(FakeClientError):
+        submit_once(store, REMINDER, 'abc')
+
+    assert table.get_item(Key = {'key': key_for(REMINDER, 'abc')[0]}) == {}
+    assert submit_once(store, REMINDER, 'abc')['status'] == 'started'
+    assert len(stepfunctions.started) == 1
+
+class BrokenTable:
+
+    def put_item(self, **kwargs):
+        raise FakeClientError('ProvisionedThroughputExceededException', 'PutItem')
+
+    def get_item(self, **kwargs):
+        raise FakeClientError('ProvisionedThroughputExceededException', 'GetItem')
+
+    def delete_item(self, **kwargs):
+        raise FakeClientError('ProvisionedThroughputExceededException', 'DeleteItem')
+
+def test_store_errors_still_submit_once(api_handler, submit_once):
+    store = IdempotencyStore(BrokenTable())
+    first = submit_once(store, REMINDER, 'abc')
+    repeat = submit_once(store, REMINDER, 'abc')
+
+    assert first['status'] == 'started'
+    # The warm container still remembers the result when the table is unavailable
+    assert repeat == dict(first, replayed = True)
+    assert len(api_handler.sfn().started) == 1
+
+def test_local_cache_keeps_the_most_recent_keys():
+    store = IdempotencyStore(size = 2)
+    for key in ('a', 'b', 'c'):
+        store.complete(key, 'fingerprint-' + key, {'status': 'started'})
+
+    assert list(store.recent) == ['b', 'c']
+    assert store.begin('a', 'fingerprint-a') is None
+    assert store.begin('c', 'fingerprint-c') == {'status': 'completed', 'result': {'status': 'started'}}
+
+def test_execution_name_changes_with_the_ttl_window():
+    key, fingerprint = key_for(REMINDER, 'abc')
+
+    assert execution_name(key, 1000, 300) == execution_name(key, 1199, 300)
+    assert execution_name(key, 1000, 300) != execution_name(key, 1200, 300)
+    assert len(execution_name(key, 1000, 300)) <= 80
+    assert key_for(REMINDER)[0] != key
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from local.fakes import FakeClientError
+
+@pytest.fixture
+def queue_consumer(api_handler):
+    import queue_consumer
+    return queue_consumer
+
+def record(message_id, body):
+    return {'messageId': message_id, 'body': body if isinstance(body, str) else json.dumps(body)}
+
+REMINDER = {'waitSeconds': 300, 'preference': 'email', 'message': 'Feed the cat', 'email': 'someone@something.com'}
+
+def test_redelivery_after_the_execution_closed_is_done(api_handler, queue_consumer):
+    stepfunctions = api_handler.sfn()
+    assert queue_consumer.process(record('1', REMINDER))
+    stepfunctions.close_all()
+
+    assert queue_consumer.process(record('1', REMINDER))
+    assert len(stepfunctions.started) == 1
+
+def test_invalid_messages_are_dropped(queue_consumer):
+    assert queue_consumer.process(record('1', 'not json'))
+    assert queue_consumer.process(record('2', dict(REMINDER, preference = 'pigeon')))
+
+def test_failed_starts_are_delivered_again(api_handler, queue_consumer, monkeypatch):
+    def throttled(**request):
+        raise FakeClientError('ThrottlingException', 'StartExecution')
+    monkeypatch.setattr(api_handler.sfn(), 'start_execution', throttled)
+    assert not queue_consumer.process(record('1', REMINDER))
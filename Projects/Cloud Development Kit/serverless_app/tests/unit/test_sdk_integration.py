@@ -0,0 +1,24 @@
+import pytest
+
+cdk = pytest.importorskip('aws_cdk')
+from aws_cdk.assertions import Template
+
+from tests.conftest import ROOT
+
+@pytest.fixture(autouse = True)
+def in_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+# The state machine definitions of the stack, as the joined strings they are deployed as
+def definitions(**options):
+    from serverless_app.serverless_app_stack import ServerlessAppStack
+    template = Template.from_stack(ServerlessAppStack(cdk.App(), 'ServerlessAppStack', bundle_sdk = False, **options))
+    machines = template.find_resources('AWS::StepFunctions::StateMachine').values()
+    return [''.join(part if isinstance(part, str) else '' for part in machine['Properties']['DefinitionString']['Fn::Join'][1]) for machine in machines]
+
+def test_sdk_tasks_retry_the_errors_the_integrations_throttle_with():
+    found = definitions(integration = 'sdk')
+
+    assert any('"ErrorEquals":["Ses.SesException","States.Timeout"]' in definition for definition in found)
+    assert any('"ErrorEquals":["Sns.ThrottledException","Sns.InternalErrorException","States.Timeout"]' in definition for definition in found)
+    assert not any('Ses.ThrottlingException' in definition for definition in found)
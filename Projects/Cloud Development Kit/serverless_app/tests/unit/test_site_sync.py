@@ -0,0 +1,45 @@
+import os
+
+from local.fakes import FakeCloudFront, FakeS3
+from serverless_app import site_sync, website
+
+def build(site_dir, files):
+    for path, content in files.items():
+        path = os.path.join(site_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+def test_manifest_is_kept_out_of_the_website_bucket(tmp_path):
+    build(str(tmp_path), {'pages/index.html': '<html></html>', 'assets/main.0123456789.css': 'body {}'})
+    s3 = FakeS3()
+    site_sync.sync(s3, FakeCloudFront(), 'website-bucket', 'deploy-bucket', 'DISTRIBUTION', site_dir = str(tmp_path), now = 0)
+
+    assert sorted(key for bucket, key in s3.objects if bucket == 'website-bucket') == ['index.html', 'main.0123456789.css']
+    assert ('deploy-bucket', site_sync.MANIFEST_KEY) in s3.objects
+
+def test_unchanged_files_are_not_uploaded_again(tmp_path):
+    build(str(tmp_path), {'pages/index.html': '<html></html>', 'assets/main.0123456789.css': 'body {}'})
+    s3, cloudfront = FakeS3(), FakeCloudFront()
+    site_sync.sync(s3, cloudfront, 'website-bucket', 'deploy-bucket', 'DISTRIBUTION', site_dir = str(tmp_path), now = 0)
+    build(str(tmp_path), {'pages/index.html': '<html><body></body></html>'})
+    result = site_sync.sync(s3, cloudfront, 'website-bucket', 'deploy-bucket', 'DISTRIBUTION', site_dir = str(tmp_path), now = 1)
+
+    assert result['uploaded'] == 1
+    assert result['unchanged'] == 1
+    assert result['invalidated'] == ['/', '/index.html']
+
+def test_assets_are_uploaded_before_pages(tmp_path):
+    build(str(tmp_path), {'pages/index.html': '<html></html>', 'pages/about.html': '<html></html>', 'assets/main.0123456789.css': 'body {}', 'gz/main.0123456789.css': 'body {}'})
+    s3 = FakeS3()
+    uploads = []
+    put_object = s3.put_object
+    def record(Bucket, Key, Body, **kwargs):
+        if Bucket == 'website-bucket':
+            uploads.append(kwargs['CacheControl'])
+        return put_object(Bucket, Key, Body, **kwargs)
+    s3.put_object = record
+    site_sync.sync(s3, FakeCloudFront(), 'website-bucket', 'deploy-bucket', 'DISTRIBUTION', site_dir = str(tmp_path), now = 0)
+
+    assert uploads == sorted(uploads, key = lambda cache_control: cache_control != website.ASSET_CACHE_CONTROL)
+    assert uploads.count(website.ASSET_CACHE_CONTROL) == 2
@@ -0,0 +1,36 @@
+from local.fakes import FakeSns
+from reminders_common.ratelimit import TokenBucket
+from sms_dispatcher import SmsDispatcher
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_burst_is_one_publish_per_worker():
+    assert SmsDispatcher(FakeSns(), 200, workers = 16).limiter.capacity == 16
+    assert SmsDispatcher(FakeSns(), 5, workers = 16).limiter.capacity == 5
+
+def test_no_second_goes_past_rate_plus_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(200, capacity = 16, clock = clock, sleep = clock.sleep)
+    times = []
+    for i in range(1000):
+        bucket.acquire()
+        times.append(clock.now)
+    for i, t in enumerate(times):
+        assert sum(1 for other in times[i:] if other < t + 1.0) <= 216
+    assert abs((len(times) - 17) / (times[-1] - times[16]) - 200) < 1
+
+def test_dispatch_stays_under_the_sns_limit():
+    sns = FakeSns(limit = 30)
+    dispatcher = SmsDispatcher(sns, 20, workers = 4)
+    results = dispatcher.dispatch([{'phone': '+1555000%04d' % i, 'message': 'Feed the cat'} for i in range(60)])
+    assert [result['status'] for result in results] == ['sent'] * 60
+    assert dispatcher.throttled == 0
@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from local.fakes import FakeClientError, FakeSes, FakeSns, FakeTable
+from reminders_common.schedule import BUCKET_SECONDS, new_item
+import sweeper
+
+def sweep(reminders, **options):
+    table = FakeTable()
+    start = (int(time.time()) // BUCKET_SECONDS) * BUCKET_SECONDS
+    for data in reminders:
+        table.put_item(Item = new_item(data, start, 8))
+    ses, sns = FakeSes(limit = 25), FakeSns(limit = 25)
+
+    def send_email(data):
+        ses.send_email(Destination = {'ToAddresses': [data['email']]}, Message = {'Body': {'Text': {'Data': data['message']}}})
+
+    def send_sms(data):
+        sns.publish(PhoneNumber = data['phone'], Message = data['message'])
+
+    with ThreadPoolExecutor(max_workers = 16) as executor:
+        stats = sweeper.Sweeper(table, send_email, send_sms, executor, shards = 8, **options).sweep(start + BUCKET_SECONDS)
+    return stats, ses, sns
+
+def reminders(count):
+    return [{'waitSeconds': 0, 'preference': 'both', 'message': 'Feed the cat ' + str(i), 'email': 'someone@something.com', 'phone': '+15556667788'} for i in range(count)]
+
+def test_paced_sweep_stays_under_the_send_limits():
+    stats, ses, sns = sweep(reminders(60), email_rate = 20, sms_rate = 20, burst = 4)
+    assert stats['sent'] == 60
+    assert (ses.throttled, sns.throttled) == (0, 0)
+
+def test_unpaced_sweep_is_throttled_and_reschedules():
+    stats, ses, sns = sweep(reminders(60))
+    assert ses.throttled + sns.throttled > 0
+    assert stats['retried'] == 60 - stats['sent']
+
+def test_retry_after_a_failed_sms_does_not_send_the_email_again():
+    table = FakeTable()
+    start = (int(time.time()) // BUCKET_SECONDS) * BUCKET_SECONDS
+    table.put_item(Item = new_item(reminders(1)[0], start, 8))
+    emails, texts, failures = [], [], [FakeClientError('Throttling', 'Publish')]
+
+    def send_sms(data):
+        if failures:
+            raise failures.pop()
+        texts.append(data['phone'])
+
+    with ThreadPoolExecutor(max_workers = 4) as executor:
+        worker = sweeper.Sweeper(table, lambda data: emails.append(data['email']), send_sms, executor, shards = 8)
+        first = worker.sweep(start + BUCKET_SECONDS)
+        second = worker.sweep(start + 2 * BUCKET_SECONDS)
+
+    assert (first['sent'], first['retried']) == (0, 1)
+    assert second['sent'] == 1
+    assert (len(emails), len(texts)) == (1, 1)
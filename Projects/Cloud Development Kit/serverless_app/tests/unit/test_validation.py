@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from reminders_common import validation
+
+REMINDER = {'waitSeconds': '300', 'preference': 'both', 'message': 'Feed the cat', 'email': 'someone@something.com', 'phone': '+15556667788'}
+
+def fields(errors):
+    return [error['field'] for error in errors]
+
+def test_valid_reminder_converts_wait_seconds():
+    data = dict(REMINDER)
+    assert validation.validate(data) == []
+    assert data['waitSeconds'] == 300
+
+@pytest.mark.parametrize('preference', [['email'], {'email': True}, 1, None])
+def test_preference_that_is_not_a_string_fails_validation(preference):
+    assert fields(validation.validate(dict(REMINDER, preference = preference))) == ['preference']
+
+@pytest.mark.parametrize('wait_seconds', ['9' * 5000, '-' + '9' * 5000, '9' * 19])
+def test_wait_seconds_with_too_many_digits_fails_validation(wait_seconds):
+    assert fields(validation.validate(dict(REMINDER, waitSeconds = wait_seconds))) == ['waitSeconds']
+
+def test_wait_seconds_with_leading_zeros():
+    data = dict(REMINDER, waitSeconds = '0' * 40 + '60')
+    assert validation.validate(data) == []
+    assert data['waitSeconds'] == 60
+
+@pytest.mark.parametrize('change', [{'preference': ['email']}, {'preference': {'a': 1}}, {'waitSeconds': '9' * 5000}])
+def test_handler_answers_bad_input_with_400(api_handler, change):
+    event = {'resource': '/reminders', 'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(dict(REMINDER, **change))}
+    response = api_handler.lambda_handler(event, None)
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['Reason'] == 'Input failed validation'
+
+def test_batch_reports_bad_items_as_invalid(api_handler):
+    event = {'resource': '/reminders/batch', 'httpMethod': 'POST', 'headers': {}, 'body': json.dumps([REMINDER, dict(REMINDER, preference = ['sms'])])}
+    response = api_handler.lambda_handler(event, None)
+    results = json.loads(response['body'])['Results']
+    assert response['statusCode'] == 200
+    assert [result['status'] for result in results] == ['started', 'invalid']
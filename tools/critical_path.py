@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# Estimate how long CloudFormation takes to create a stack, and which dependencies make it take that long
+#
+#   python3 tools/critical_path.py CloudFormation/VPC/vpc.yml
+#   python3 tools/critical_path.py synth.out/prod/vpc/CustomVpcStack --durations durations.json
+#
+# Takes JSON or YAML templates, including the !Ref/!GetAtt/!Sub short forms, and cloud assembly directories,
+# whose *.template.json files are analyzed one by one. A resource depends on the resources it names in
+# DependsOn, Ref, Fn::GetAtt and Fn::Sub. CloudFormation creates a resource once all of its dependencies are
+# created, so with the per-type estimates below the longest chain of dependencies is the creation time.
+# Reported are that critical path, explicit dependencies that are already implied by another dependency, and
+# explicit dependencies that hold resources back, with how much shorter the deploy is without them. Some of
+# those are needed all the same, e.g. an EIP for a VPC waits for the internet gateway attachment.
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+# Typical creation times in seconds, --durations takes a JSON object of types to override or add
+DURATIONS = {
+    'AWS::ApiGateway::Account': 10,
+    'AWS::ApiGateway::ApiKey': 3,
+    'AWS::ApiGateway::Deployment': 5,
+    'AWS::ApiGateway::Method': 3,
+    'AWS::ApiGateway::Resource': 3,
+    'AWS::ApiGateway::RestApi': 5,
+    'AWS::ApiGateway::Stage': 5,
+    'AWS::ApiGateway::UsagePlan': 5,
+    'AWS::ApiGateway::UsagePlanKey': 3,
+    'AWS::ApiGatewayV2::Api': 5,
+    'AWS::ApiGatewayV2::Integration': 3,
+    'AWS::ApiGatewayV2::Route': 3,
+    'AWS::ApiGatewayV2::Stage': 5,
+    'AWS::ApplicationAutoScaling::ScalableTarget': 30,
+    'AWS::ApplicationAutoScaling::ScalingPolicy': 5,
+    'AWS::AutoScaling::AutoScalingGroup': 120,
+    'AWS::AutoScaling::ScalingPolicy': 5,
+    'AWS::CDK::Metadata': 2,
+    'AWS::CloudFormation::CustomResource': 60,
+    'AWS::CloudFormation::Stack': 300,
+    'AWS::CloudFront::CloudFrontOriginAccessIdentity': 5,
+    'AWS::CloudFront::Distribution': 300,
+    'AWS::CloudFront::Function': 10,
+    'AWS::CloudFront::OriginAccessControl': 5,
+    'AWS::CloudWatch::Alarm': 5,
+    'AWS::DynamoDB::Table': 15,
+    'AWS::EC2::EIP': 5,
+    'AWS::EC2::Instance': 45,
+    'AWS::EC2::InternetGateway': 15,
+    'AWS::EC2::LaunchTemplate': 5,
+    'AWS::EC2::NatGateway': 100,
+    'AWS::EC2::PlacementGroup': 5,
+    'AWS::EC2::Route': 5,
+    'AWS::EC2::RouteTable': 5,
+    'AWS::EC2::SecurityGroup': 8,
+    'AWS::EC2::SecurityGroupEgress': 5,
+    'AWS::EC2::SecurityGroupIngress': 5,
+    'AWS::EC2::Subnet': 5,
+    'AWS::EC2::SubnetRouteTableAssociation': 5,
+    'AWS::EC2::VPC': 15,
+    'AWS::EC2::VPCEndpoint': 10,
+    'AWS::EC2::VPCGatewayAttachment': 20,
+    'AWS::ElasticLoadBalancingV2::Listener': 5,
+    'AWS::ElasticLoadBalancingV2::LoadBalancer': 180,
+    'AWS::ElasticLoadBalancingV2::TargetGroup': 10,
+    'AWS::Events::Rule': 10,
+    'AWS::IAM::InstanceProfile': 120,
+    'AWS::IAM::ManagedPolicy': 15,
+    'AWS::IAM::Policy': 15,
+    'AWS::IAM::Role': 20,
+    'AWS::KMS::Key': 30,
+    'AWS::Lambda::Alias': 5,
+    'AWS::Lambda::EventSourceMapping': 60,
+    'AWS::Lambda::Function': 15,
+    'AWS::Lambda::LayerVersion': 10,
+    'AWS::Lambda::Permission': 5,
+    'AWS::Lambda::Url': 5,
+    'AWS::Lambda::Version': 10,
+    'AWS::Logs::LogGroup': 5,
+    'AWS::RDS::DBInstance': 600,
+    'AWS::S3::Bucket': 20,
+    'AWS::S3::BucketPolicy': 5,
+    'AWS::SES::ConfigurationSet': 5,
+    'AWS::SES::Template': 5,
+    'AWS::SNS::Subscription': 5,
+    'AWS::SNS::Topic': 10,
+    'AWS::SQS::Queue': 60,
+    'AWS::SQS::QueuePolicy': 5,
+    'AWS::StepFunctions::StateMachine': 10,
+}
+DEFAULT_DURATION = 10
+
+# Interface endpoints provision network interfaces in every subnet, gateway endpoints only add routes
+INTERFACE_ENDPOINT_DURATION = 120
+
+# Custom::* resources run a Lambda, usually a cold one
+CUSTOM_RESOURCE_DURATION = 60
+
+# Change set creation and stack bookkeeping around the resources
+STACK_OVERHEAD = 20
+
+SUB_VARIABLE = re.compile(r'\$\{([^!}][^}]*)\}')
+
+# YAML short forms: !Ref X is {'Ref': X}, !GetAtt X.Y is {'Fn::GetAtt': [X, Y]}, !Sub ... is {'Fn::Sub': ...}
+def yaml_loader():
+    try:
+        import yaml
+    except ImportError:
+        raise SystemExit('YAML templates need PyYAML, pip install pyyaml')
+
+    class Loader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+        pass
+
+    def intrinsic(loader, suffix, node):
+        if isinstance(node, yaml.ScalarNode):
+            value = loader.construct_scalar(node)
+        elif isinstance(node, yaml.SequenceNode):
+            value = loader.construct_sequence(node, deep = True)
+        else:
+            value = loader.construct_mapping(node, deep = True)
+        if suffix == 'Ref' or suffix == 'Condition':
+            return {suffix: value}
+        if suffix == 'GetAtt' and isinstance(value, str):
+            value = value.split('.', 1)
+        return {'Fn::' + suffix: value}
+
+    Loader.add_multi_constructor('!', intrinsic)
+    # Dates such as AWSTemplateFormatVersion: 2010-09-09 stay strings, like CloudFormation reads them
+    Loader.add_constructor('tag:yaml.org,2002:timestamp', Loader.construct_yaml_str)
+    return lambda text: yaml.load(text, Loader = Loader)
+
+def load_template(path):
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith('{'):
+        return json.loads(text)
+    return yaml_loader()(text)
+
+# Template paths to analyze, a directory stands for the templates of its cloud assembly
+def template_paths(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.template.json'))))
+        else:
+            found.append(path)
+    return found
+
+def estimate(resource, durations):
+    resource_type = resource.get('Type', '')
+    if resource_type in durations:
+        return durations[resource_type]
+    if resource_type == 'AWS::EC2::VPCEndpoint' and (resource.get('Properties') or {}).get('VpcEndpointType') == 'Interface':
+        return INTERFACE_ENDPOINT_DURATION
+    if resource_type.startswith('Custom::'):
+        return CUSTOM_RESOURCE_DURATION
+    return DURATIONS.get(resource_type, DEFAULT_DURATION)
+
+# Names of everything a value refers to with Ref, Fn::GetAtt or Fn::Sub, as {name: kind}
+def references(value, found):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == 'Ref' and isinstance(item, str):
+                found.setdefault(item, 'Ref')
+            elif key == 'Fn::GetAtt':
+                name = item[0] if isinstance(item, list) else str(item).split('.', 1)[0]
+                if isinstance(name, str):
+                    found.setdefault(name, 'GetAtt')
+            elif key == 'Fn::Sub':
+                text, variables = (item[0], item[1]) if isinstance(item, list) else (item, {})
+                for variable in SUB_VARIABLE.findall(text if isinstance(text, str) else ''):
+                    name = variable.split('.', 1)[0].strip()
+                    if name not in variables:
+                        found.setdefault(name, 'Sub')
+                references(variables, found)
+            else:
+                references(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            references(item, found)
+    return found
+
+# {resource: {dependency: 'DependsOn' | 'Ref' | 'GetAtt' | 'Sub' | 'DependsOn+Ref' ...}}, only resources count
+def dependency_graph(resources):
+    graph = {}
+    for name, resource in resources.items():
+        implicit = references(resource.get('Properties') or {}, {})
+        depends_on = resource.get('DependsOn') or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        edges = {}
+        for dependency, kind in implicit.items():
+            if dependency in resources and dependency != name:
+                edges[dependency] = kind
+        for dependency in depends_on:
+            if dependency not in resources:
+                raise ValueError(name + ' DependsOn ' + dependency + ', which is not a resource of the template')
+            edges[dependency] = 'DependsOn+' + edges[dependency] if dependency in edges else 'DependsOn'
+        graph[name] = edges
+    return graph
+
+# Dependencies before dependents, raises on a cycle
+def topological_order(graph):
+    dependents = {name: [] for name in graph}
+    waiting = {}
+    for name, edges in graph.items():
+        waiting[name] = len(edges)
+        for dependency in edges:
+            dependents[dependency].append(name)
+    ready = [name for name, count in waiting.items() if count == 0]
+    order = []
+    while ready:
+        name = ready.pop()
+        order.append(name)
+        for dependent in dependents[name]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(graph):
+        raise ValueError('Circular dependency between ' + ', '.join(sorted(name for name, count in waiting.items() if count)))
+    return order
+
+# Finish time of every resource and the dependency it waited for last, without the (resource, dependency) edges in skip
+def schedule(order, graph, durations, skip = ()):
+    finish, waited_for = {}, {}
+    for name in order:
+        start, last = 0, None
+        for dependency in graph[name]:
+            if finish[dependency] > start and (name, dependency) not in skip:
+                start, last = finish[dependency], dependency
+        finish[name] = start + durations[name]
+        waited_for[name] = last
+    return finish, waited_for
+
+def analyze(template, overrides = None):
+    resources = template.get('Resources') or {}
+    durations = {name: estimate(resource, overrides or {}) for name, resource in resources.items()}
+    graph = dependency_graph(resources)
+    order = topological_order(graph)
+    finish, waited_for = schedule(order, graph, durations)
+
+    path = []
+    name = max(order, key = lambda name: finish[name]) if order else None
+    while name is not None:
+        path.append(name)
+        name = waited_for[name]
+    path.reverse()
+    length = finish[path[-1]] if path else 0
+
+    # Everything each resource depends on, directly or not, as bits in topological order
+    bit = {name: 1 << index for index, name in enumerate(order)}
+    reach = {}
+    for name in order:
+        mask = bit[name]
+        for dependency in graph[name]:
+            mask |= reach[dependency]
+        reach[name] = mask
+
+    redundant, held = [], {}
+    for name in order:
+        edges = graph[name]
+        for dependency, kind in edges.items():
+            if not kind.startswith('DependsOn'):
+                continue
+            if kind != 'DependsOn':
+                redundant.append({'resource': name, 'dependency': dependency, 'implied_by': kind.split('+', 1)[1]})
+                continue
+            via = next((other for other in edges if other != dependency and reach[other] & bit[dependency]), None)
+            if via is not None:
+                redundant.append({'resource': name, 'dependency': dependency, 'implied_by': via})
+                continue
+            # How much later the resource starts because of this dependency alone
+            others = [finish[other] for other in edges if other != dependency]
+            delay = finish[dependency] - max(others, default = 0)
+            if delay > 0:
+                held.setdefault(dependency, []).append({'resource': name, 'delay': delay})
+
+    # Resources waiting on the same dependency are often alike, e.g. one EIP per AZ, and only dropping all of
+    # their DependsOn shortens the deploy, so the saving is worked out per dependency. Only groups with an edge
+    # on a critical path, one without slack, are scheduled again.
+    latest = {name: length for name in order}
+    for name in reversed(order):
+        for dependency in graph[name]:
+            latest[dependency] = min(latest[dependency], latest[name] - durations[name])
+
+    def critical(name, dependency):
+        return latest[name] == finish[name] and latest[dependency] == finish[dependency] == finish[name] - durations[name]
+
+    serializing = []
+    for dependency, waiting in held.items():
+        saving = 0
+        if any(critical(item['resource'], dependency) for item in waiting):
+            shortened, _ = schedule(order, graph, durations, skip = {(item['resource'], dependency) for item in waiting})
+            saving = length - max(shortened.values())
+        serializing.append({'dependency': dependency, 'resources': waiting, 'saving': saving})
+    serializing.sort(key = lambda item: (-item['saving'], -max(waiting['delay'] for waiting in item['resources'])))
+
+    return {
+        'resources': len(resources),
+        'dependencies': sum(len(edges) for edges in graph.values()),
+        'explicit': sum(1 for edges in graph.values() for kind in edges.values() if kind.startswith('DependsOn')),
+        'critical_path': [{'resource': name, 'type': resources[name].get('Type'), 'duration': durations[name], 'finish': finish[name]} for name in path],
+        'critical_path_seconds': length,
+        'expected_seconds': length + STACK_OVERHEAD if resources else 0,
+        'redundant': redundant,
+        'serializing': serializing
+    }
+
+def minutes(seconds):
+    return '%dm%02ds' % divmod(int(round(seconds)), 60)
+
+def print_report(path, report, elapsed):
+    if not report['resources']:
+        print('%s: no resources' % path)
+        return
+    print('%s: %d resources, %d dependencies (%d explicit), expected create time %s (critical path %s + %ds stack overhead), analyzed in %.1f ms' % (
+        path, report['resources'], report['dependencies'], report['explicit'], minutes(report['expected_seconds']),
+        minutes(report['critical_path_seconds']), STACK_OVERHEAD, elapsed * 1000))
+    print('  Critical path:')
+    print('    %8s %6s  %-48s %s' % ('finish', 'est', 'resource', 'type'))
+    for step in report['critical_path']:
+        print('    %8s %5ds  %-48s %s' % (minutes(step['finish']), step['duration'], step['resource'], step['type']))
+    if report['redundant']:
+        print('  Redundant DependsOn, implied by another dependency:')
+        for item in report['redundant']:
+            print('    %s -> %s (via %s)' % (item['resource'], item['dependency'], item['implied_by']))
+    if report['serializing']:
+        print('  DependsOn holding resources back:')
+        for item in report['serializing']:
+            saving = 'deploy %ds shorter without them' % item['saving'] if item['saving'] else 'not on the critical path'
+            print('    %s, %s' % (item['dependency'], saving))
+            for waiting in item['resources']:
+                print('      %s starts %ds later' % (waiting['resource'], waiting['delay']))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Critical path and expected create time of CloudFormation templates')
+    parser.add_argument('templates', nargs = '+', help = 'JSON or YAML templates, or cloud assembly directories')
+    parser.add_argument('--durations', help = 'JSON object of resource types and their creation time in seconds')
+    parser.add_argument('--json', action = 'store_true', help = 'print the reports as JSON')
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.durations:
+        with open(args.durations) as f:
+            overrides = json.load(f)
+
+    reports = {}
+    failed = False
+    for path in template_paths(args.templates):
+        began = time.perf_counter()
+        try:
+            report = analyze(load_template(path), overrides)
+        except ValueError as e:
+            print(path + ': ' + str(e), file = sys.stderr)
+            failed = True
+            continue
+        elapsed = time.perf_counter() - began
+        reports[path] = report
+        if not args.json:
+            print_report(path, report, elapsed)
+    if args.json:
+        print(json.dumps(reports, indent = 2))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
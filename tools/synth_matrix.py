@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Synthesize every stack of the CDK apps once per environment, in parallel, and reuse unchanged templates
+#
+#   python3 tools/synth_matrix.py                      # everything in tools/synth_matrix.json
+#   python3 tools/synth_matrix.py --env prod --app vpc --stack CustomVpcStack
+#
+# Each (environment, stack) pair is its own job: the app runs in a separate process with -c stacks=<stack>, so
+# only that stack is built. A job is keyed on a hash of what goes into the stack: the environment, the merged
+# context, the app's shared files (app.py, cdk.json, requirements.txt), the stack's module and the local
+# modules it imports, and any asset directories it bundles. Jobs whose key is in the cache are not run.
+# Cloud assemblies are kept in .synth-cache/<key> and hard linked to synth.out/<environment>/<app>/<stack>,
+# ready for 'cdk deploy --app synth.out/prod/vpc/VpcStack'. Timings per job are printed and written to
+# synth.out/timings.json.
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bumped when the layout of a cache entry changes, so old entries are not used
+CACHE_VERSION = 1
+
+# Files of an app that every one of its stacks depends on
+SHARED_SOURCES = ['app.py', 'cdk.json', 'cdk.context.json', 'requirements.txt']
+
+# Lines of output kept from a failed synth
+OUTPUT_TAIL = 40
+
+def load_matrix(path):
+    with open(path) as f:
+        return json.load(f)
+
+def read_json(path, default = None):
+    if not os.path.isfile(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+# The file a module name resolves to inside the app, None for modules from elsewhere
+def module_file(app_dir, name):
+    base = os.path.join(app_dir, *name.split('.'))
+    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+# The stack's module and every module of the app it imports, directly or not
+def module_closure(app_dir, path):
+    seen = set()
+    pending = [os.path.join(app_dir, path)]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        with open(current) as f:
+            tree = ast.parse(f.read(), current)
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                # 'from package import module' imports a module, 'from module import name' a name
+                names = [node.module] + [node.module + '.' + alias.name for alias in node.names]
+            for name in names:
+                found = module_file(app_dir, name)
+                if found is not None:
+                    pending.append(found)
+    return seen
+
+def asset_files(app_dir, patterns):
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(app_dir, pattern), recursive = True):
+            if os.path.isfile(path) and '__pycache__' not in path and not path.endswith('.pyc'):
+                files.add(path)
+    return files
+
+# Source hashes are shared by all jobs of a run, the same files are only read once
+file_hashes = {}
+
+def hash_file(path):
+    if path not in file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        file_hashes[path] = digest.hexdigest()
+    return file_hashes[path]
+
+# CDK_CONTEXT_JSON replaces the context the CLI would read from cdk.json and cdk.context.json, so both are
+# merged in here, then the app's and the environment's context, then the stack selection
+def job_context(app_dir, app, environment, app_name, stack):
+    context = dict(read_json(os.path.join(app_dir, 'cdk.json'), {}).get('context', {}))
+    context.update(read_json(os.path.join(app_dir, 'cdk.context.json'), {}))
+    context.update(app.get('context', {}))
+    context.update(environment.get('context', {}).get(app_name, {}))
+    context['stacks'] = stack
+    return context
+
+def cache_key(app_dir, files, context, environment):
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'version': CACHE_VERSION,
+        'python': sys.version_info[:2],
+        'account': environment.get('account'),
+        'region': environment.get('region'),
+        'context': context
+    }, sort_keys = True).encode('utf-8'))
+    for path in sorted(files):
+        digest.update(os.path.relpath(path, app_dir).encode('utf-8') + b'\0' + hash_file(path).encode('utf-8') + b'\0')
+    return digest.hexdigest()[:32]
+
+def plan(matrix, environments, apps, stacks):
+    jobs = []
+    for env_name, environment in matrix['environments'].items():
+        if environments and env_name not in environments:
+            continue
+        for app_name, app in matrix['apps'].items():
+            if apps and app_name not in apps:
+                continue
+            app_dir = os.path.join(ROOT, app['path'])
+            shared = {path for path in (os.path.join(app_dir, name) for name in SHARED_SOURCES) if os.path.isfile(path)}
+            for stack_name, stack in app['stacks'].items():
+                if stacks and stack_name not in stacks:
+                    continue
+                files = shared | module_closure(app_dir, stack['module']) | asset_files(app_dir, stack.get('assets', []))
+                context = job_context(app_dir, app, environment, app_name, stack_name)
+                jobs.append({
+                    'environment': env_name,
+                    'app': app_name,
+                    'stack': stack_name,
+                    'app_dir': app_dir,
+                    'command': read_json(os.path.join(app_dir, 'cdk.json'))['app'],
+                    'account': environment.get('account'),
+                    'region': environment.get('region'),
+                    'context': context,
+                    'key': cache_key(app_dir, files, context, environment),
+                    'files': len(files)
+                })
+    return jobs
+
+# Runs in a pool process: synthesize one stack into outdir and return how it went
+def synth(job, outdir):
+    env = dict(os.environ)
+    env['CDK_OUTDIR'] = outdir
+    env['CDK_CONTEXT_JSON'] = json.dumps(job['context'])
+    if job['account']:
+        env['CDK_DEFAULT_ACCOUNT'] = job['account']
+    if job['region']:
+        env['CDK_DEFAULT_REGION'] = job['region']
+    # Apps that bundle assets get a build directory per environment, so parallel synths do not share one
+    env['BUNDLE_BUILD_DIR'] = os.path.join('build', job['environment'])
+
+    # The app runs on this interpreter, the one the cache key was made for
+    command = job['command'].split()
+    if command[0] in ('python', 'python3'):
+        command[0] = sys.executable
+
+    began = time.perf_counter()
+    process = subprocess.run(command, cwd = job['app_dir'], env = env, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+    seconds = time.perf_counter() - began
+    output = process.stdout.decode('utf-8', 'replace').splitlines()
+
+    if process.returncode != 0:
+        return {'status': 'failed', 'seconds': seconds, 'output': output[-OUTPUT_TAIL:]}
+    template = os.path.join(outdir, job['stack'] + '.template.json')
+    if not os.path.isfile(template):
+        return {'status': 'failed', 'seconds': seconds, 'output': output[-OUTPUT_TAIL:] + ['No ' + os.path.basename(template) + ' in the assembly']}
+    # Lookups (AZs, AMIs, ...) are left to the CLI, the template holds dummy values until cdk.context.json has them
+    missing = read_json(os.path.join(outdir, 'manifest.json'), {}).get('missing')
+    if missing:
+        return {'status': 'missing context', 'seconds': seconds, 'output': ['Run cdk synth once with credentials to fill cdk.context.json: ' + ', '.join(item['key'] for item in missing)]}
+    return {'status': 'synthesized', 'seconds': seconds, 'output': []}
+
+# Hard links where the file system allows them, assemblies with bundled assets are large
+def link_tree(source, target):
+    shutil.rmtree(target, ignore_errors = True)
+    os.makedirs(os.path.dirname(target), exist_ok = True)
+    try:
+        shutil.copytree(source, target, copy_function = os.link)
+    except OSError:
+        shutil.rmtree(target, ignore_errors = True)
+        shutil.copytree(source, target)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Synthesize the CDK stacks for every environment, in parallel and cached')
+    parser.add_argument('--matrix', default = os.path.join(ROOT, 'tools', 'synth_matrix.json'), help = 'environments and apps to synthesize')
+    parser.add_argument('--env', action = 'append', help = 'only this environment, can be repeated')
+    parser.add_argument('--app', action = 'append', help = 'only this app, can be repeated')
+    parser.add_argument('--stack', action = 'append', help = 'only this stack, can be repeated')
+    parser.add_argument('--workers', type = int, default = os.cpu_count(), help = 'synths running at the same time')
+    parser.add_argument('--cache', default = os.path.join(ROOT, '.synth-cache'), help = 'cache directory')
+    parser.add_argument('--out', default = os.path.join(ROOT, 'synth.out'), help = 'output directory')
+    parser.add_argument('--force', action = 'store_true', help = 'synthesize every stack, ignoring the cache')
+    args = parser.parse_args()
+
+    began = time.perf_counter()
+    jobs = plan(load_matrix(args.matrix), args.env, args.app, args.stack)
+    if not jobs:
+        raise SystemExit('Nothing to synthesize')
+    planned = time.perf_counter() - began
+    os.makedirs(args.cache, exist_ok = True)
+
+    pending = []
+    for job in jobs:
+        entry = read_json(os.path.join(args.cache, job['key'], 'synth_matrix.json'))
+        if entry is not None and not args.force:
+            job.update(status = 'cached', seconds = 0.0, saved = entry['seconds'], output = [])
+        else:
+            pending.append(job)
+
+    workers = max(1, min(args.workers, len(pending)))
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = {}
+        for job in pending:
+            staging = os.path.join(args.cache, job['key'] + '.tmp-' + uuid.uuid4().hex[:8])
+            futures[pool.submit(synth, job, staging)] = (job, staging)
+        for future in as_completed(futures):
+            job, staging = futures[future]
+            job.update(future.result())
+            target = os.path.join(args.cache, job['key'])
+            if job['status'] != 'synthesized':
+                shutil.rmtree(staging, ignore_errors = True)
+                continue
+            with open(os.path.join(staging, 'synth_matrix.json'), 'w') as f:
+                json.dump({'environment': job['environment'], 'app': job['app'], 'stack': job['stack'], 'seconds': job['seconds']}, f)
+            # Another run may have stored the same key in the meantime, both assemblies are the same
+            shutil.rmtree(target, ignore_errors = True)
+            os.rename(staging, target)
+
+    for job in jobs:
+        if job['status'] in ('cached', 'synthesized'):
+            link_tree(os.path.join(args.cache, job['key']), os.path.join(args.out, job['environment'], job['app'], job['stack']))
+
+    print('%-10s %-32s %-36s %-16s %9s' % ('env', 'app', 'stack', 'status', 'seconds'))
+    for job in sorted(jobs, key = lambda job: (job['environment'], job['app'], job['stack'])):
+        seconds = '%.1f' % job['seconds'] if job['status'] != 'cached' else '(%.1f)' % job['saved']
+        print('%-10s %-32s %-36s %-16s %9s' % (job['environment'], job['app'], job['stack'], job['status'], seconds))
+        for line in job['output']:
+            print('    ' + line)
+    synthesized = [job for job in jobs if job['status'] == 'synthesized']
+    cached = [job for job in jobs if job['status'] == 'cached']
+    wall = time.perf_counter() - began
+    print('%d stacks: %d synthesized in %.1fs of synth time, %d cached saving %.1fs, %.1fs wall (%.2fs hashing) on %d workers' % (
+        len(jobs), len(synthesized), sum(job['seconds'] for job in synthesized), len(cached), sum(job['saved'] for job in cached),
+        wall, planned, workers))
+
+    os.makedirs(args.out, exist_ok = True)
+    with open(os.path.join(args.out, 'timings.json'), 'w') as f:
+        json.dump({
+            'wall': wall,
+            'stacks': [{name: job.get(name) for name in ('environment', 'app', 'stack', 'status', 'seconds', 'saved', 'key')} for job in jobs]
+        }, f, indent = 2)
+    if any(job['status'] not in ('cached', 'synthesized') for job in jobs):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()